@@ -0,0 +1,139 @@
+"""
+Command line entry point for offline summary jobs.
+
+Usage:
+    python -m app.cli bulk --org-id ORG --output summaries.jsonl
+    python -m app.cli batch --org-id ORG --output summaries.jsonl
+    python -m app.cli data-versions [--backfill]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from pathlib import Path
+
+from app.data.data_versions import backfill_data_versions, install_data_versions
+from app.dependencies.database import sessionmanager
+from app.services.batch_jobs import (
+    BATCH_MAX_RETRIES,
+    BATCH_POLL_INTERVAL,
+    run_batch_job,
+)
+from app.services.bulk_summaries import (
+    BULK_BATCH_SIZE,
+    BULK_CONCURRENCY,
+    generate_bulk_summaries,
+)
+from app.services.usage_ledger import usage_ledger
+
+
+async def run_bulk(args: argparse.Namespace):
+    """Run bulk summary generation and print the final report."""
+    sessionmanager.start_health_checks()
+    usage_ledger.start()
+    try:
+        report = await generate_bulk_summaries(
+            output=args.output,
+            checkpoint_path=args.checkpoint or args.output.with_suffix(".ckpt.json"),
+            org_id=args.org_id,
+            ward_id=args.ward_id,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+        )
+    finally:
+        # Write the buffered usage entries while the database is still open
+        await usage_ledger.stop()
+        await sessionmanager.close()
+    print(json.dumps(report, indent=2))
+
+
+async def run_batch(args: argparse.Namespace):
+    """Run batch-job summary generation and print the final report."""
+    sessionmanager.start_health_checks()
+    usage_ledger.start()
+    try:
+        report = await run_batch_job(
+            output=args.output,
+            checkpoint_path=args.checkpoint or args.output.with_suffix(".ckpt.json"),
+            work_dir=args.work_dir,
+            org_id=args.org_id,
+            ward_id=args.ward_id,
+            poll_interval=args.poll_interval,
+            max_retries=args.max_retries,
+        )
+    finally:
+        await usage_ledger.stop()
+        await sessionmanager.close()
+    print(json.dumps(report, indent=2))
+
+
+async def run_data_versions(args: argparse.Namespace):
+    """Install the data version triggers, or only backfill, and print the count."""
+    try:
+        async with sessionmanager.connect() as connection:
+            if args.backfill:
+                versions = await backfill_data_versions(connection)
+            else:
+                versions = await install_data_versions(connection)
+    finally:
+        await sessionmanager.close()
+    print(json.dumps({"versions": versions}, indent=2))
+
+
+def add_selection_arguments(parser: argparse.ArgumentParser):
+    """Add the patient selection and output arguments shared by jobs."""
+    parser.add_argument("--org-id", help="Only patients of this organisation")
+    parser.add_argument("--ward-id", help="Only patients on this ward")
+    parser.add_argument("--output", type=Path, required=True, help="JSONL output file")
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        help="Checkpoint file (default: <output>.ckpt.json)",
+    )
+
+
+def main():
+    """Parse command line arguments and run the selected command."""
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="MELO AI summary jobs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    bulk = subparsers.add_parser(
+        "bulk", help="Regenerate summaries for all active patients"
+    )
+    add_selection_arguments(bulk)
+    bulk.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+    bulk.add_argument("--concurrency", type=int, default=BULK_CONCURRENCY)
+    bulk.set_defaults(handler=run_bulk)
+
+    batch = subparsers.add_parser(
+        "batch", help="Regenerate summaries through the asynchronous batch API"
+    )
+    add_selection_arguments(batch)
+    batch.add_argument(
+        "--work-dir",
+        type=Path,
+        default=Path("batch_jobs"),
+        help="Directory for batch input files",
+    )
+    batch.add_argument("--poll-interval", type=float, default=BATCH_POLL_INTERVAL)
+    batch.add_argument("--max-retries", type=int, default=BATCH_MAX_RETRIES)
+    batch.set_defaults(handler=run_batch)
+
+    data_versions = subparsers.add_parser(
+        "data-versions", help="Install and backfill the patient data version index"
+    )
+    data_versions.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Only re-run the backfill, bumping every patient's versions",
+    )
+    data_versions.set_defaults(handler=run_data_versions)
+
+    args = parser.parse_args()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
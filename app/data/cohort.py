@@ -0,0 +1,200 @@
+"""Module for aggregating submissions across a ward or organisation in SQL."""
+
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import Text, cast, func, literal_column, select, true, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.simplified_models import (
+    SimplifiedAbc,
+    SimplifiedAbs,
+    SimplifiedOasmnr,
+    SimplifiedPatient,
+)
+
+
+def _cohort(org_id: str | None, ward_id: str | None):
+    """Build the subquery of active patient ids in an organisation or ward."""
+    query = select(SimplifiedPatient.id).where(SimplifiedPatient.status == "ACTIVE")
+    if org_id:
+        query = query.where(SimplifiedPatient.org_id == org_id)
+    if ward_id:
+        query = query.where(SimplifiedPatient.ward_id == ward_id)
+    return query
+
+
+def _source(name: str):
+    """Label rows of a UNION ALL branch with their submission type."""
+    return literal_column(f"'{name}'").label("source")
+
+
+def _oasmnr_filter(patients, assessment_type: str, since: datetime):
+    """Active OASMNR or SASBA rows of the cohort since a time."""
+    return (
+        SimplifiedOasmnr.patient_id.in_(patients),
+        SimplifiedOasmnr.assessment_type == assessment_type,
+        SimplifiedOasmnr.status == "ACTIVE",
+        SimplifiedOasmnr.time_of_behaviour >= since,
+    )
+
+
+async def get_cohort_fingerprint(
+    db_session: AsyncSession, org_id: str | None = None, ward_id: str | None = None
+) -> str:
+    """
+    Compute a cheap fingerprint of a cohort's submission data.
+
+    Uses the number of patients and, per submission table, the active row
+    count and latest update time, in one round trip without loading rows.
+    """
+    patients = _cohort(org_id, ward_id)
+    columns = [select(func.count()).select_from(patients.subquery()).scalar_subquery()]
+    for model in (SimplifiedOasmnr, SimplifiedAbs, SimplifiedAbc):
+        columns.append(
+            select(func.count())
+            .select_from(model)
+            .where(model.patient_id.in_(patients), model.status == "ACTIVE")
+            .scalar_subquery()
+        )
+        columns.append(
+            select(func.max(model.updated_at))
+            .where(model.patient_id.in_(patients))
+            .scalar_subquery()
+        )
+    row = (await db_session.execute(select(*columns))).one()
+    return "|".join(str(value) for value in row)
+
+
+async def get_cohort_aggregates(
+    db_session: AsyncSession,
+    since: datetime,
+    org_id: str | None = None,
+    ward_id: str | None = None,
+) -> Dict[str, List[Dict]]:
+    """
+    Aggregate a cohort's submissions since a time, grouped in the database.
+
+    Returns weekly incident counts, recordings, patients involved and mean
+    severity (the mean score for ABS); severity level counts; and
+    antecedent (OASMNR/SASBA) and before-event (ABC) counts. Each is one
+    UNION ALL statement over all patients, so no per-patient rows are read.
+    """
+    patients = _cohort(org_id, ward_id)
+
+    def week(column):
+        return func.date_trunc(literal_column("'week'"), column)
+
+    weekly = []
+    for assessment_type in ("oasmnr", "sasba"):
+        oasmnr_week = week(SimplifiedOasmnr.time_of_behaviour)
+        weekly.append(
+            select(
+                _source(assessment_type.upper()),
+                oasmnr_week.label("week"),
+                func.count().label("submissions"),
+                func.sum(SimplifiedOasmnr.recordings).label("incidents"),
+                func.count(SimplifiedOasmnr.patient_id.distinct()).label("patients"),
+                func.avg(SimplifiedOasmnr.severity).label("mean"),
+            )
+            .where(*_oasmnr_filter(patients, assessment_type, since))
+            .group_by(oasmnr_week)
+        )
+    abs_week = week(SimplifiedAbs.observation_start)
+    weekly.append(
+        select(
+            _source("ABS"),
+            abs_week.label("week"),
+            func.count(),
+            func.count(),
+            func.count(SimplifiedAbs.patient_id.distinct()),
+            func.avg(SimplifiedAbs.score),
+        )
+        .where(
+            SimplifiedAbs.patient_id.in_(patients),
+            SimplifiedAbs.status == "ACTIVE",
+            SimplifiedAbs.observation_start >= since,
+        )
+        .group_by(abs_week)
+    )
+    abc_week = week(SimplifiedAbc.occurred_at)
+    weekly.append(
+        select(
+            _source("ABC"),
+            abc_week.label("week"),
+            func.count(),
+            func.count(),
+            func.count(SimplifiedAbc.patient_id.distinct()),
+            func.avg(SimplifiedAbc.severity),
+        )
+        .where(
+            SimplifiedAbc.patient_id.in_(patients),
+            SimplifiedAbc.status == "ACTIVE",
+            SimplifiedAbc.occurred_at >= since,
+        )
+        .group_by(abc_week)
+    )
+
+    severity = [
+        select(
+            _source(assessment_type.upper()),
+            cast(SimplifiedOasmnr.severity, Text).label("level"),
+            func.sum(SimplifiedOasmnr.recordings).label("count"),
+        )
+        .where(*_oasmnr_filter(patients, assessment_type, since))
+        .group_by(SimplifiedOasmnr.severity)
+        for assessment_type in ("oasmnr", "sasba")
+    ]
+    severity.append(
+        select(_source("ABS"), cast(SimplifiedAbs.severity, Text), func.count())
+        .where(
+            SimplifiedAbs.patient_id.in_(patients),
+            SimplifiedAbs.status == "ACTIVE",
+            SimplifiedAbs.observation_start >= since,
+        )
+        .group_by(SimplifiedAbs.severity)
+    )
+    severity.append(
+        select(_source("ABC"), cast(SimplifiedAbc.severity, Text), func.count())
+        .where(
+            SimplifiedAbc.patient_id.in_(patients),
+            SimplifiedAbc.status == "ACTIVE",
+            SimplifiedAbc.occurred_at >= since,
+        )
+        .group_by(SimplifiedAbc.severity)
+    )
+
+    antecedents = [
+        select(
+            _source(assessment_type.upper()),
+            cast(SimplifiedOasmnr.antecedent, Text).label("antecedent"),
+            func.sum(SimplifiedOasmnr.recordings).label("count"),
+        )
+        .where(*_oasmnr_filter(patients, assessment_type, since))
+        .group_by(SimplifiedOasmnr.antecedent)
+        for assessment_type in ("oasmnr", "sasba")
+    ]
+    events = (
+        func.unnest(SimplifiedAbc.before_events).table_valued("event").render_derived()
+    )
+    antecedents.append(
+        select(_source("ABC"), events.c.event, func.count())
+        .select_from(SimplifiedAbc)
+        .join(events, true())
+        .where(
+            SimplifiedAbc.patient_id.in_(patients),
+            SimplifiedAbc.status == "ACTIVE",
+            SimplifiedAbc.occurred_at >= since,
+        )
+        .group_by(events.c.event)
+    )
+
+    results = {}
+    for name, queries in (
+        ("weekly", weekly),
+        ("severity", severity),
+        ("antecedents", antecedents),
+    ):
+        result = await db_session.execute(union_all(*queries))
+        results[name] = [row._asdict() for row in result]
+    return results
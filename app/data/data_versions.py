@@ -0,0 +1,314 @@
+"""
+Patient Data Versions.
+
+This module maintains patient_data_versions, a per-patient, per-submission
+type version number and last-change time kept current by triggers on the
+submission and history tables. Whether a patient's data has changed is then
+answered by one primary key lookup instead of counting their rows.
+
+Each trigger bumps the version with an upsert in the writing transaction,
+after taking a transaction-level advisory lock on the patient. Concurrent
+writers to the same patient queue on that lock until the holder ends, and
+each adds one to the committed version: increments are never lost, writers
+cannot deadlock on each other's version rows, and a version becomes visible
+together with the data that changed it. Readers should read versions before data, so
+that data read later is never older than the version it is cached under.
+"""
+
+import logging
+import os
+import uuid
+from typing import Dict, List
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.dependencies.database import sessionmanager
+from app.models.usage_models import PatientDataVersion, UsageBase
+
+logger = logging.getLogger(__name__)
+
+# Whether to install the version triggers on startup when they are missing
+DATA_VERSIONS_INSTALL = os.getenv("DATA_VERSIONS_INSTALL", "false").lower() == "true"
+
+# Submission types versioned per patient, in fingerprint order. The triggers
+# and backfill store types upper-cased to match, whatever the case of the
+# assessment_type enum.
+SUBMISSION_TYPES = ["OASMNR", "SASBA", "ABS", "ABC"]
+
+# Advisory lock key serialising installs from several workers
+INSTALL_LOCK_KEY = 5_050_001
+
+# Advisory lock class of the per-patient locks taken by version bumps
+PATIENT_LOCK_CLASS = 5_050_002
+
+# Bumps the versions of up to two (patient, type) keys. The patients are
+# locked first, in order, so transactions writing several types of a patient
+# queue on the patient instead of deadlocking on version rows locked in
+# different orders; the keys are then upserted in key order.
+BUMP_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION bump_patient_data_versions(
+    patient_a uuid, type_a text, patient_b uuid, type_b text
+) RETURNS void LANGUAGE sql AS $$
+    SELECT pg_advisory_xact_lock({PATIENT_LOCK_CLASS}, hashtext(patient_id::text))
+    FROM (
+        SELECT DISTINCT patient_id FROM (VALUES (patient_a), (patient_b))
+            AS p(patient_id)
+        WHERE patient_id IS NOT NULL
+        ORDER BY patient_id
+    ) AS p;
+    INSERT INTO patient_data_versions AS v
+        (patient_id, submission_type, version, changed_at)
+    SELECT DISTINCT patient_id, submission_type, 1, now()
+    FROM (VALUES (patient_a, type_a), (patient_b, type_b))
+        AS k(patient_id, submission_type)
+    WHERE patient_id IS NOT NULL AND submission_type IS NOT NULL
+    ORDER BY patient_id, submission_type
+    ON CONFLICT (patient_id, submission_type) DO UPDATE
+    SET version = v.version + 1,
+        changed_at = greatest(v.changed_at, excluded.changed_at)
+$$
+"""
+
+# Submission rows carry their patient; the type is the trigger argument, or
+# the row's upper-cased assessment_type when the argument is empty. An update moving a
+# row to another patient or type bumps both the old and the new key.
+SUBMISSION_TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION patient_data_versions_submission()
+RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    old_row jsonb := CASE WHEN TG_OP <> 'INSERT' THEN to_jsonb(OLD) END;
+    new_row jsonb := CASE WHEN TG_OP <> 'DELETE' THEN to_jsonb(NEW) END;
+    fixed_type text := nullif(TG_ARGV[0], '');
+BEGIN
+    PERFORM bump_patient_data_versions(
+        (old_row ->> 'patient_id')::uuid,
+        upper(coalesce(fixed_type, old_row ->> 'assessment_type')),
+        (new_row ->> 'patient_id')::uuid,
+        upper(coalesce(fixed_type, new_row ->> 'assessment_type'))
+    );
+    RETURN NULL;
+END
+$$
+"""
+
+# History rows only reference their submission, which gives the patient and,
+# for OASMNR/SASBA, the upper-cased type. Arguments: parent table, reference column and
+# the fixed type (empty to use the parent's assessment_type).
+HISTORY_TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION patient_data_versions_history()
+RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    history_row jsonb := CASE WHEN TG_OP = 'DELETE' THEN to_jsonb(OLD)
+                              ELSE to_jsonb(NEW) END;
+    patient uuid;
+    submission_type text;
+BEGIN
+    EXECUTE format(
+        'SELECT patient_id, %s FROM %I WHERE id = $1',
+        coalesce(
+            quote_literal(nullif(TG_ARGV[2], '')), 'upper(assessment_type::text)'
+        ),
+        TG_ARGV[0]
+    )
+    INTO patient, submission_type
+    USING (history_row ->> TG_ARGV[1])::uuid;
+    PERFORM bump_patient_data_versions(patient, submission_type, NULL, NULL);
+    RETURN NULL;
+END
+$$
+"""
+
+# Table, trigger function and trigger arguments of every versioned table
+TRIGGERS = [
+    ("oasmnr_submissions", "patient_data_versions_submission", "''"),
+    ("abs_submissions", "patient_data_versions_submission", "'ABS'"),
+    ("abc_submissions", "patient_data_versions_submission", "'ABC'"),
+    (
+        "oasmnr_history",
+        "patient_data_versions_history",
+        "'oasmnr_submissions', 'oasmnr_id', ''",
+    ),
+    (
+        "abs_history",
+        "patient_data_versions_history",
+        "'abs_submissions', 'abs_id', 'ABS'",
+    ),
+    (
+        "abc_history",
+        "patient_data_versions_history",
+        "'abc_submissions', 'abc_id', 'ABC'",
+    ),
+]
+
+# One change per submission and history row, by patient and type. Stored
+# times are naive UTC.
+BACKFILL = """
+INSERT INTO patient_data_versions AS v
+    (patient_id, submission_type, version, changed_at)
+SELECT patient_id, submission_type, 1,
+    coalesce(max(changed_at) AT TIME ZONE 'UTC', now())
+FROM (
+    SELECT patient_id, upper(assessment_type::text), updated_at
+    FROM oasmnr_submissions
+    UNION ALL
+    SELECT patient_id, 'ABS', updated_at FROM abs_submissions
+    UNION ALL
+    SELECT patient_id, 'ABC', updated_at FROM abc_submissions
+    UNION ALL
+    SELECT s.patient_id, upper(s.assessment_type::text), h.updated_at
+    FROM oasmnr_history h JOIN oasmnr_submissions s ON s.id = h.oasmnr_id
+    UNION ALL
+    SELECT s.patient_id, 'ABS', h.updated_at
+    FROM abs_history h JOIN abs_submissions s ON s.id = h.abs_id
+    UNION ALL
+    SELECT s.patient_id, 'ABC', h.updated_at
+    FROM abc_history h JOIN abc_submissions s ON s.id = h.abc_id
+) AS changes(patient_id, submission_type, changed_at)
+WHERE patient_id IS NOT NULL AND submission_type IS NOT NULL
+GROUP BY patient_id, submission_type
+ON CONFLICT (patient_id, submission_type) DO UPDATE
+SET version = v.version + 1,
+    changed_at = greatest(v.changed_at, excluded.changed_at)
+"""
+
+
+def _trigger_name(table: str) -> str:
+    """Name of the version trigger on a table."""
+    return f"{table}_data_version"
+
+
+async def backfill_data_versions(connection: AsyncConnection) -> int:
+    """
+    Record every patient's current data in the version index.
+
+    Existing versions are bumped rather than reset, so versions stay
+    monotonic and running the backfill again only invalidates caches.
+    Returns the number of (patient, type) versions written.
+    """
+    result = await connection.execute(text(BACKFILL))
+    return result.rowcount
+
+
+async def install_data_versions(connection: AsyncConnection) -> int:
+    """
+    Create the version table, functions and triggers, then backfill.
+
+    Run in one transaction: creating the triggers locks out writes to the
+    versioned tables until it commits, and the backfill reads after the
+    locks are taken, so every write is counted either by the backfill or
+    by a trigger. Returns the number of versions backfilled.
+    """
+    await connection.execute(
+        text("SELECT pg_advisory_xact_lock(:key)"), {"key": INSTALL_LOCK_KEY}
+    )
+    await connection.run_sync(
+        UsageBase.metadata.create_all,
+        tables=[PatientDataVersion.__table__],
+        checkfirst=True,
+    )
+    for statement in (
+        BUMP_FUNCTION,
+        SUBMISSION_TRIGGER_FUNCTION,
+        HISTORY_TRIGGER_FUNCTION,
+    ):
+        await connection.execute(text(statement))
+    for table, function, arguments in TRIGGERS:
+        name = _trigger_name(table)
+        await connection.execute(text(f"DROP TRIGGER IF EXISTS {name} ON {table}"))
+        await connection.execute(
+            text(
+                f"CREATE TRIGGER {name} AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION {function}({arguments})"
+            )
+        )
+    return await backfill_data_versions(connection)
+
+
+async def triggers_installed(connection: AsyncConnection) -> bool:
+    """Whether every version trigger exists."""
+    result = await connection.execute(
+        text("SELECT count(*) FROM pg_trigger WHERE tgname = ANY(:names)"),
+        {"names": [_trigger_name(table) for table, _, _ in TRIGGERS]},
+    )
+    return result.scalar_one() == len(TRIGGERS)
+
+
+class DataVersionIndex:
+    """Tracks whether the version index can answer data-change checks."""
+
+    def __init__(self, install: bool):
+        self.install = install
+        self.ready = False
+
+    async def ensure_installed(self):
+        """Install the triggers if missing and allowed, and mark the index ready."""
+        if self.ready:
+            return
+        async with sessionmanager.connect() as connection:
+            # Checked under the install lock, so only one worker installs
+            await connection.execute(
+                text("SELECT pg_advisory_xact_lock(:key)"), {"key": INSTALL_LOCK_KEY}
+            )
+            installed = await triggers_installed(connection)
+            if not installed and self.install:
+                versions = await install_data_versions(connection)
+                logger.info("Installed data version index with %d versions", versions)
+                installed = True
+        if not installed:
+            raise RuntimeError("Data version triggers are not installed")
+        self.ready = True
+
+
+def canonical_patient_id(patient_id) -> str:
+    """Return a patient ID in the form the version index is keyed by."""
+    return str(uuid.UUID(str(patient_id)))
+
+
+async def get_data_versions(
+    db_session: AsyncSession, patient_ids: List[str]
+) -> Dict[str, Dict[str, Dict]]:
+    """
+    Look up many patients' data versions in one indexed query.
+
+    Returns, per patient keyed by canonical_patient_id, the version and last
+    change time of each submission type that has ever had data; other types
+    are absent.
+    """
+    if not patient_ids:
+        return {}
+
+    result = await db_session.execute(
+        select(
+            PatientDataVersion.patient_id,
+            PatientDataVersion.submission_type,
+            PatientDataVersion.version,
+            PatientDataVersion.changed_at,
+        ).where(PatientDataVersion.patient_id.in_(patient_ids))
+    )
+    versions = {canonical_patient_id(patient_id): {} for patient_id in patient_ids}
+    for patient_id, submission_type, version, changed_at in result:
+        versions[canonical_patient_id(patient_id)][submission_type] = {
+            "version": version,
+            "changed_at": changed_at,
+        }
+    return versions
+
+
+async def get_data_version(
+    db_session: AsyncSession, patient_id: str
+) -> Dict[str, Dict]:
+    """Look up one patient's data versions per submission type."""
+    versions = await get_data_versions(db_session, [patient_id])
+    return versions[canonical_patient_id(patient_id)]
+
+
+def version_fingerprint(versions: Dict[str, Dict]) -> str:
+    """Build a data fingerprint from one patient's data versions."""
+    return "v|" + "|".join(
+        str(versions.get(submission_type, {}).get("version", 0))
+        for submission_type in SUBMISSION_TYPES
+    )
+
+
+data_version_index = DataVersionIndex(DATA_VERSIONS_INSTALL)
@@ -1,63 +1,136 @@
 """Module for retrieving and processing OASMNR and SASBA submissions from the database."""
 
-from typing import Dict, List
+import asyncio
+import os
+import uuid
+from array import array
+from datetime import datetime, timedelta
+from functools import partial
+from typing import AsyncIterator, Dict, List
 
 import sqlalchemy.sql.functions
-from sqlalchemy import select
+from sqlalchemy import DateTime, Integer, Uuid, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.simplified_models import SimplifiedAbc, SimplifiedAbs, SimplifiedOasmnr
+from app.data.data_versions import (
+    canonical_patient_id,
+    data_version_index,
+    get_data_versions,
+    version_fingerprint,
+)
+from app.dependencies.database import sessionmanager
+from app.models.simplified_models import (
+    SimplifiedAbc,
+    SimplifiedAbs,
+    SimplifiedBookmark,
+    SimplifiedOasmnr,
+    SimplifiedPatient,
+)
 from app.preprocessing.submissions import (
-    preprocess_abc,
+    preprocess_abc_submission,
     preprocess_abs,
-    preprocess_submissions,
+    preprocess_abs_submission,
+    preprocess_submission,
+    compress_episodes,
+    extract_notes,
+    serialize_rows,
+    tap,
 )
+from app.services.analytics import collect_row, new_columns
+from app.services.offload import cpu_offload
 
+# Rows fetched per round trip when streaming submissions
+STREAM_BATCH_SIZE = int(os.getenv("DB_STREAM_BATCH_SIZE", "500"))
 
-async def get_oasmnrs(db_session: AsyncSession, patient_id: str) -> List[Dict]:
-    """Retrieve and clean OASMNR submissions for a specific patient."""
-    query = select(SimplifiedOasmnr).where(
-        SimplifiedOasmnr.patient_id == patient_id,
-        SimplifiedOasmnr.assessment_type == "oasmnr",
-        SimplifiedOasmnr.status == "ACTIVE",
+# Maximum gap between near-identical OASMNR/SASBA rows merged into one episode
+EPISODE_GAP = timedelta(minutes=float(os.getenv("EPISODE_GAP_MINUTES", "30")))
+
+
+def _oasmnr_query(patient_id: str, assessment_type: str):
+    """Build the query for OASMNR or SASBA submissions of a patient."""
+    return (
+        select(SimplifiedOasmnr)
+        .where(
+            SimplifiedOasmnr.patient_id == patient_id,
+            SimplifiedOasmnr.assessment_type == assessment_type,
+            SimplifiedOasmnr.status == "ACTIVE",
+        )
+        .order_by(SimplifiedOasmnr.time_of_behaviour)
     )
-    result = await db_session.execute(query)
-    oasmnr_submissions = result.scalars().all()
-    return preprocess_submissions(oasmnr_submissions)
 
 
-async def get_sasbas(db_session: AsyncSession, patient_id: str) -> List[Dict]:
-    """Retrieve and clean SASBA submissions for a specific patient."""
-    query = select(SimplifiedOasmnr).where(
-        SimplifiedOasmnr.patient_id == patient_id,
-        SimplifiedOasmnr.assessment_type == "sasba",
-        SimplifiedOasmnr.status == "ACTIVE",
+def _abs_query(patient_id: str):
+    """Build the query for ABS submissions of a patient."""
+    return (
+        select(SimplifiedAbs)
+        .where(
+            SimplifiedAbs.patient_id == patient_id,
+            SimplifiedAbs.status == "ACTIVE",
+        )
+        .order_by(SimplifiedAbs.observation_start)
     )
-    result = await db_session.execute(query)
-    sasba_submissions = result.scalars().all()
-    return preprocess_submissions(sasba_submissions)
 
 
-async def get_abs(db_session: AsyncSession, patient_id: str) -> List[Dict]:
-    """Retrieve and clean ABS submissions for a specific patient."""
-    query = select(SimplifiedAbs).where(
-        SimplifiedAbs.patient_id == patient_id,
-        SimplifiedAbs.status == "ACTIVE",
+def _abc_query(patient_id: str):
+    """Build the query for ABC submissions of a patient."""
+    return (
+        select(SimplifiedAbc)
+        .where(
+            SimplifiedAbc.patient_id == patient_id,
+            SimplifiedAbc.status == "ACTIVE",
+        )
+        .order_by(SimplifiedAbc.occurred_at)
     )
-    result = await db_session.execute(query)
-    abs_submissions = result.scalars().all()
-    return preprocess_abs(abs_submissions)
 
 
-async def get_abc(db_session: AsyncSession, patient_id: str) -> List[Dict]:
-    """Retrieve and clean ABC submissions for a specific patient."""
-    query = select(SimplifiedAbc).where(
-        SimplifiedAbc.patient_id == patient_id,
-        SimplifiedAbc.status == "ACTIVE",
+async def _stream(db_session: AsyncSession, query, preprocess) -> AsyncIterator[Dict]:
+    """
+    Stream preprocessed rows through a server-side cursor.
+
+    Rows are fetched STREAM_BATCH_SIZE at a time, so memory is bounded by
+    the batch size rather than the patient's full history.
+    """
+    result = await db_session.stream_scalars(
+        query.execution_options(yield_per=STREAM_BATCH_SIZE)
     )
-    result = await db_session.execute(query)
-    abc_submissions = result.scalars().all()
-    return preprocess_abc(abc_submissions)
+    async for submission in result:
+        yield preprocess(submission)
+
+
+def stream_oasmnrs(db_session: AsyncSession, patient_id: str) -> AsyncIterator[Dict]:
+    """Stream cleaned OASMNR submissions for a specific patient."""
+    return _stream(
+        db_session, _oasmnr_query(patient_id, "oasmnr"), preprocess_submission
+    )
+
+
+def stream_sasbas(db_session: AsyncSession, patient_id: str) -> AsyncIterator[Dict]:
+    """Stream cleaned SASBA submissions for a specific patient."""
+    return _stream(
+        db_session, _oasmnr_query(patient_id, "sasba"), preprocess_submission
+    )
+
+
+def stream_abs(db_session: AsyncSession, patient_id: str) -> AsyncIterator[Dict]:
+    """Stream cleaned ABS submissions for a specific patient."""
+    return _stream(db_session, _abs_query(patient_id), preprocess_abs_submission)
+
+
+def stream_abc(db_session: AsyncSession, patient_id: str) -> AsyncIterator[Dict]:
+    """Stream cleaned ABC submissions for a specific patient."""
+    return _stream(db_session, _abc_query(patient_id), preprocess_abc_submission)
+
+
+async def get_abs(db_session: AsyncSession, patient_id: str) -> List[Dict]:
+    """
+    Retrieve and clean ABS submissions for a specific patient as a list.
+
+    Summaries stream submissions instead; this materialised load is kept as
+    the baseline of benchmarks/stream_memory.py.
+    """
+    result = await db_session.execute(_abs_query(patient_id))
+    abs_submissions = result.scalars().all()
+    return preprocess_abs(abs_submissions)
 
 
 async def get_ai_tags(db_session: AsyncSession, patient_id: str):
@@ -112,3 +185,316 @@ async def get_ai_tags(db_session: AsyncSession, patient_id: str):
         tags["abc_count"] = abc_count
 
     return tags
+
+
+# Fingerprint of a patient with no submissions
+EMPTY_FINGERPRINT = "0|None|0|None|0|None"
+
+
+async def get_data_fingerprints(
+    db_session: AsyncSession, patient_ids: List[str]
+) -> Dict[str, str]:
+    """
+    Compute cheap fingerprints of many patients' submission data at once.
+
+    Uses the data version index when its triggers are installed. Otherwise
+    uses active row counts and the latest update time of each submission
+    table, as correlated subqueries in a single round trip, without loading
+    any rows. Unknown patients get EMPTY_FINGERPRINT.
+    """
+    if not patient_ids:
+        return {}
+    if data_version_index.ready:
+        versions = await get_data_versions(db_session, patient_ids)
+        return {
+            str(patient_id): version_fingerprint(
+                versions[canonical_patient_id(patient_id)]
+            )
+            for patient_id in patient_ids
+        }
+
+    columns = []
+    for model in (SimplifiedOasmnr, SimplifiedAbs, SimplifiedAbc):
+        columns.append(
+            select(sqlalchemy.sql.functions.count())
+            .select_from(model)
+            .where(model.patient_id == SimplifiedPatient.id, model.status == "ACTIVE")
+            .scalar_subquery()
+        )
+        columns.append(
+            select(sqlalchemy.sql.functions.max(model.updated_at))
+            .where(model.patient_id == SimplifiedPatient.id)
+            .scalar_subquery()
+        )
+
+    result = await db_session.execute(
+        select(SimplifiedPatient.id, *columns).where(
+            SimplifiedPatient.id.in_(patient_ids)
+        )
+    )
+    fingerprints = {
+        str(row[0]): "|".join(str(value) for value in row[1:]) for row in result
+    }
+    return {
+        str(patient_id): fingerprints.get(str(patient_id), EMPTY_FINGERPRINT)
+        for patient_id in patient_ids
+    }
+
+
+async def get_data_fingerprint(db_session: AsyncSession, patient_id: str) -> str:
+    """Compute a cheap fingerprint of a patient's submission data."""
+    fingerprints = await get_data_fingerprints(db_session, [patient_id])
+    return fingerprints[str(patient_id)]
+
+
+async def get_patient_ids(
+    db_session: AsyncSession,
+    org_id: str | None = None,
+    ward_id: str | None = None,
+    limit: int | None = None,
+) -> List[str]:
+    """
+    List active patient ids, optionally filtered by organisation or ward.
+
+    Ids are in a stable order, so a limit always returns the same patients.
+    """
+    query = select(SimplifiedPatient.id).where(SimplifiedPatient.status == "ACTIVE")
+    if org_id:
+        query = query.where(SimplifiedPatient.org_id == org_id)
+    if ward_id:
+        query = query.where(SimplifiedPatient.ward_id == ward_id)
+    result = await db_session.scalars(query.order_by(SimplifiedPatient.id).limit(limit))
+    return [str(patient_id) for patient_id in result]
+
+
+async def get_bookmarked_patient_ids(
+    db_session: AsyncSession, user_id: str
+) -> List[str]:
+    """List the active patients a user has bookmarked."""
+    result = await db_session.scalars(
+        select(SimplifiedBookmark.patient_id)
+        .join(SimplifiedPatient, SimplifiedPatient.id == SimplifiedBookmark.patient_id)
+        .where(
+            SimplifiedBookmark.user_id == user_id,
+            SimplifiedPatient.status == "ACTIVE",
+        )
+        .order_by(SimplifiedBookmark.patient_id)
+    )
+    return [str(patient_id) for patient_id in result]
+
+
+# Streaming function, query builder, model and row preprocessing per type
+SUBMISSION_SOURCES = {
+    "OASMNR": (
+        stream_oasmnrs,
+        partial(_oasmnr_query, assessment_type="oasmnr"),
+        SimplifiedOasmnr,
+        preprocess_submission,
+    ),
+    "SASBA": (
+        stream_sasbas,
+        partial(_oasmnr_query, assessment_type="sasba"),
+        SimplifiedOasmnr,
+        preprocess_submission,
+    ),
+    "ABS": (stream_abs, _abs_query, SimplifiedAbs, preprocess_abs_submission),
+    "ABC": (stream_abc, _abc_query, SimplifiedAbc, preprocess_abc_submission),
+}
+
+
+async def get_submission_counts(
+    db_session: AsyncSession, patient_id: str
+) -> Dict[str, int]:
+    """Count a patient's active rows of each submission type in one round trip."""
+    columns = [
+        select(sqlalchemy.sql.functions.count())
+        .select_from(query(patient_id).order_by(None).subquery())
+        .scalar_subquery()
+        for _, query, _, _ in SUBMISSION_SOURCES.values()
+    ]
+    row = (await db_session.execute(select(*columns))).one()
+    return dict(zip(SUBMISSION_SOURCES, row))
+
+
+# Reference point for timestamps packed as integer microseconds
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def _pack_column(column, values) -> List | tuple:
+    """
+    Pack a UUID, integer or timestamp column without nulls into a flat buffer.
+
+    Pickling these values one object at a time dominates the cost of
+    sending a large patient to a worker; flat buffers pickle in one copy.
+    Other columns are left as lists.
+    """
+    if not values or None in values:
+        return list(values)
+    if isinstance(column.type, Uuid):
+        return ("uuid", b"".join(value.bytes for value in values))
+    if isinstance(column.type, Integer):
+        return ("int", array("q", values))
+    if isinstance(column.type, DateTime) and not column.type.timezone:
+        return ("datetime", array("q", ((v - EPOCH) // MICROSECOND for v in values)))
+    return list(values)
+
+
+def _unpack_column(buffer: List | tuple) -> List:
+    """Restore a column buffer packed by _pack_column to a list of values."""
+    if isinstance(buffer, list):
+        return buffer
+    kind, packed = buffer
+    if kind == "uuid":
+        return [uuid.UUID(bytes=packed[i : i + 16]) for i in range(0, len(packed), 16)]
+    if kind == "datetime":
+        return [EPOCH + value * MICROSECOND for value in packed]
+    return packed.tolist()
+
+
+async def fetch_columns(db_session: AsyncSession, query, model) -> Dict[str, List]:
+    """
+    Fetch the loaded columns of a query's rows as one buffer per column.
+
+    Compact column buffers pickle far more cheaply than ORM objects, so they
+    are what is sent to worker processes. Rows are streamed
+    STREAM_BATCH_SIZE at a time and split into the column lists as they
+    arrive, so only one partition of row objects is held at once.
+    """
+    columns = [
+        attribute.columns[0]
+        for attribute in sqlalchemy.inspect(model).column_attrs
+        if not attribute.deferred
+    ]
+    result = await db_session.stream(
+        query.with_only_columns(*columns).execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+    values = [[] for _ in columns]
+    async for partition in result.partitions():
+        for column_values, partition_values in zip(values, zip(*partition)):
+            column_values.extend(partition_values)
+    return {
+        column.key: _pack_column(column, column_values)
+        for column, column_values in zip(columns, values)
+    }
+
+
+def _pipeline(rows: AsyncIterator[Dict], source: str, notes: List[Dict], columns):
+    """Collect analytics columns and notes from rows, then serialise them."""
+    rows = tap(rows, partial(collect_row, columns, source))
+    rows = extract_notes(rows, source, notes)
+    if source in ("OASMNR", "SASBA"):
+        rows = compress_episodes(rows, EPISODE_GAP)
+    return serialize_rows(rows)
+
+
+def serialize_columns(source: str, buffers: Dict[str, List]) -> Dict:
+    """
+    Preprocess and serialise one submission type from column buffers.
+
+    Runs the same pipeline as the streaming path, in a worker process, and
+    returns the prompt text with the notes and analytics columns collected.
+    """
+    preprocess = SUBMISSION_SOURCES[source][3]
+    names = list(buffers)
+    values = [_unpack_column(buffer) for buffer in buffers.values()]
+
+    async def rows():
+        for row in zip(*values):
+            yield preprocess(dict(zip(names, row)))
+
+    notes, columns = [], new_columns()
+    text = asyncio.run(_pipeline(rows(), source, notes, columns))
+    return {"text": text, "notes": notes, "columns": columns[source]}
+
+
+async def _serialize_in_snapshot(
+    source: str,
+    rows: int,
+    notes: List[Dict],
+    columns: Dict,
+    snapshot_id: str,
+    replica,
+    patient_id: str,
+):
+    """
+    Serialise one submission type on its own snapshot session.
+
+    Small types are streamed and processed on the event loop; types with
+    enough rows to stall it are fetched as column buffers and processed in
+    the CPU offload pool.
+    """
+    stream, query, model, _ = SUBMISSION_SOURCES[source]
+    async with sessionmanager.snapshot_session(snapshot_id, replica) as db_session:
+        if not cpu_offload.should_offload(rows):
+            return await _pipeline(
+                stream(db_session, patient_id), source, notes, columns
+            )
+        buffers = await fetch_columns(db_session, query(patient_id), model)
+
+    result = await cpu_offload.run(serialize_columns, source, buffers, rows=rows)
+    notes.extend(result["notes"])
+    for field, values in result["columns"].items():
+        columns[source][field].extend(values)
+    return result["text"]
+
+
+async def get_patient_data(
+    patient_id: str, max_replica_lag: float | None = None
+) -> Dict:
+    """
+    Retrieve serialised submissions and AI tags for a patient concurrently.
+
+    Each submission type is streamed through a server-side cursor straight
+    into its prompt text, which is empty when there are no rows. Free-text
+    fields are moved out of the rows into chronologically ordered notes, and
+    runs of near-identical OASMNR/SASBA rows are merged into episodes. Times
+    and numeric fields are collected into column buffers for analytics.
+    Submission types with at least OFFLOAD_MIN_ROWS rows are processed in a
+    worker process instead, so giant patients do not block the event loop.
+    One session exports a read-only snapshot and computes the AI tags while
+    each submission query runs on its own session importing that snapshot,
+    so total latency is that of the slowest query and all results agree.
+    The data fingerprint is read in the same snapshot, so it describes
+    exactly the data returned. Reads go to a replica when one is healthy
+    and within max_replica_lag.
+    """
+    replica = sessionmanager.choose_replica(max_replica_lag)
+    notes = []
+    columns = new_columns()
+    async with sessionmanager.snapshot_session(replica=replica) as db_session:
+        snapshot_id = await sessionmanager.export_snapshot(db_session)
+        fingerprint = await get_data_fingerprint(db_session, patient_id)
+        counts = (
+            await get_submission_counts(db_session, patient_id)
+            if cpu_offload.enabled
+            else dict.fromkeys(SUBMISSION_SOURCES, 0)
+        )
+
+        async with asyncio.TaskGroup() as tg:
+            oasmnr, sasba, abs_, abc = (
+                tg.create_task(
+                    _serialize_in_snapshot(
+                        source,
+                        counts[source],
+                        notes,
+                        columns,
+                        snapshot_id,
+                        replica,
+                        patient_id,
+                    )
+                )
+                for source in SUBMISSION_SOURCES
+            )
+            trends = tg.create_task(get_ai_tags(db_session, patient_id))
+
+    return {
+        "oasmnr": oasmnr.result(),
+        "sasba": sasba.result(),
+        "abs": abs_.result(),
+        "abc": abc.result(),
+        "trends": trends.result(),
+        "columns": columns,
+        "notes": sorted(notes, key=lambda note: (note["time"] is None, note["time"])),
+        "fingerprint": fingerprint,
+    }
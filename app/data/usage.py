@@ -0,0 +1,77 @@
+"""Module for aggregating the LLM usage ledger for cost and latency reports."""
+
+from datetime import date, timedelta
+from typing import Dict, List
+
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.usage_models import LlmUsage
+
+
+def _totals():
+    """Aggregate columns shared by the usage reports."""
+    return (
+        func.count().label("calls"),
+        func.sum(LlmUsage.prompt_tokens).label("prompt_tokens"),
+        func.sum(LlmUsage.cached_tokens).label("cached_tokens"),
+        func.sum(LlmUsage.completion_tokens).label("completion_tokens"),
+        func.sum(LlmUsage.cost).label("cost"),
+        func.avg(LlmUsage.latency_ms).label("avg_latency_ms"),
+        func.percentile_cont(0.95)
+        .within_group(LlmUsage.latency_ms)
+        .label("p95_latency_ms"),
+    )
+
+
+def _with_rates(row) -> Dict:
+    """Convert a result row to a dict with the prompt cache hit rate."""
+    record = row._asdict()
+    prompt_tokens = record["prompt_tokens"] or 0
+    record["cache_hit_rate"] = (
+        (record["cached_tokens"] or 0) / prompt_tokens if prompt_tokens else 0.0
+    )
+    return record
+
+
+def _period(query, start: date, end: date, org_id: str | None):
+    """Restrict a query to the inclusive date range and optional organisation."""
+    query = query.where(
+        LlmUsage.created_at >= start, LlmUsage.created_at < end + timedelta(days=1)
+    )
+    if org_id:
+        query = query.where(LlmUsage.org_id == org_id)
+    return query
+
+
+async def get_daily_usage(
+    db_session: AsyncSession, start: date, end: date, org_id: str | None = None
+) -> List[Dict]:
+    """Aggregate LLM calls, tokens, cost and latency per day and organisation."""
+    # A literal unit keeps the SELECT and GROUP BY expressions identical
+    day = func.date_trunc(literal_column("'day'"), LlmUsage.created_at).label("day")
+    query = _period(select(day, LlmUsage.org_id, *_totals()), start, end, org_id)
+    result = await db_session.execute(
+        query.group_by(day, LlmUsage.org_id).order_by(day, LlmUsage.org_id)
+    )
+    return [_with_rates(row) for row in result]
+
+
+async def get_top_patients(
+    db_session: AsyncSession,
+    start: date,
+    end: date,
+    org_id: str | None = None,
+    limit: int = 20,
+) -> List[Dict]:
+    """List the patients with the most tokens in the period, with their costs."""
+    total_tokens = func.sum(LlmUsage.prompt_tokens + LlmUsage.completion_tokens)
+    query = _period(
+        select(LlmUsage.org_id, LlmUsage.patient_id, *_totals()), start, end, org_id
+    )
+    result = await db_session.execute(
+        query.group_by(LlmUsage.org_id, LlmUsage.patient_id)
+        .order_by(total_tokens.desc())
+        .limit(limit)
+    )
+    return [_with_rates(row) for row in result]
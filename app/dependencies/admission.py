@@ -0,0 +1,142 @@
+"""
+Admission control module.
+
+This module limits the summary work in flight on each worker, sheds requests
+early with 503 when they could not finish within the client's deadline, and
+cancels work as soon as the deadline passes or the client disconnects.
+"""
+
+import asyncio
+import contextlib
+import math
+import os
+import time
+from typing import AsyncIterator
+
+from fastapi import HTTPException, Request
+
+# Summaries generated concurrently per worker
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "16"))
+# Deadline, in seconds, when the client does not send X-Request-Timeout
+SUMMARY_DEFAULT_TIMEOUT = float(os.getenv("SUMMARY_DEFAULT_TIMEOUT", "60"))
+# Seconds between client disconnect checks
+DISCONNECT_POLL_INTERVAL = 0.5
+
+
+class AdmissionController:
+    """Tracks in-flight work and estimates queueing delay for new requests."""
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.waiting = 0
+        # Seeded by the first summary to finish; unknown until then
+        self.service_time: float | None = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def expected_wait(self) -> float:
+        """Estimate how long a new request would queue before starting."""
+        if self.in_flight < self.max_concurrency:
+            return 0.0
+        queued_rounds = (self.waiting + 1) / self.max_concurrency
+        return math.ceil(queued_rounds) * (self.service_time or 0.0)
+
+    def _record_service_time(self, duration: float):
+        """Update the moving average of the time one summary takes."""
+        if self.service_time is None:
+            self.service_time = duration
+        else:
+            self.service_time = 0.8 * self.service_time + 0.2 * duration
+
+    @contextlib.asynccontextmanager
+    async def admit(self, deadline: float) -> AsyncIterator[None]:
+        """
+        Admit a request that must finish by the given monotonic deadline.
+
+        Raises a 503 with Retry-After when other work is in flight and the
+        expected wait plus the typical service time would overrun the
+        deadline, or when no slot frees up in time. An idle worker always
+        admits, leaving the deadline to cut the work short.
+        """
+        remaining = deadline - time.monotonic()
+        expected_wait = self.expected_wait()
+        if (
+            self.in_flight
+            and self.service_time is not None
+            and expected_wait + self.service_time > remaining
+        ):
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please retry later",
+                headers={"Retry-After": str(max(1, math.ceil(expected_wait)))},
+            )
+
+        self.waiting += 1
+        try:
+            async with asyncio.timeout(remaining):
+                await self._semaphore.acquire()
+        except TimeoutError as e:
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please retry later",
+                headers={"Retry-After": str(max(1, math.ceil(self.expected_wait())))},
+            ) from e
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        started = time.monotonic()
+        try:
+            yield
+            self._record_service_time(time.monotonic() - started)
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+
+def get_deadline(request: Request) -> float:
+    """Return the request's monotonic deadline from X-Request-Timeout."""
+    timeout = SUMMARY_DEFAULT_TIMEOUT
+    header = request.headers.get("x-request-timeout")
+    if header:
+        try:
+            timeout = min(float(header), SUMMARY_DEFAULT_TIMEOUT)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=400, detail="Invalid X-Request-Timeout header"
+            ) from e
+    return time.monotonic() + timeout
+
+
+async def run_until_deadline(coro, request: Request, deadline: float):
+    """
+    Run work, cancelling it if the deadline passes or the client disconnects.
+
+    Cancellation propagates into the in-flight DB queries and LLM call.
+    """
+    work = asyncio.ensure_future(coro)
+
+    async def watch_disconnect():
+        while not await request.is_disconnected():
+            await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+        work.cancel()
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        async with asyncio.timeout(deadline - time.monotonic()):
+            return await work
+    except TimeoutError as e:
+        raise HTTPException(
+            status_code=504, detail="Summary generation exceeded the deadline"
+        ) from e
+    except asyncio.CancelledError:
+        if watcher.done():
+            # The client went away; nobody will read this response
+            raise HTTPException(status_code=499, detail="Client closed request")
+        raise
+    finally:
+        watcher.cancel()
+        work.cancel()
+
+
+summary_admission = AdmissionController(SUMMARY_MAX_CONCURRENCY)
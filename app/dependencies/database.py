@@ -5,11 +5,15 @@ This module provides database connection handling, session management,
 and base model configuration for SQLAlchemy integration.
 """
 
+import asyncio
 import contextlib
+import itertools
+import logging
 import os
 from typing import Any, AsyncIterator
 
 from dotenv import load_dotenv
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import (
     AsyncConnection,
     AsyncSession,
@@ -18,6 +22,8 @@ from sqlalchemy.ext.asyncio import (
 )
 from sqlalchemy.orm import DeclarativeBase
 
+logger = logging.getLogger(__name__)
+
 
 class Base(DeclarativeBase):
     """Base class for SQLAlchemy declarative models."""
@@ -26,37 +32,204 @@ class Base(DeclarativeBase):
 # Load environment variables
 load_dotenv()
 
-# Load database URL
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable is not set.")
 
-# Convert the URL to use asyncpg driver
-if DATABASE_URL.startswith("postgresql://"):
-    DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
+def to_asyncpg_url(url: str) -> str:
+    """Convert a database URL to use the asyncpg driver."""
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://")
+    return url
+
+
+def get_database_url() -> str:
+    """Read the primary database URL from the environment."""
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("DATABASE_URL environment variable is not set.")
+    return to_asyncpg_url(database_url)
+
+
+def get_replica_urls() -> list[str]:
+    """Read the optional comma-separated DATABASE_REPLICA_URLS."""
+    return [
+        to_asyncpg_url(url.strip())
+        for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",")
+        if url.strip()
+    ]
+
+
+# "least_connections" or "round_robin"
+REPLICA_SELECTION = os.getenv("REPLICA_SELECTION", "least_connections")
+
+# Seconds between replica health and lag checks
+REPLICA_HEALTH_CHECK_INTERVAL = float(os.getenv("REPLICA_HEALTH_CHECK_INTERVAL", "10"))
+
+# Maximum replica lag, in seconds, tolerated by background regeneration
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+
+# A replica that has replayed all the WAL it received is not lagging, even
+# if the primary has been idle since the last replayed transaction
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE("
+    "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class Replica:
+    """
+    A read replica engine with its health, lag and in-flight session count.
+
+    Health and lag are unknown (None) until the first check, and a replica
+    is not used before one check has passed.
+    """
+
+    def __init__(self, host: str, engine_kwargs: dict[str, Any]):
+        self.engine = create_async_engine(host, **engine_kwargs)
+        self.sessionmaker = async_sessionmaker(autocommit=False, bind=self.engine)
+        self.name = self.engine.url.render_as_string(hide_password=True)
+        self.healthy: bool | None = None
+        self.lag: float | None = None
+        self.in_flight = 0
+
+    async def check(self):
+        """Refresh the replica's health and replication lag."""
+        try:
+            async with self.engine.connect() as connection:
+                self.lag = float(await connection.scalar(REPLICA_LAG_QUERY))
+            if self.healthy is False:
+                logger.info("Replica %s is healthy again", self.name)
+            self.healthy = True
+        except Exception as e:
+            if self.healthy is not False:
+                logger.warning("Replica %s failed health check: %s", self.name, e)
+            self.healthy = False
+            self.lag = None
 
 
 class DatabaseSessionManager:
-    """Manages database sessions and connections for the application."""
+    """
+    Manages database sessions and connections for the application.
+
+    Engines are created on first use rather than at import, reading
+    DATABASE_URL and DATABASE_REPLICA_URLS when no hosts are given.
+    """
 
-    def __init__(self, host: str, engine_kwargs: dict[str, Any] = {}):
-        self._engine = create_async_engine(host, **engine_kwargs)
+    def __init__(
+        self,
+        host: str | None = None,
+        engine_kwargs: dict[str, Any] = {},
+        replica_hosts: list[str] | None = None,
+    ):
+        self._host = host
+        self._engine_kwargs = engine_kwargs
+        self._replica_hosts = replica_hosts
+        self._engine = None
+        self._sessionmaker = None
+        self._replicas = []
+        self._round_robin = itertools.count()
+        self._health_check_task = None
+
+    def _ensure_initialized(self):
+        """Create the primary and replica engines if not done yet."""
+        if self._engine is not None:
+            return
+        host = self._host or get_database_url()
+        replica_hosts = (
+            self._replica_hosts
+            if self._replica_hosts is not None
+            else get_replica_urls()
+        )
+        self._engine = create_async_engine(host, **self._engine_kwargs)
         self._sessionmaker = async_sessionmaker(autocommit=False, bind=self._engine)
+        self._replicas = [
+            Replica(replica, self._engine_kwargs) for replica in replica_hosts
+        ]
 
     async def close(self):
         """Close the database connection and cleanup resources."""
         if self._engine is None:
             raise RuntimeError("DatabaseSessionManager is not initialized")
+        if self._health_check_task is not None:
+            self._health_check_task.cancel()
+            self._health_check_task = None
         await self._engine.dispose()
+        for replica in self._replicas:
+            await replica.engine.dispose()
 
         self._engine = None
         self._sessionmaker = None
+        self._replicas = []
+
+    def start_health_checks(self, interval: float = REPLICA_HEALTH_CHECK_INTERVAL):
+        """Start periodically checking replica health and lag in the background."""
+        self._ensure_initialized()
+        if not self._replicas or self._health_check_task is not None:
+            return
+
+        async def run_checks():
+            while True:
+                await asyncio.gather(*(replica.check() for replica in self._replicas))
+                await asyncio.sleep(interval)
+
+        self._health_check_task = asyncio.create_task(run_checks())
+
+    def choose_replica(self, max_lag: float | None = None) -> Replica | None:
+        """
+        Pick a healthy replica for read-only work, or None for the primary.
+
+        Replicas not yet checked, failing their checks or lagging more than
+        max_lag seconds are skipped, so callers that need fresh data fall
+        back to the primary.
+        """
+        self._ensure_initialized()
+        candidates = [
+            replica
+            for replica in self._replicas
+            if replica.healthy is True and (max_lag is None or replica.lag <= max_lag)
+        ]
+        if not candidates:
+            return None
+
+        offset = next(self._round_robin) % len(candidates)
+        candidates = candidates[offset:] + candidates[:offset]
+        if REPLICA_SELECTION == "round_robin":
+            return candidates[0]
+        return min(candidates, key=lambda replica: replica.in_flight)
+
+    def pool_status(self) -> dict[str, Any]:
+        """Report connection pool usage and replica health."""
+        self._ensure_initialized()
+        pool = self._engine.pool
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "healthy": replica.healthy,
+                    "lag_seconds": replica.lag,
+                    "in_flight": replica.in_flight,
+                }
+                for replica in self._replicas
+            ],
+        }
+
+    async def warm_up(self, connections: int):
+        """Open pooled connections ahead of traffic and check the primary."""
+
+        async def ping():
+            async with self.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+
+        await asyncio.gather(*(ping() for _ in range(connections)))
+        await asyncio.gather(*(replica.check() for replica in self._replicas))
 
     @contextlib.asynccontextmanager
     async def connect(self) -> AsyncIterator[AsyncConnection]:
         """Provide an async context manager for database connections."""
-        if self._engine is None:
-            raise RuntimeError("DatabaseSessionManager is not initialized")
+        self._ensure_initialized()
 
         async with self._engine.begin() as connection:
             try:
@@ -66,12 +239,17 @@ class DatabaseSessionManager:
                 raise
 
     @contextlib.asynccontextmanager
-    async def session(self) -> AsyncIterator[AsyncSession]:
+    async def session(
+        self, replica: Replica | None = None
+    ) -> AsyncIterator[AsyncSession]:
         """Provide an async context manager for database sessions."""
-        if self._sessionmaker is None:
-            raise RuntimeError("DatabaseSessionManager is not initialized")
+        self._ensure_initialized()
 
-        session = self._sessionmaker()
+        if replica is None:
+            session = self._sessionmaker()
+        else:
+            session = replica.sessionmaker()
+            replica.in_flight += 1
         try:
             yield session
         except Exception:
@@ -79,9 +257,37 @@ class DatabaseSessionManager:
             raise
         finally:
             await session.close()
+            if replica is not None:
+                replica.in_flight -= 1
+
+    @contextlib.asynccontextmanager
+    async def snapshot_session(
+        self, snapshot_id: str | None = None, replica: Replica | None = None
+    ) -> AsyncIterator[AsyncSession]:
+        """
+        Provide a session in a read-only REPEATABLE READ transaction.
+
+        If snapshot_id is given, the transaction imports that exported snapshot
+        so several sessions can read the same consistent state concurrently.
+        Sessions sharing a snapshot must use the same replica (or the primary).
+        """
+        async with self.session(replica) as session:
+            await session.connection(
+                execution_options={
+                    "isolation_level": "REPEATABLE READ",
+                    "postgresql_readonly": True,
+                }
+            )
+            if snapshot_id is not None:
+                await session.execute(text(f"SET TRANSACTION SNAPSHOT '{snapshot_id}'"))
+            yield session
+
+    async def export_snapshot(self, session: AsyncSession) -> str:
+        """Export the snapshot of a session opened with snapshot_session."""
+        return await session.scalar(text("SELECT pg_export_snapshot()"))
 
 
-sessionmanager = DatabaseSessionManager(DATABASE_URL)
+sessionmanager = DatabaseSessionManager()
 
 
 async def get_db_session():
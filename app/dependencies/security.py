@@ -5,7 +5,12 @@ This module handles JWT token validation using JWKS (JSON Web Key Sets)
 from Azure AD B2C, providing authentication services for the API.
 """
 
+import asyncio
+import hashlib
+import logging
 import os
+import time
+from collections import OrderedDict
 
 import jwt
 import requests
@@ -14,6 +19,15 @@ from jwt.algorithms import RSAAlgorithm
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Maximum number of verified token payloads kept in memory
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+# Seconds after which the public keys are refetched
+JWKS_MAX_AGE = float(os.getenv("JWKS_MAX_AGE", "3600"))
+# Minimum seconds between refetches of the public keys
+JWKS_MIN_REFRESH_INTERVAL = float(os.getenv("JWKS_MIN_REFRESH_INTERVAL", "60"))
+
 
 async def fetch_jwks():
     """Fetch JSON Web Key Set from the authentication provider."""
@@ -23,7 +37,7 @@ async def fetch_jwks():
 
     jwks_uri = f"{base_uri.rstrip('/')}/.well-known/jwks"
     try:
-        response = requests.get(jwks_uri, timeout=30)
+        response = await asyncio.to_thread(requests.get, jwks_uri, timeout=30)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -47,33 +61,102 @@ async def get_public_keys():
 class TokenValidator:
     """Handles JWT token validation using public keys."""
 
-    def __init__(self):
+    def __init__(
+        self,
+        cache_size: int = TOKEN_CACHE_SIZE,
+        max_age: float = JWKS_MAX_AGE,
+        min_refresh_interval: float = JWKS_MIN_REFRESH_INTERVAL,
+    ):
         self.public_keys = None
+        self.keys_fetched_at = None
+        self.max_age = max_age
+        self.min_refresh_interval = min_refresh_interval
+        self._cache_size = cache_size
+        self._verified_tokens = OrderedDict()
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_attempted_at = 0.0
+
+    async def refresh_keys(self):
+        """Fetch the public keys from the JWKS endpoint."""
+        self.public_keys = await get_public_keys()
+        self.keys_fetched_at = time.time()
+
+    async def _get_key(self, kid: str):
+        """
+        Return the public key for a key ID, refetching the keys if needed.
+
+        Keys are refetched once they are older than max_age, and when a
+        token names an unknown key ID, as after the provider rotates its
+        signing key. Refetches happen at most once per min_refresh_interval,
+        so forged key IDs cannot flood the endpoint, and a failed refetch
+        keeps the current keys.
+        """
+        async with self._refresh_lock:
+            now = time.time()
+            if self.public_keys is None:
+                await self.refresh_keys()
+            elif now - self._refresh_attempted_at >= self.min_refresh_interval and (
+                kid not in self.public_keys or now - self.keys_fetched_at > self.max_age
+            ):
+                self._refresh_attempted_at = now
+                try:
+                    await self.refresh_keys()
+                except RuntimeError as e:
+                    logger.warning("Keeping current JWKS after refresh failed: %s", e)
+        return self.public_keys.get(kid)
+
+    def _get_cached_payload(self, token_hash: str):
+        """Return a cached payload for the token hash if it has not expired."""
+        entry = self._verified_tokens.get(token_hash)
+        if entry is None:
+            return None
+
+        expires_at, payload = entry
+        if expires_at <= time.time():
+            del self._verified_tokens[token_hash]
+            return None
+
+        self._verified_tokens.move_to_end(token_hash)
+        return payload
+
+    def _cache_payload(self, token_hash: str, payload: dict):
+        """Store a verified payload, evicting the least recently used entry."""
+        if "exp" not in payload:
+            # Without an expiry there is no safe point to drop the entry
+            return
+        self._verified_tokens[token_hash] = (payload["exp"], payload)
+        self._verified_tokens.move_to_end(token_hash)
+        while len(self._verified_tokens) > self._cache_size:
+            self._verified_tokens.popitem(last=False)
 
     async def validate_token(self, token: str):
         """Validate and decode the provided JWT token using public keys."""
-        try:
-            # Initialize public keys if not already done
-            if self.public_keys is None:
-                self.public_keys = await get_public_keys()
+        token_hash = hashlib.sha256(token.encode()).hexdigest()
+        payload = self._get_cached_payload(token_hash)
+        if payload is not None:
+            return payload
 
+        try:
             # Get the key ID from token header
             token_headers = jwt.get_unverified_header(token)
             if "kid" not in token_headers:
                 raise jwt.InvalidTokenError("No 'kid' in token header")
 
             kid = token_headers["kid"]
-            if kid not in self.public_keys:
+            key = await self._get_key(kid)
+            if key is None:
                 raise jwt.InvalidTokenError(f"Key ID '{kid}' not found in JWKS")
 
-            # Decode and validate the token
-            key = self.public_keys[kid]
-            payload = jwt.decode(
+            # Decode and validate the token off the event loop, since RS256
+            # verification is CPU-bound
+            payload = await asyncio.to_thread(
+                jwt.decode,
                 token,
                 key=key,
                 algorithms=["RS256"],
                 options={"verify_aud": False},  # Add other options as needed
             )
+            self._cache_payload(token_hash, payload)
             return payload
 
         except jwt.ExpiredSignatureError as exc:
@@ -82,3 +165,11 @@ class TokenValidator:
             raise jwt.InvalidTokenError(f"Invalid token: {str(e)}") from e
         except Exception as e:
             raise jwt.InvalidTokenError(f"Token validation failed: {str(e)}")
+
+
+def has_permission(payload: dict, permission: str) -> bool:
+    """Check whether a validated token grants a permission."""
+    return permission in (payload.get("permissions") or [])
+
+
+token_validator = TokenValidator()
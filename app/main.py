@@ -1,12 +1,25 @@
 """FastAPI application entry point for MELO AI patient summaries."""
 
+import logging
+import time
 from contextlib import asynccontextmanager
 
+IMPORT_STARTED = time.monotonic()
+
 import uvicorn
 from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
 
 from app.dependencies.database import sessionmanager
-from app.routers import patient_summary
+from app.routers import cohort, health, patient_summary, prefetch, profiles, usage
+from app.services.affinity import CLUSTER_NODES_FILE, patient_affinity
+from app.services.encoding import COMPRESS_MIN_BYTES
+from app.services.offload import cpu_offload, loop_lag
+from app.services.prefetch import prefetcher
+from app.services.usage_ledger import usage_ledger
+from app.services.warmup import start_llm_checks, state, stop_llm_checks, warm_up
+
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
@@ -14,7 +27,20 @@ async def lifespan(_application: FastAPI):
     """
     Function that handles startup and shutdown events.
     """
+    loop_lag.start()
+    sessionmanager.start_health_checks()
+    patient_affinity.start_refresh(CLUSTER_NODES_FILE)
+    await warm_up()
+    start_llm_checks()
+    prefetcher.start()
+    usage_ledger.start()
     yield
+    stop_llm_checks()
+    await prefetcher.stop()
+    await usage_ledger.stop()
+    await patient_affinity.close()
+    cpu_offload.shutdown()
+    loop_lag.stop()
     if sessionmanager._engine is not None:
         # Close the DB connection
         await sessionmanager.close()
@@ -31,8 +57,19 @@ async def root():
     return {"message": "Hello from Melo!"}
 
 
+# Compresses large responses not already compressed by their route
+app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_BYTES)
+
 # Routers
+app.include_router(health.router)
 app.include_router(patient_summary.router)
+app.include_router(cohort.router)
+app.include_router(prefetch.router)
+app.include_router(profiles.router)
+app.include_router(usage.router)
+
+state["import_seconds"] = round(time.monotonic() - IMPORT_STARTED, 3)
+logger.info("App imported in %.2f seconds", state["import_seconds"])
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", reload=True, port=8000)
@@ -1,94 +1,142 @@
-"""Module containing simplified database models for AI processing."""
+"""
+Module containing simplified database models for AI processing.
 
-from app.models.database import AbcSubmissions, AbsSubmissions, OasmnrSubmissions
+These are lean, read-only mappings of the few tables the summary path reads,
+declared on their own base without relationships so importing them does not
+pull in and configure the full generated schema in app.models.database.
+"""
 
+import datetime
+import uuid
+from typing import Optional
 
-class SimplifiedOasmnr(OasmnrSubmissions):
+from sqlalchemy import ARRAY, Enum, Integer, String, Text, Uuid
+from sqlalchemy.dialects.postgresql import TIMESTAMP
+from sqlalchemy.orm import DeclarativeBase, Mapped, deferred, mapped_column
+
+
+class SimplifiedBase(DeclarativeBase):
+    """Base class for the lean read-only models."""
+
+
+class SimplifiedPatient(SimplifiedBase):
+    """Simplified patient model with the fields used to select patients."""
+
+    __tablename__ = "patients"
+
+    id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True)
+    org_id: Mapped[str] = mapped_column(Text)
+    ward_id: Mapped[Optional[uuid.UUID]] = mapped_column(Uuid)
+    status: Mapped[str] = mapped_column(
+        Enum("ACTIVE", "DISCHARGED", "DELETED", name="PatientStatus")
+    )
+
+
+class SimplifiedBookmark(SimplifiedBase):
+    """Simplified patient bookmark model used to prefetch summaries."""
+
+    __tablename__ = "patient_bookmarks"
+
+    user_id: Mapped[str] = mapped_column(Text, primary_key=True)
+    patient_id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True)
+
+
+class SimplifiedOasmnr(SimplifiedBase):
     """Simplified OASMNR model with essential fields for AI processing."""
 
-    __tablename__ = None  # Use parent's table
-
-    # Explicitly declare we want to inherit these columns
-    __mapper_args__ = {
-        "polymorphic_identity": "simplified_oasmnr",
-        "include_properties": [
-            "id",
-            "patient_id",
-            "time_of_behaviour",
-            "behaviour",
-            "severity",
-            "antecedent",
-            "intervention",
-            "recordings",
-            "status",
-            "assessment_type",
-            "contributing_factors",
-            "antecedent_other",
-            "intervention_other",
-            "severity_score",
-            "intrusiveness",
-        ],
-    }
-
-
-class SimplifiedAbc(AbcSubmissions):
+    __tablename__ = "oasmnr_submissions"
+
+    id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True)
+    patient_id: Mapped[uuid.UUID] = mapped_column(Uuid)
+    time_of_behaviour: Mapped[datetime.datetime] = mapped_column(TIMESTAMP(precision=3))
+    behaviour: Mapped[str] = mapped_column(
+        Enum("VA", "PO", "PS", "PP", "VC", "NC", "E", "TO", name="OASMNRBehaviours")
+    )
+    severity: Mapped[int] = mapped_column(Integer)
+    antecedent: Mapped[int] = mapped_column(Integer)
+    intervention: Mapped[str] = mapped_column(String(1))
+    recordings: Mapped[int] = mapped_column(Integer)
+    status: Mapped[str] = mapped_column(
+        Enum("ACTIVE", "DELETED", name="AssessmentStatus")
+    )
+    assessment_type: Mapped[str] = mapped_column(Text)
+    contributing_factors: Mapped[Optional[list]] = mapped_column(
+        ARRAY(
+            Enum(
+                "StructuredActivity",
+                "NoisyEnvironment",
+                "RecentEpilepticFit",
+                name="ContributingFactors",
+                _create_events=False,
+            )
+        )
+    )
+    antecedent_other: Mapped[Optional[str]] = mapped_column(Text)
+    intervention_other: Mapped[Optional[str]] = mapped_column(Text)
+    severity_score: Mapped[Optional[int]] = mapped_column(Integer)
+    intrusiveness: Mapped[Optional[int]] = mapped_column(Integer)
+    # Only used by fingerprint queries, so never loaded into prompt rows
+    updated_at: Mapped[datetime.datetime] = deferred(
+        mapped_column(TIMESTAMP(precision=3))
+    )
+
+
+class SimplifiedAbc(SimplifiedBase):
     """Simplified ABC model with essential fields for AI processing."""
 
-    __tablename__ = None  # Use parent's table
-
-    # Explicitly declare we want to inherit these columns
-    __mapper_args__ = {
-        "polymorphic_identity": "simplified_oasmnr",
-        "include_properties": [
-            "id",
-            "patient_id",
-            "severity",
-            "occurred_at",
-            "status",
-            "additional_comments",
-            "actions_taken",
-            "before_events",
-            "behaviour",
-            "environment",
-            "perceived_feelings",
-            "location",
-            "people_present",
-            "restraint_techniques",
-        ],
-    }
-
-
-class SimplifiedAbs(AbsSubmissions):
+    __tablename__ = "abc_submissions"
+
+    id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True)
+    patient_id: Mapped[uuid.UUID] = mapped_column(Uuid)
+    severity: Mapped[int] = mapped_column(Integer)
+    occurred_at: Mapped[datetime.datetime] = mapped_column(TIMESTAMP(precision=3))
+    status: Mapped[str] = mapped_column(
+        Enum("ACTIVE", "DELETED", name="AssessmentStatus")
+    )
+    additional_comments: Mapped[Optional[str]] = mapped_column(Text)
+    actions_taken: Mapped[Optional[list]] = mapped_column(ARRAY(Text()))
+    before_events: Mapped[Optional[list]] = mapped_column(ARRAY(Text()))
+    behaviour: Mapped[Optional[list]] = mapped_column(ARRAY(Text()))
+    environment: Mapped[Optional[list]] = mapped_column(ARRAY(Text()))
+    perceived_feelings: Mapped[Optional[list]] = mapped_column(ARRAY(Text()))
+    location: Mapped[Optional[list]] = mapped_column(ARRAY(Text()))
+    people_present: Mapped[Optional[list]] = mapped_column(ARRAY(Text()))
+    restraint_techniques: Mapped[Optional[list]] = mapped_column(ARRAY(Text()))
+    # Only used by fingerprint queries, so never loaded into prompt rows
+    updated_at: Mapped[datetime.datetime] = deferred(
+        mapped_column(TIMESTAMP(precision=3))
+    )
+
+
+class SimplifiedAbs(SimplifiedBase):
     """Simplified ABS model with essential fields for AI processing."""
 
-    __tablename__ = None  # Use parent's table
-
-    # Explicitly declare we want to inherit these columns
-    __mapper_args__ = {
-        "polymorphic_identity": "simplified_abs",
-        "include_properties": [
-            "id",
-            "patient_id",
-            "anger",
-            "attention",
-            "emotion_trigger",
-            "impulsivity",
-            "fluctuating_mood",
-            "pulling_equipment",
-            "repetitive_behaviour",
-            "restlessness",
-            "self_abusiveness",
-            "self_stimulation",
-            "talking",
-            "uncooperative",
-            "violence",
-            "wandering",
-            "observation_start",
-            "observation_location",
-            "status",
-            "updated_at",
-            "additional_comments",
-            "score",
-            "severity",
-        ],
-    }
+    __tablename__ = "abs_submissions"
+
+    id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True)
+    patient_id: Mapped[uuid.UUID] = mapped_column(Uuid)
+    anger: Mapped[int] = mapped_column(Integer)
+    attention: Mapped[int] = mapped_column(Integer)
+    emotion_trigger: Mapped[int] = mapped_column(Integer)
+    impulsivity: Mapped[int] = mapped_column(Integer)
+    fluctuating_mood: Mapped[int] = mapped_column(Integer)
+    pulling_equipment: Mapped[int] = mapped_column(Integer)
+    repetitive_behaviour: Mapped[int] = mapped_column(Integer)
+    restlessness: Mapped[int] = mapped_column(Integer)
+    self_abusiveness: Mapped[int] = mapped_column(Integer)
+    self_stimulation: Mapped[int] = mapped_column(Integer)
+    talking: Mapped[int] = mapped_column(Integer)
+    uncooperative: Mapped[int] = mapped_column(Integer)
+    violence: Mapped[int] = mapped_column(Integer)
+    wandering: Mapped[int] = mapped_column(Integer)
+    observation_start: Mapped[datetime.datetime] = mapped_column(TIMESTAMP(precision=3))
+    observation_location: Mapped[str] = mapped_column(Text)
+    status: Mapped[str] = mapped_column(
+        Enum("ACTIVE", "DELETED", name="AssessmentStatus")
+    )
+    updated_at: Mapped[datetime.datetime] = mapped_column(TIMESTAMP(precision=3))
+    additional_comments: Mapped[Optional[str]] = mapped_column(Text)
+    score: Mapped[Optional[int]] = mapped_column(Integer)
+    severity: Mapped[Optional[str]] = mapped_column(
+        Enum("NORMAL", "MILD", "MODERATE", "SEVERE", name="SeverityLevels")
+    )
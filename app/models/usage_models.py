@@ -0,0 +1,65 @@
+"""
+Module containing the models owned by the summary service.
+
+Unlike the read-only models, these tables are written by this service and
+created by it on startup when missing.
+"""
+
+import datetime
+import uuid
+from typing import Optional
+
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Float,
+    Identity,
+    Index,
+    Integer,
+    Text,
+    Uuid,
+    func,
+)
+from sqlalchemy.dialects.postgresql import TIMESTAMP
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+
+class UsageBase(DeclarativeBase):
+    """Base class for the tables owned by the summary service."""
+
+
+class LlmUsage(UsageBase):
+    """One LLM call with its token usage, latency and cost."""
+
+    __tablename__ = "llm_usage_ledger"
+    __table_args__ = (
+        Index("llm_usage_ledger_org_id_created_at_idx", "org_id", "created_at"),
+        Index("llm_usage_ledger_patient_id_created_at_idx", "patient_id", "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        TIMESTAMP(timezone=True), server_default=func.now()
+    )
+    org_id: Mapped[Optional[str]] = mapped_column(Text)
+    patient_id: Mapped[uuid.UUID] = mapped_column(Uuid)
+    prompt_version: Mapped[str] = mapped_column(Text)
+    source: Mapped[str] = mapped_column(Text)
+    deployment: Mapped[str] = mapped_column(Text)
+    prompt_tokens: Mapped[int] = mapped_column(Integer)
+    cached_tokens: Mapped[int] = mapped_column(Integer)
+    completion_tokens: Mapped[int] = mapped_column(Integer)
+    cache_hit: Mapped[bool] = mapped_column(Boolean)
+    latency_ms: Mapped[Optional[int]] = mapped_column(Integer)
+    cost: Mapped[Optional[float]] = mapped_column(Float)
+
+
+class PatientDataVersion(UsageBase):
+    """A patient's data version per submission type, kept by triggers."""
+
+    __tablename__ = "patient_data_versions"
+
+    patient_id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True)
+    submission_type: Mapped[str] = mapped_column(Text, primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger)
+    changed_at: Mapped[datetime.datetime] = mapped_column(TIMESTAMP(timezone=True))
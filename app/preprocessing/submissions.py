@@ -1,9 +1,30 @@
 import json
-import os
+from functools import lru_cache
+from datetime import timedelta
+from io import StringIO
 from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Dict, List
+
+ABS_SCALE_FIELDS = [
+    "anger",
+    "attention",
+    "emotion_trigger",
+    "impulsivity",
+    "fluctuating_mood",
+    "pulling_equipment",
+    "repetitive_behaviour",
+    "restlessness",
+    "self_abusiveness",
+    "self_stimulation",
+    "talking",
+    "uncooperative",
+    "violence",
+    "wandering",
+]
 
 
 # Convert submissions to dictionaries
+@lru_cache(maxsize=1)
 def load_mappings():
     """Load mapping configurations from JSON file."""
     # Get the directory containing this file
@@ -18,106 +39,200 @@ def load_mappings():
         return json.load(f)
 
 
-def preprocess_submissions(submissions):
-    """Process and map submission values to their corresponding display values."""
+def to_dict(submission) -> Dict:
+    """
+    Convert an ORM submission, or a row dict, to a dictionary of its columns.
+
+    Loaded columns are listed in table order, since the order of an ORM
+    object's attribute dictionary varies between processes.
+    """
+    if isinstance(submission, dict):
+        return dict(submission)
+    loaded = submission.__dict__
+    return {k: loaded[k] for k in submission.__table__.columns.keys() if k in loaded}
+
+
+def preprocess_submission(submission) -> Dict:
+    """Map a single OASMNR/SASBA submission's values to display values."""
     mappings = load_mappings()
+    submission = to_dict(submission)
+
+    # Map contributing factors
+    if submission.get("contributing_factors"):
+        submission["contributing_factors"] = [
+            mappings["contributing_factors_map"].get(factor, factor)
+            for factor in submission["contributing_factors"]
+        ]
+
+    # Map other fields
+    submission["behaviour"] = mappings["behaviour_map"].get(
+        submission.get("behaviour"), submission.get("behaviour")
+    )
+    submission["antecedent"] = mappings["antecedent_map"].get(
+        submission.get("antecedent"), submission.get("antecedent")
+    )
+    submission["intervention"] = mappings["intervention_map"].get(
+        submission.get("intervention"), submission.get("intervention")
+    )
+
+    return submission
+
+
+def preprocess_abc_submission(submission) -> Dict:
+    """Map a single ABC submission's values to display values."""
+    mappings = load_mappings()
+    submission = to_dict(submission)
 
-    submissions_dict = [
-        {k: v for k, v in submission.__dict__.items() if not k.startswith("_")}
-        for submission in submissions
-    ]
-
-    for submission in submissions_dict:
-        # Map contributing factors
-        if submission.get("contributing_factors"):
-            submission["contributing_factors"] = [
-                mappings["contributing_factors_map"].get(factor, factor)
-                for factor in submission["contributing_factors"]
-            ]
-
-        # Map other fields
-        submission["behaviour"] = mappings["behaviour_map"].get(
-            submission.get("behaviour"), submission.get("behaviour")
-        )
-        submission["antecedent"] = mappings["antecedent_map"].get(
-            submission.get("antecedent"), submission.get("antecedent")
-        )
-        submission["intervention"] = mappings["intervention_map"].get(
-            submission.get("intervention"), submission.get("intervention")
-        )
+    submission["severity"] = mappings["abc_severity_map"].get(
+        submission.get("severity"), submission.get("severity")
+    )
 
-    return submissions_dict
+    return submission
 
 
-def preprocess_abc(submissions):
-    """Process and map ABC submission values to their corresponding display values."""
+def preprocess_abs_submission(submission) -> Dict:
+    """Map a single ABS submission's values to display values."""
     mappings = load_mappings()
+    submission = to_dict(submission)
 
-    submissions_dict = [
-        {k: v for k, v in submission.__dict__.items() if not k.startswith("_")}
-        for submission in submissions
-    ]
-
-    for submission in submissions_dict:
-        submission["severity"] = mappings["abc_severity_map"].get(
-            submission.get("severity"), submission.get("severity")
+    for field in ABS_SCALE_FIELDS:
+        submission[field] = mappings["abs_scale_map"].get(
+            submission.get(field), submission.get(field)
         )
 
-    return submissions_dict
+    return submission
 
 
-def preprocess_abs(submissions):
-    """Process and map ABS submission values to their corresponding display values."""
-    mappings = load_mappings()
+def preprocess_submissions(submissions):
+    """Process and map submission values to their corresponding display values."""
+    return [preprocess_submission(submission) for submission in submissions]
 
-    submissions_dict = [
-        {k: v for k, v in submission.__dict__.items() if not k.startswith("_")}
-        for submission in submissions
-    ]
 
-    for submission in submissions_dict:
-        submission["anger"] = mappings["abs_scale_map"].get(
-            submission.get("anger"), submission.get("anger")
-        )
-        submission["attention"] = mappings["abs_scale_map"].get(
-            submission.get("attention"), submission.get("attention")
-        )
-        submission["emotion_trigger"] = mappings["abs_scale_map"].get(
-            submission.get("emotion_trigger"), submission.get("emotion_trigger")
-        )
-        submission["impulsivity"] = mappings["abs_scale_map"].get(
-            submission.get("impulsivity"), submission.get("impulsivity")
-        )
-        submission["fluctuating_mood"] = mappings["abs_scale_map"].get(
-            submission.get("fluctuating_mood"), submission.get("fluctuating_mood")
-        )
-        submission["pulling_equipment"] = mappings["abs_scale_map"].get(
-            submission.get("pulling_equipment"), submission.get("pulling_equipment")
-        )
-        submission["repetitive_behaviour"] = mappings["abs_scale_map"].get(
-            submission.get("repetitive_behaviour"),
-            submission.get("repetitive_behaviour"),
-        )
-        submission["restlessness"] = mappings["abs_scale_map"].get(
-            submission.get("restlessness"), submission.get("restlessness")
-        )
-        submission["self_abusiveness"] = mappings["abs_scale_map"].get(
-            submission.get("self_abusiveness"), submission.get("self_abusiveness")
-        )
-        submission["self_stimulation"] = mappings["abs_scale_map"].get(
-            submission.get("self_stimulation"), submission.get("self_stimulation")
-        )
-        submission["talking"] = mappings["abs_scale_map"].get(
-            submission.get("talking"), submission.get("talking")
-        )
-        submission["uncooperative"] = mappings["abs_scale_map"].get(
-            submission.get("uncooperative"), submission.get("uncooperative")
-        )
-        submission["violence"] = mappings["abs_scale_map"].get(
-            submission.get("violence"), submission.get("violence")
-        )
-        submission["wandering"] = mappings["abs_scale_map"].get(
-            submission.get("wandering"), submission.get("wandering")
-        )
+def preprocess_abc(submissions):
+    """Process and map ABC submission values to their corresponding display values."""
+    return [preprocess_abc_submission(submission) for submission in submissions]
+
 
-    return submissions_dict
+def preprocess_abs(submissions):
+    """Process and map ABS submission values to their corresponding display values."""
+    return [preprocess_abs_submission(submission) for submission in submissions]
+
+
+async def serialize_rows(rows: AsyncIterable[Dict]) -> str:
+    """
+    Serialise a stream of row dictionaries for the prompt.
+
+    Produces the same text as str() on a list of the rows, but consumes them
+    one at a time so the full list is never held in memory.
+    Returns an empty string when there are no rows.
+    """
+    buffer = StringIO()
+    async for row in rows:
+        buffer.write(", " if buffer.tell() else "[")
+        buffer.write(repr(row))
+    if not buffer.tell():
+        return ""
+    buffer.write("]")
+    return buffer.getvalue()
+
+
+# Free-text fields moved out of rows into incident notes, with the time field
+# of each submission type
+FREE_TEXT_FIELDS = {
+    "OASMNR": (["antecedent_other", "intervention_other"], "time_of_behaviour"),
+    "SASBA": (["antecedent_other", "intervention_other"], "time_of_behaviour"),
+    "ABS": (["additional_comments"], "observation_start"),
+    "ABC": (["additional_comments"], "occurred_at"),
+}
+
+
+async def extract_notes(
+    rows: AsyncIterable[Dict], source: str, notes: List[Dict]
+) -> AsyncIterator[Dict]:
+    """
+    Move free-text fields out of streamed rows into a list of incident notes.
+
+    Rows are passed on without their free text, so the bulk of the prompt
+    stays structured while the notes can be selected by relevance.
+    """
+    fields, time_field = FREE_TEXT_FIELDS[source]
+    async for row in rows:
+        for field in fields:
+            text = row.pop(field, None)
+            if text and text.strip():
+                notes.append(
+                    {
+                        "id": f"{row['id']}:{field}",
+                        "source": source,
+                        "time": row.get(time_field),
+                        "field": field,
+                        "text": text.strip(),
+                    }
+                )
+        yield row
+
+
+# Fields that must match for consecutive OASMNR/SASBA rows to form an episode
+EPISODE_KEY_FIELDS = ["behaviour", "antecedent", "intervention", "contributing_factors"]
+# Numeric fields reported as their maximum over an episode
+EPISODE_MAX_FIELDS = ["severity", "severity_score", "intrusiveness"]
+
+
+def _episode_key(row: Dict):
+    """Return the values that identify near-identical recordings."""
+    return tuple(
+        tuple(value) if isinstance(value, list) else value
+        for value in (row.get(field) for field in EPISODE_KEY_FIELDS)
+    )
+
+
+def _to_episode(run: List[Dict]) -> Dict:
+    """Merge a run of near-identical rows into a single episode record."""
+    if len(run) == 1:
+        return run[0]
+
+    episode = {field: run[0].get(field) for field in EPISODE_KEY_FIELDS}
+    episode["episode_count"] = len(run)
+    episode["recordings"] = sum(row.get("recordings") or 0 for row in run)
+    episode["first_time_of_behaviour"] = run[0].get("time_of_behaviour")
+    episode["last_time_of_behaviour"] = run[-1].get("time_of_behaviour")
+    for field in EPISODE_MAX_FIELDS:
+        values = [row[field] for row in run if row.get(field) is not None]
+        episode[f"max_{field}"] = max(values) if values else None
+    return episode
+
+
+async def compress_episodes(
+    rows: AsyncIterable[Dict], max_gap: timedelta
+) -> AsyncIterator[Dict]:
+    """
+    Merge runs of near-identical OASMNR/SASBA rows into episode records.
+
+    Rows must arrive in time order. Consecutive rows with the same behaviour,
+    antecedent, intervention and contributing factors, each within max_gap of
+    the previous one, become one record with the episode count, summed
+    recordings, time span and maximum severity. Single rows pass through
+    unchanged, so recording totals stay exact.
+    """
+    run = []
+    async for row in rows:
+        if run:
+            previous = run[-1]
+            gap_ok = (
+                row.get("time_of_behaviour") is not None
+                and previous.get("time_of_behaviour") is not None
+                and row["time_of_behaviour"] - previous["time_of_behaviour"] <= max_gap
+            )
+            if not gap_ok or _episode_key(row) != _episode_key(previous):
+                yield _to_episode(run)
+                run = []
+        run.append(row)
+    if run:
+        yield _to_episode(run)
+
+
+async def tap(rows: AsyncIterable[Dict], callback) -> AsyncIterator[Dict]:
+    """Pass rows through unchanged, calling callback on each one."""
+    async for row in rows:
+        callback(row)
+        yield row
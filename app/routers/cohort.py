@@ -0,0 +1,110 @@
+"""
+Cohort router module.
+
+This module provides ward- and organisation-level behaviour analytics for
+managers, computed across all patients at once instead of per patient.
+"""
+
+import logging
+import os
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+
+from app.dependencies.admission import (
+    get_deadline,
+    run_until_deadline,
+    summary_admission,
+)
+from app.dependencies.security import has_permission
+from app.routers.patient_summary import (
+    SUMMARY_CACHE_CONTROL,
+    etag_matches,
+    get_token_payload,
+)
+from app.schemas.frameworks import CohortResponse
+from app.services.cohort import add_narrative, get_cohort_report
+from app.services.encoding import EncodedBody, ModelEncoder, encoded_response
+
+logger = logging.getLogger(__name__)
+
+# Token permission required to read cohort analytics
+COHORT_PERMISSION = os.getenv("COHORT_PERMISSION", "cohort:read")
+
+# Cohort responses are encoded with a serializer built once
+encode_cohort = ModelEncoder(CohortResponse)
+
+router = APIRouter(
+    prefix="/cohort",
+    tags=["cohort"],
+    responses={
+        304: {"description": "Not modified"},
+        400: {"description": "Neither ward_id nor org_id given"},
+        401: {"description": "Invalid or expired token"},
+        403: {"description": "Forbidden - insufficient permissions"},
+        503: {"description": "Server busy - retry after the Retry-After delay"},
+        504: {"description": "Narrative could not be generated before the deadline"},
+    },
+)
+
+
+@router.get("/analytics", response_model=CohortResponse)
+async def get_cohort_analytics(
+    request: Request,
+    ward_id: str | None = None,
+    org_id: str | None = None,
+    weeks: int = Query(12, ge=1, le=104),
+    narrative: bool = False,
+    token_payload: dict = Depends(get_token_payload),
+    if_none_match: str | None = Header(default=None),
+):
+    """
+    Fetch behaviour trends across all active patients of a ward or organisation.
+
+    Reports weekly incident rates and ABS scores, severity distributions and
+    top antecedents over the last `weeks` weeks. With narrative=true a single
+    LLM call describes the aggregates; it is subject to the same admission
+    control and X-Request-Timeout deadline as patient summaries.
+    """
+    if not has_permission(token_payload, COHORT_PERMISSION):
+        raise HTTPException(status_code=403, detail="Cohort analytics not permitted")
+    if not ward_id and not org_id:
+        raise HTTPException(status_code=400, detail="ward_id or org_id is required")
+
+    try:
+        etag, report = await get_cohort_report(org_id, ward_id, weeks, narrative)
+    except Exception as e:
+        logger.error("Error computing cohort analytics: %s", str(e))
+        raise HTTPException(
+            status_code=500, detail="Error computing cohort analytics"
+        ) from e
+
+    cache_headers = {
+        "ETag": etag,
+        "Cache-Control": SUMMARY_CACHE_CONTROL,
+        "Vary": "Authorization",
+    }
+    # The ETag is known from the aggregates, so a matching client never
+    # waits for or pays for a narrative
+    if etag_matches(etag, if_none_match):
+        return Response(status_code=304, headers=cache_headers)
+
+    if narrative:
+        try:
+            deadline = get_deadline(request)
+            async with summary_admission.admit(deadline):
+                report = await run_until_deadline(
+                    add_narrative(report), request, deadline
+                )
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error("Error generating cohort narrative: %s", str(e))
+            raise HTTPException(
+                status_code=500, detail="Error generating cohort narrative"
+            ) from e
+
+    return await encoded_response(
+        EncodedBody(encode_cohort(report)),
+        request.headers.get("accept-encoding"),
+        cache_headers,
+    )
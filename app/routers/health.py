@@ -0,0 +1,92 @@
+"""
+Health router module.
+
+This module provides liveness and readiness endpoints for the orchestrator,
+and a readiness details endpoint for operators reporting warm-up results,
+connection pool state, JWKS key freshness, LLM reachability and event loop
+lag.
+"""
+
+import os
+import time
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
+
+from app.dependencies.admission import summary_admission
+from app.dependencies.database import sessionmanager
+from app.dependencies.security import has_permission, token_validator
+from app.routers.patient_summary import get_token_payload
+from app.services.affinity import patient_affinity
+from app.services.offload import cpu_offload, loop_lag
+from app.services.warmup import recheck_readiness, state
+
+# Permission required to read readiness details, which name internal hosts
+HEALTH_PERMISSION = os.getenv("HEALTH_PERMISSION", "health:read")
+
+router = APIRouter(tags=["health"])
+
+
+async def require_health_permission(
+    token_payload: dict = Depends(get_token_payload),
+):
+    """Reject tokens without the health details permission."""
+    if not has_permission(token_payload, HEALTH_PERMISSION):
+        raise HTTPException(status_code=403, detail="Health details not permitted")
+
+
+@router.get("/healthz")
+async def healthz():
+    """Report that the process is alive and serving requests."""
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readyz():
+    """
+    Report whether the service is warmed up and able to serve summaries.
+
+    Returns 503 until warm-up has finished and the database is reachable.
+    """
+    ready = await recheck_readiness()
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready})
+
+
+@router.get(
+    "/readyz/details",
+    dependencies=[Depends(require_health_permission)],
+    responses={
+        401: {"description": "Invalid or expired token"},
+        403: {"description": "Forbidden - insufficient permissions"},
+    },
+)
+async def readyz_details():
+    """
+    Report readiness with warm-up timings and the state of each dependency.
+
+    LLM reachability is the result of the latest background check.
+    """
+    ready = await recheck_readiness()
+    keys_age = (
+        round(time.time() - token_validator.keys_fetched_at, 1)
+        if token_validator.keys_fetched_at
+        else None
+    )
+    llm_checked_at = state["llm_checked_at"]
+    return {
+        "ready": ready,
+        "import_seconds": state["import_seconds"],
+        "startup_seconds": state["startup_seconds"],
+        "first_request_seconds": state["first_request_seconds"],
+        "components": state["components"],
+        "database_pool": sessionmanager.pool_status(),
+        "jwks_keys_age_seconds": keys_age,
+        "llm_reachable": state["llm_reachable"],
+        "llm_checked_seconds_ago": (
+            round(time.monotonic() - llm_checked_at, 1) if llm_checked_at else None
+        ),
+        "summaries_in_flight": summary_admission.in_flight,
+        "cluster": patient_affinity.status(),
+        "cpu_offload": cpu_offload.stats(),
+        "event_loop_lag": loop_lag.stats(),
+    }
@@ -5,25 +5,49 @@ This module provides API routes for retrieving AI-generated patient summaries,
 including authentication and authorization handling.
 """
 
+import os
+
 import jwt
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
-from app.data.patient_submissions import get_ai_tags
-from app.dependencies.core import DBSessionDep
-from app.dependencies.security import TokenValidator
+from app.data.patient_submissions import get_data_fingerprint
+from app.dependencies.admission import (
+    get_deadline,
+    run_until_deadline,
+    summary_admission,
+)
+from app.dependencies.database import sessionmanager
+from app.dependencies.security import has_permission, token_validator
 from app.schemas.frameworks import SummaryResponse
-from app.services.summary import get_patient_summary
+from app.services.affinity import patient_affinity
+from app.services.encoding import ModelEncoder, encoded_response
+from app.services.profiling import phase, profiler
+from app.services.summary import get_patient_summary, get_summary_etag
+from app.services.summary_cache import summary_cache
+from app.services.warmup import record_first_request
 
 security = HTTPBearer()
 
+# Summaries hold patient data, so shared caches must revalidate per user
+SUMMARY_CACHE_CONTROL = os.getenv("SUMMARY_CACHE_CONTROL", "private, no-cache")
+
+# Token permission required to profile requests and read profiles
+PROFILE_PERMISSION = os.getenv("PROFILE_PERMISSION", "summary:profile")
+
+# Summary responses are encoded with a serializer built once
+encode_summary = ModelEncoder(SummaryResponse)
+
 router = APIRouter(
     prefix="/patient/summary",
     tags=["patient summary"],
     responses={
+        304: {"description": "Not modified"},
         404: {"description": "Not found"},
         401: {"description": "Invalid or expired token"},
         403: {"description": "Forbidden - insufficient permissions"},
+        503: {"description": "Server busy - retry after the Retry-After delay"},
+        504: {"description": "Summary could not be generated before the deadline"},
     },
 )
 
@@ -33,7 +57,7 @@ async def get_token_payload(
 ):
     """Validate and extract payload from JWT token."""
     try:
-        return await TokenValidator().validate_token(credentials.credentials)
+        return await token_validator.validate_token(credentials.credentials)
     except jwt.ExpiredSignatureError as exc:
         raise HTTPException(status_code=401, detail="Token has expired") from exc
     except jwt.InvalidTokenError as e:
@@ -44,20 +68,47 @@ async def get_token_payload(
         ) from e
 
 
+def etag_matches(etag: str, if_none_match: str | None) -> bool:
+    """Check an If-None-Match header against an ETag using weak comparison."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in (tag.removeprefix("W/") for tag in candidates)
+
+
 @router.get("/{patient_id}", response_model=SummaryResponse)
 async def get_summary(
     patient_id: str,
-    db_session: DBSessionDep,
+    request: Request,
     token_payload: dict = Depends(get_token_payload),
+    if_none_match: str | None = Header(default=None),
 ):
     """
     Fetch the AI generated summary of a specific patient.
     Requires valid JWT token in Authorization header.
 
+    Answers 304 Not Modified when If-None-Match matches the current ETag,
+    which only needs a cheap fingerprint query, and serves a summary cached
+    (or prefetched) for that ETag without calling the LLM. Generation is
+    admitted only if it can finish within the client's X-Request-Timeout
+    (seconds), and is cancelled when that deadline passes or the client
+    disconnects. Requests for patients owned by another node are forwarded
+    (or redirected) there so each patient is cached on one node. Database
+    sessions are held only for the duration of each query, so no pooled
+    connection stays checked out while the LLM generates the summary.
+    Large bodies are compressed with brotli or gzip when the client
+    accepts it.
+
+    Users with the PROFILE_PERMISSION permission can add an X-Profile: 1
+    header or ?profile=1 to profile the request; the profile id is returned
+    in the X-Profile-Id header.
+
     Args:
         patient_id: The unique identifier of the patient
-        db_session: Database session dependency
+        request: Incoming request, used for the deadline, disconnects and
+            Accept-Encoding
         token_payload: Validated JWT token payload
+        if_none_match: ETag(s) of the client's cached copy
 
     Returns:
         SummaryResponse: The AI-generated patient summary
@@ -65,12 +116,66 @@ async def get_summary(
     Raises:
         HTTPException:
             - 401 if authentication fails
+            - 403 if profiling is requested without the profiling permission
             - 404 if patient not found
+            - 503 if the server is too busy to meet the deadline
+            - 504 if the deadline passes during generation
     """
-    summary = await get_patient_summary(db_session, patient_id)
+    if request.headers.get("x-profile") == "1" or request.query_params.get(
+        "profile"
+    ) in ("1", "true"):
+        if not has_permission(token_payload, PROFILE_PERMISSION):
+            raise HTTPException(status_code=403, detail="Profiling not permitted")
+        async with profiler.profile(patient_id) as profile:
+            result = await serve_summary(patient_id, request, if_none_match)
+        if profile is not None:
+            result.headers["X-Profile-Id"] = profile.id
+        return result
+
+    return await serve_summary(patient_id, request, if_none_match)
+
+
+async def serve_summary(
+    patient_id: str, request: Request, if_none_match: str | None
+) -> Response:
+    """Serve a summary from the owning node, the cache or a new generation."""
+    owner = patient_affinity.remote_owner(patient_id, request)
+    if owner is not None:
+        routed = await patient_affinity.route(owner, request)
+        if routed is not None:
+            return routed
+
+    deadline = get_deadline(request)
+    with phase("fingerprint"):
+        async with sessionmanager.session() as db_session:
+            fingerprint = await get_data_fingerprint(db_session, patient_id)
+    etag = get_summary_etag(fingerprint)
+    cache_headers = {
+        "ETag": etag,
+        "Cache-Control": SUMMARY_CACHE_CONTROL,
+        "Vary": "Authorization",
+    }
+    if etag_matches(etag, if_none_match):
+        return Response(status_code=304, headers=cache_headers)
+    accept_encoding = request.headers.get("accept-encoding")
+
+    if summary_cache.get(patient_id, etag) is not None:
+        body = summary_cache.body(patient_id, encode_summary)
+        return await encoded_response(body, accept_encoding, cache_headers)
+
+    async with summary_admission.admit(deadline):
+        summary = await run_until_deadline(
+            get_patient_summary(patient_id, previous=summary_cache.latest(patient_id)),
+            request,
+            deadline,
+        )
     if not summary:
         raise HTTPException(status_code=404, detail=f"Patient {patient_id} not found")
+    # A lagging replica may have returned older data than the primary's
+    # fingerprint describes, so cache under the fingerprint of the data read
+    cache_headers["ETag"] = get_summary_etag(summary["fingerprint"])
+    summary_cache.put(patient_id, cache_headers["ETag"], summary)
 
-    ai_tags = await get_ai_tags(db_session, patient_id)
-
-    return {"summary": summary, "ai_tags": ai_tags}
+    record_first_request()
+    body = summary_cache.body(patient_id, encode_summary)
+    return await encoded_response(body, accept_encoding, cache_headers)
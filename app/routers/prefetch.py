@@ -0,0 +1,130 @@
+"""
+Prefetch router module.
+
+This module provides routes the front end calls when a clinician's session
+starts or a ward list is shown, queueing low-priority summary generation for
+the patients likely to be opened next, and reports prefetch effectiveness.
+Patients owned by other nodes are handed to those nodes to prefetch.
+"""
+
+import asyncio
+import os
+from typing import List
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Request
+
+from app.data.patient_submissions import get_bookmarked_patient_ids, get_patient_ids
+from app.dependencies.database import REPLICA_MAX_LAG_SECONDS, sessionmanager
+from app.dependencies.security import has_permission
+from app.routers.patient_summary import get_token_payload
+from app.services.affinity import FORWARDED_HEADER, patient_affinity
+from app.services.prefetch import prefetcher
+
+# Permission required to prefetch an arbitrary list of patients
+PREFETCH_PERMISSION = os.getenv("PREFETCH_PERMISSION", "summary:prefetch")
+# Maximum number of patients in one prefetch list or ward
+PREFETCH_MAX_PATIENTS = int(os.getenv("PREFETCH_MAX_PATIENTS", "200"))
+
+router = APIRouter(
+    prefix="/prefetch",
+    tags=["prefetch"],
+    responses={401: {"description": "Invalid or expired token"}},
+)
+
+
+async def schedule(patient_ids: List[str], request: Request) -> dict:
+    """
+    Queue the patients this node owns and have their owners queue the rest.
+
+    The request is repeated on each owning node with the user's token and
+    that node's patients as the body, so no node needs more permission than
+    the user has. A node receiving a repeated request queues only the
+    patients it owns and passes nothing on.
+    """
+    if request.headers.get(FORWARDED_HEADER):
+        local = [
+            patient_id
+            for patient_id in patient_ids
+            if patient_affinity.owns(patient_id)
+        ]
+        return {"queued": await prefetcher.schedule(local), "forwarded": 0}
+
+    groups = patient_affinity.partition(patient_ids, request)
+    local = groups.pop(None, [])
+    replies = await asyncio.gather(
+        *(
+            patient_affinity.forward_json(owner, request.url.path, ids, request)
+            for owner, ids in groups.items()
+        )
+    )
+    return {
+        "queued": await prefetcher.schedule(local),
+        "forwarded": sum(
+            len(ids) for ids, reply in zip(groups.values(), replies) if reply
+        ),
+    }
+
+
+@router.post("/session", status_code=202)
+async def prefetch_session(
+    request: Request, token_payload: dict = Depends(get_token_payload)
+):
+    """Queue summaries of the patients the signed-in user has bookmarked."""
+    user_id = token_payload.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Token has no subject")
+
+    async with sessionmanager.session(
+        sessionmanager.choose_replica(REPLICA_MAX_LAG_SECONDS)
+    ) as db_session:
+        patient_ids = await get_bookmarked_patient_ids(db_session, user_id)
+    return await schedule(patient_ids, request)
+
+
+@router.post("/wards/{ward_id}", status_code=202)
+async def prefetch_ward(
+    ward_id: str, request: Request, token_payload: dict = Depends(get_token_payload)
+):
+    """
+    Queue summaries of the active patients on a ward.
+
+    Requires the PREFETCH_PERMISSION permission, and queues at most
+    PREFETCH_MAX_PATIENTS patients of the ward.
+    """
+    if not has_permission(token_payload, PREFETCH_PERMISSION):
+        raise HTTPException(status_code=403, detail="Prefetch not permitted")
+    async with sessionmanager.session(
+        sessionmanager.choose_replica(REPLICA_MAX_LAG_SECONDS)
+    ) as db_session:
+        patient_ids = await get_patient_ids(
+            db_session, ward_id=ward_id, limit=PREFETCH_MAX_PATIENTS
+        )
+    return await schedule(patient_ids, request)
+
+
+@router.post("/patients", status_code=202)
+async def prefetch_patients(
+    request: Request,
+    patient_ids: List[str] = Body(...),
+    token_payload: dict = Depends(get_token_payload),
+):
+    """
+    Queue summaries of the given patients.
+
+    Requires the PREFETCH_PERMISSION permission, and at most
+    PREFETCH_MAX_PATIENTS patients per request.
+    """
+    if not has_permission(token_payload, PREFETCH_PERMISSION):
+        raise HTTPException(status_code=403, detail="Prefetch not permitted")
+    if len(patient_ids) > PREFETCH_MAX_PATIENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {PREFETCH_MAX_PATIENTS} patients per request",
+        )
+    return await schedule(patient_ids, request)
+
+
+@router.get("/stats")
+async def prefetch_stats(_token_payload: dict = Depends(get_token_payload)):
+    """Report prefetch hit rate, wasted generations and queue state."""
+    return prefetcher.stats()
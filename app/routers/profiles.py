@@ -0,0 +1,71 @@
+"""
+Profiles router module.
+
+This module lets administrators list and download the request profiles
+captured by the summary endpoint's opt-in profiling mode.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.dependencies.security import has_permission
+from app.routers.patient_summary import PROFILE_PERMISSION, get_token_payload
+from app.services.profiling import profiler
+
+router = APIRouter(
+    prefix="/profiles",
+    tags=["profiles"],
+    responses={
+        401: {"description": "Invalid or expired token"},
+        403: {"description": "Forbidden - insufficient permissions"},
+        404: {"description": "Not found"},
+    },
+)
+
+
+async def require_profile_permission(
+    token_payload: dict = Depends(get_token_payload),
+):
+    """Reject tokens without the profiling permission."""
+    if not has_permission(token_payload, PROFILE_PERMISSION):
+        raise HTTPException(status_code=403, detail="Profiling not permitted")
+
+
+def get_profile(profile_id: str):
+    """Return a kept profile or raise 404."""
+    profile = profiler.profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    return profile
+
+
+@router.get("", dependencies=[Depends(require_profile_permission)])
+async def list_profiles():
+    """List the kept profiles, newest last, and how many were rate-limited."""
+    return {
+        "profiles": [
+            {
+                "id": profile.id,
+                "patient_id": profile.patient_id,
+                "wall_seconds": profile.wall_seconds,
+            }
+            for profile in profiler.profiles.values()
+        ],
+        "skipped": profiler.skipped,
+    }
+
+
+@router.get("/{profile_id}", dependencies=[Depends(require_profile_permission)])
+async def read_profile(profile_id: str):
+    """Return a profile's phase timings, CPU shares and top allocations."""
+    return get_profile(profile_id).report()
+
+
+@router.get(
+    "/{profile_id}/folded",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(require_profile_permission)],
+)
+async def read_profile_folded(profile_id: str):
+    """Return a profile's CPU samples in collapsed-stack flamegraph format."""
+    return get_profile(profile_id).folded()
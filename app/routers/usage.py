@@ -0,0 +1,77 @@
+"""
+Usage router module.
+
+This module reports the LLM usage ledger, aggregated by day and organisation
+or by patient, for cost accounting and capacity planning.
+"""
+
+import os
+from datetime import date, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.data.usage import get_daily_usage, get_top_patients
+from app.dependencies.database import sessionmanager
+from app.dependencies.security import has_permission
+from app.routers.patient_summary import get_token_payload
+from app.services.usage_ledger import usage_ledger
+
+# Permission required to read usage reports
+USAGE_PERMISSION = os.getenv("USAGE_PERMISSION", "usage:read")
+# Days covered by a report when no start date is given
+USAGE_DEFAULT_DAYS = 30
+
+router = APIRouter(
+    prefix="/usage",
+    tags=["usage"],
+    responses={
+        400: {"description": "Invalid date range"},
+        401: {"description": "Invalid or expired token"},
+        403: {"description": "Forbidden - insufficient permissions"},
+    },
+)
+
+
+async def require_usage_permission(
+    token_payload: dict = Depends(get_token_payload),
+):
+    """Reject tokens without the usage reporting permission."""
+    if not has_permission(token_payload, USAGE_PERMISSION):
+        raise HTTPException(status_code=403, detail="Usage reports not permitted")
+
+
+def get_period(start: date | None = None, end: date | None = None) -> tuple[date, date]:
+    """Resolve the inclusive report period, defaulting to the last 30 days."""
+    end = end or date.today()
+    start = start or end - timedelta(days=USAGE_DEFAULT_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return start, end
+
+
+@router.get("/daily", dependencies=[Depends(require_usage_permission)])
+async def daily_usage(
+    period: tuple[date, date] = Depends(get_period),
+    org_id: str | None = None,
+):
+    """Return calls, tokens, cost and latency per day and organisation."""
+    async with sessionmanager.session(sessionmanager.choose_replica()) as db_session:
+        days = await get_daily_usage(db_session, *period, org_id)
+    return {
+        "start": period[0],
+        "end": period[1],
+        "days": days,
+        "pending": usage_ledger.pending,
+    }
+
+
+@router.get("/patients", dependencies=[Depends(require_usage_permission)])
+async def patient_usage(
+    period: tuple[date, date] = Depends(get_period),
+    org_id: str | None = None,
+    limit: int = Query(20, ge=1, le=500),
+):
+    """Return the patients with the highest token usage in the period."""
+    async with sessionmanager.session(sessionmanager.choose_replica()) as db_session:
+        patients = await get_top_patients(db_session, *period, org_id, limit)
+    return {"start": period[0], "end": period[1], "patients": patients}
@@ -1,6 +1,53 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_serializer
+
+
+class SummarySection(BaseModel):
+    key: str
+    title: str
+    content: str = Field(..., description="Empty when there is no relevant data")
+    regenerated: bool = Field(
+        ..., description="False when reused from the previous summary"
+    )
+
+
+class AiTags(BaseModel):
+    oasmnr_count: int | None = Field(None, description="OASMNR recordings")
+    sasba_count: int | None = Field(None, description="SASBA recordings")
+    abs_count: int | None = Field(None, description="ABS submissions")
+    abc_count: int | None = Field(None, description="ABC submissions")
+
+    @model_serializer(mode="wrap")
+    def omit_missing(self, handler):
+        """Leave out counts of submission types the patient has none of."""
+        return {key: value for key, value in handler(self).items() if value}
 
 
 class SummaryResponse(BaseModel):
     summary: str
-    ai_tags: dict = Field(..., description="Counts of OASMNR and SASBA submissions")
+    sections: list[SummarySection] = Field(default_factory=list)
+    ai_tags: AiTags = Field(..., description="Counts of submissions per type")
+    analytics: dict = Field(
+        default_factory=dict,
+        description="Weekly rates, deltas, severity means and change points",
+    )
+
+
+class CohortResponse(BaseModel):
+    org_id: str | None = None
+    ward_id: str | None = None
+    since: str = Field(..., description="Start date of the first reported week")
+    patients: int = Field(..., description="Active patients in the cohort")
+    weekly: dict = Field(
+        default_factory=dict,
+        description="Weekly incidents, rates and mean severity or score per type",
+    )
+    severity: dict = Field(
+        default_factory=dict, description="Incident counts per severity level"
+    )
+    top_antecedents: dict = Field(
+        default_factory=dict,
+        description="Most common antecedents (ABC: before-events) per type",
+    )
+    narrative: str | None = Field(
+        None, description="LLM description of the aggregates, when requested"
+    )
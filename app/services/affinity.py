@@ -0,0 +1,250 @@
+"""
+Patient Affinity Routing.
+
+This module maps each patient to an owning node with a consistent-hash ring,
+so every request and prefetch for a patient lands on the same pod and its
+in-memory caches. Non-owners forward (or redirect) to the owner. Membership
+comes from CLUSTER_NODES or a CLUSTER_NODES_FILE that is re-read on scale
+events; virtual nodes keep the share of patients that move small.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+from fastapi import Request, Response
+from fastapi.responses import RedirectResponse
+
+logger = logging.getLogger(__name__)
+
+# Base URL other nodes use to reach this node, e.g. http://10.0.0.5:8000
+NODE_URL = os.getenv("NODE_URL", "")
+# Comma-separated base URLs of all nodes, including this one
+CLUSTER_NODES = os.getenv("CLUSTER_NODES", "")
+# Optional file listing node URLs one per line, re-read periodically
+CLUSTER_NODES_FILE = os.getenv("CLUSTER_NODES_FILE", "")
+# Seconds between membership file checks
+CLUSTER_REFRESH_INTERVAL = float(os.getenv("CLUSTER_REFRESH_INTERVAL", "10"))
+# "forward" proxies requests to the owner, "redirect" answers 307
+AFFINITY_MODE = os.getenv("AFFINITY_MODE", "forward")
+# Seconds allowed for a forwarded request
+FORWARD_TIMEOUT = float(os.getenv("FORWARD_TIMEOUT", "90"))
+# Points per node on the ring
+RING_VNODES = 128
+
+# Marks forwarded requests so the receiver serves them locally
+FORWARDED_HEADER = "x-forwarded-by-node"
+# Request headers passed on to the owner
+FORWARD_REQUEST_HEADERS = ("authorization", "if-none-match", "x-request-timeout")
+# Response headers passed back from the owner
+FORWARD_RESPONSE_HEADERS = ("etag", "cache-control", "vary", "retry-after")
+
+
+def _hash(value: str) -> int:
+    """Hash a string to a position on the ring."""
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+def parse_nodes(value: str) -> List[str]:
+    """Parse node URLs separated by commas or newlines."""
+    return sorted(
+        {node.strip().rstrip("/") for node in value.replace("\n", ",").split(",")}
+        - {""}
+    )
+
+
+class HashRing:
+    """Consistent-hash ring of nodes with virtual nodes."""
+
+    def __init__(self, nodes: List[str], vnodes: int = RING_VNODES):
+        self.vnodes = vnodes
+        self.nodes: List[str] = []
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self.set_nodes(nodes)
+
+    def set_nodes(self, nodes: List[str]):
+        """Rebuild the ring for a new set of nodes."""
+        ring = sorted(
+            (_hash(f"{node}#{i}"), node) for node in nodes for i in range(self.vnodes)
+        )
+        self.nodes = sorted(nodes)
+        self._points = [point for point, _ in ring]
+        self._owners = [node for _, node in ring]
+
+    def owner(self, key: str) -> Optional[str]:
+        """Return the node owning a key, or None for an empty ring."""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+class PatientAffinity:
+    """Routes patient requests to their owning node."""
+
+    def __init__(self, node_url: str, nodes: List[str], mode: str):
+        self.node_url = node_url.rstrip("/")
+        self.mode = mode
+        self.ring = HashRing(nodes)
+        self.forwarded = 0
+        self.forward_failures = 0
+        self._client: Optional[httpx.AsyncClient] = None
+        self._refresh_task = None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether there are other nodes to route to."""
+        return bool(self.node_url) and len(self.ring.nodes) > 1
+
+    def remote_owner(self, patient_id: str, request: Request) -> Optional[str]:
+        """Return the owning node if another node should serve this request."""
+        if not self.enabled or request.headers.get(FORWARDED_HEADER):
+            return None
+        owner = self.ring.owner(str(patient_id))
+        return None if owner == self.node_url else owner
+
+    def owns(self, patient_id: str) -> bool:
+        """Whether this node owns a patient, ignoring how the request arrived."""
+        return not self.enabled or self.ring.owner(str(patient_id)) == self.node_url
+
+    def partition(
+        self, patient_ids: List[str], request: Request
+    ) -> Dict[Optional[str], List[str]]:
+        """Group patients by remote owner, with local patients under None."""
+        groups: Dict[Optional[str], List[str]] = {}
+        for patient_id in patient_ids:
+            groups.setdefault(self.remote_owner(patient_id, request), []).append(
+                patient_id
+            )
+        return groups
+
+    def set_nodes(self, nodes: List[str]):
+        """Apply a membership change, logging the share of patients moved."""
+        nodes = sorted(nodes)
+        if nodes == self.ring.nodes:
+            return
+        if self.node_url and nodes and self.node_url not in nodes:
+            logger.warning("This node %s is not in the cluster", self.node_url)
+
+        samples = [str(i) for i in range(1000)]
+        before = [self.ring.owner(key) for key in samples]
+        self.ring.set_nodes(nodes)
+        moved = sum(a != self.ring.owner(key) for a, key in zip(before, samples))
+        logger.info(
+            "Cluster membership changed to %s; ~%.0f%% of patients moved",
+            nodes,
+            moved / len(samples) * 100,
+        )
+
+    def start_refresh(self, path: str, interval: float = CLUSTER_REFRESH_INTERVAL):
+        """Re-read the membership file periodically in the background."""
+        if not path or self._refresh_task is not None:
+            return
+
+        async def refresh():
+            while True:
+                try:
+                    content = await asyncio.to_thread(Path(path).read_text)
+                    self.set_nodes(parse_nodes(content))
+                except OSError as e:
+                    logger.warning("Could not read cluster nodes file: %s", e)
+                await asyncio.sleep(interval)
+
+        self._refresh_task = asyncio.create_task(refresh())
+
+    async def close(self):
+        """Stop membership refreshes and close forwarding connections."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client used to reach other nodes."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=FORWARD_TIMEOUT)
+        return self._client
+
+    def _forward_headers(self, request: Request) -> Dict[str, str]:
+        """Select the request headers passed on to the owner."""
+        headers = {
+            name: request.headers[name]
+            for name in FORWARD_REQUEST_HEADERS
+            if name in request.headers
+        }
+        headers[FORWARDED_HEADER] = self.node_url
+        return headers
+
+    async def route(self, owner: str, request: Request) -> Optional[Response]:
+        """
+        Send a request to its owner by redirect or proxy.
+
+        Returns None when the owner cannot be reached, so the caller serves
+        the request locally instead of failing.
+        """
+        url = owner + request.url.path
+        if request.url.query:
+            url += "?" + request.url.query
+        if self.mode == "redirect":
+            return RedirectResponse(url, status_code=307)
+
+        try:
+            upstream = await self._get_client().request(
+                request.method,
+                url,
+                headers=self._forward_headers(request),
+                content=await request.body(),
+            )
+        except httpx.HTTPError as e:
+            self.forward_failures += 1
+            logger.warning("Forwarding to %s failed, serving locally: %s", owner, e)
+            return None
+
+        self.forwarded += 1
+        return Response(
+            content=upstream.content,
+            status_code=upstream.status_code,
+            headers={
+                name: upstream.headers[name]
+                for name in FORWARD_RESPONSE_HEADERS
+                if name in upstream.headers
+            },
+            media_type=upstream.headers.get("content-type"),
+        )
+
+    async def forward_json(
+        self, owner: str, path: str, payload, request: Request
+    ) -> Optional[Dict]:
+        """POST a JSON payload to another node, returning its JSON reply."""
+        try:
+            upstream = await self._get_client().post(
+                owner + path, json=payload, headers=self._forward_headers(request)
+            )
+            upstream.raise_for_status()
+        except httpx.HTTPError as e:
+            self.forward_failures += 1
+            logger.warning("Forwarding to %s failed: %s", owner, e)
+            return None
+        self.forwarded += 1
+        return upstream.json()
+
+    def status(self) -> Dict:
+        """Report ring membership and forwarding counters."""
+        return {
+            "node": self.node_url or None,
+            "nodes": self.ring.nodes,
+            "mode": self.mode,
+            "forwarded": self.forwarded,
+            "forward_failures": self.forward_failures,
+        }
+
+
+patient_affinity = PatientAffinity(NODE_URL, parse_nodes(CLUSTER_NODES), AFFINITY_MODE)
@@ -0,0 +1,203 @@
+"""
+Patient Analytics Service.
+
+This module computes deterministic trend statistics from a patient's
+submissions with NumPy, so the LLM is given incident rates, deltas and
+change points instead of having to infer them from raw rows.
+"""
+
+import os
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import numpy as np
+
+WEEK_SECONDS = 7 * 24 * 3600
+# Weeks averaged for the rolling incident rate
+ROLLING_WEEKS = int(os.getenv("ANALYTICS_ROLLING_WEEKS", "4"))
+# Minimum weeks on each side of a reported change point
+MIN_SEGMENT_WEEKS = 3
+# Minimum fraction of variance a change point must explain to be reported
+MIN_CHANGE_POINT_GAIN = 0.5
+
+# Time field and numeric fields collected for each submission type
+ANALYTICS_FIELDS = {
+    "OASMNR": ("time_of_behaviour", ["recordings", "severity"]),
+    "SASBA": ("time_of_behaviour", ["recordings", "severity"]),
+    "ABS": ("observation_start", ["score"]),
+    "ABC": ("occurred_at", []),
+}
+
+
+def new_columns() -> Dict[str, Dict[str, List[float]]]:
+    """Create empty column buffers for every submission type."""
+    return {
+        source: {field: [] for field in ["time", *fields]}
+        for source, (_, fields) in ANALYTICS_FIELDS.items()
+    }
+
+
+def collect_row(columns: Dict, source: str, row: Dict):
+    """Append a row's time and numeric fields to the column buffers."""
+    time_field, fields = ANALYTICS_FIELDS[source]
+    timestamp = row.get(time_field)
+    if timestamp is None:
+        return
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    buffers = columns[source]
+    buffers["time"].append(timestamp.timestamp())
+    for field in fields:
+        value = row.get(field)
+        buffers[field].append(np.nan if value is None else float(value))
+
+
+def _date(seconds: float) -> str:
+    """Format epoch seconds as an ISO date."""
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).date().isoformat()
+
+
+def detect_change_point(values: np.ndarray) -> int | None:
+    """
+    Find the single split that best separates a series into two means.
+
+    Returns the index of the first value after the change, or None if no
+    split leaves MIN_SEGMENT_WEEKS on each side and explains at least
+    MIN_CHANGE_POINT_GAIN of the variance.
+    """
+    n = len(values)
+    if n < 2 * MIN_SEGMENT_WEEKS:
+        return None
+
+    cumulative = np.concatenate([[0.0], np.cumsum(values)])
+    total_sse = np.sum(values**2) - cumulative[-1] ** 2 / n
+    if total_sse <= 0:
+        return None
+
+    splits = np.arange(MIN_SEGMENT_WEEKS, n - MIN_SEGMENT_WEEKS + 1)
+    left = cumulative[splits]
+    right = cumulative[-1] - left
+    # SSE of the two-segment fit; the sum of squares term is constant
+    split_sse = np.sum(values**2) - left**2 / splits - right**2 / (n - splits)
+    best = int(np.argmin(split_sse))
+    if 1 - split_sse[best] / total_sse < MIN_CHANGE_POINT_GAIN:
+        return None
+    return int(splits[best])
+
+
+def _incident_findings(buffers: Dict, end: float) -> Dict:
+    """
+    Summarise weekly incident counts and severity for one submission type.
+
+    Weeks are counted from the type's own first record up to end, so weeks
+    after its last record count as zero and incidents that stopped show as
+    a drop rather than as the type's last active week.
+    """
+    times = np.asarray(buffers["time"])
+    start = float(times.min())
+    weeks = int((end - start) // WEEK_SECONDS) + 1
+    week_index = ((times - start) // WEEK_SECONDS).astype(np.int64)
+    weights = (
+        np.nan_to_num(np.asarray(buffers["recordings"]), nan=1.0)
+        if "recordings" in buffers
+        else None
+    )
+    weekly = np.bincount(week_index, weights=weights, minlength=weeks)
+
+    findings = {
+        "from": _date(start),
+        "to": _date(float(times.max())),
+        "total": round(float(weekly.sum()), 2),
+        "weekly_mean": round(float(weekly.mean()), 2),
+        "last_week": round(float(weekly[-1]), 2),
+    }
+    if weeks >= 2:
+        findings["week_over_week_delta"] = round(float(weekly[-1] - weekly[-2]), 2)
+    if weeks >= 2 * ROLLING_WEEKS:
+        recent = weekly[-ROLLING_WEEKS:].mean()
+        previous = weekly[-2 * ROLLING_WEEKS : -ROLLING_WEEKS].mean()
+        findings[f"rolling_{ROLLING_WEEKS}_week_rate"] = round(float(recent), 2)
+        findings[f"previous_{ROLLING_WEEKS}_week_rate"] = round(float(previous), 2)
+
+    if "severity" in buffers:
+        severity = np.asarray(buffers["severity"])
+        valid = ~np.isnan(severity)
+        if valid.any():
+            findings["severity_mean"] = round(float(severity[valid].mean()), 2)
+            severity_sum = np.bincount(
+                week_index[valid], weights=severity[valid], minlength=weeks
+            )
+            severity_count = np.bincount(week_index[valid], minlength=weeks)
+            last_weeks = severity_count[-ROLLING_WEEKS:]
+            if last_weeks.sum():
+                findings[f"severity_mean_last_{ROLLING_WEEKS}_weeks"] = round(
+                    float(severity_sum[-ROLLING_WEEKS:].sum() / last_weeks.sum()), 2
+                )
+
+    change = detect_change_point(weekly)
+    if change is not None:
+        findings["change_point"] = {
+            "week_starting": _date(start + change * WEEK_SECONDS),
+            "weekly_mean_before": round(float(weekly[:change].mean()), 2),
+            "weekly_mean_after": round(float(weekly[change:].mean()), 2),
+        }
+    return findings
+
+
+def _abs_findings(buffers: Dict) -> Dict:
+    """Summarise the trajectory of ABS total scores."""
+    times = np.asarray(buffers["time"])
+    scores = np.asarray(buffers["score"])
+    valid = ~np.isnan(scores)
+    times, scores = times[valid], scores[valid]
+    if not len(scores):
+        return {}
+
+    findings = {
+        "first_score": float(scores[0]),
+        "last_score": float(scores[-1]),
+        "mean_score": round(float(scores.mean()), 2),
+        "max_score": float(scores.max()),
+    }
+    if len(scores) >= 2 and times[-1] > times[0]:
+        slope = np.polyfit((times - times[0]) / WEEK_SECONDS, scores, 1)[0]
+        findings["score_change_per_week"] = round(float(slope), 2)
+
+    change = detect_change_point(scores)
+    if change is not None:
+        findings["change_point"] = {
+            "date": _date(times[change]),
+            "mean_score_before": round(float(scores[:change].mean()), 2),
+            "mean_score_after": round(float(scores[change:].mean()), 2),
+        }
+    return findings
+
+
+def analyse_patient(columns: Dict, until: float | None = None) -> Dict:
+    """
+    Compute trend findings from a patient's column buffers.
+
+    Each submission type's incidents are binned into weeks from its first
+    record to the end of the period, giving weekly rates, week-over-week
+    deltas, rolling rates, severity means and a change point per type, plus
+    the ABS score trajectory. The period spans every type's records and
+    runs up to until (epoch seconds, e.g. now for live summaries) if later.
+    """
+    all_times = [t for buffers in columns.values() for t in buffers["time"]]
+    if not all_times:
+        return {}
+
+    start, end = min(all_times), max(all_times)
+    if until is not None:
+        end = max(end, until)
+    weeks = int((end - start) // WEEK_SECONDS) + 1
+    findings = {"period": {"from": _date(start), "to": _date(end), "weeks": weeks}}
+
+    for source, buffers in columns.items():
+        if not buffers["time"]:
+            continue
+        if source == "ABS":
+            findings[source] = _abs_findings(buffers)
+        else:
+            findings[source] = _incident_findings(buffers, end)
+    return findings
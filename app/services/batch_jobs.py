@@ -0,0 +1,313 @@
+"""
+Batch Job Service.
+
+This module regenerates summaries through the provider's asynchronous batch
+interface instead of synchronous chat calls. Prompts are built exactly as for
+interactive requests, written to a JSONL file, submitted as one batch job,
+polled until done, and ingested back with per-item retries.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List
+
+from app.data.patient_submissions import get_data_fingerprints, get_patient_ids
+from app.dependencies.database import REPLICA_MAX_LAG_SECONDS, sessionmanager
+from app.services.bulk_summaries import (
+    BULK_BATCH_SIZE,
+    BULK_CONCURRENCY,
+    load_checkpoint,
+    save_checkpoint,
+)
+from app.services.llm_router import Deployment, load_deployments
+from app.services.summary import (
+    NO_DATA_SUMMARY,
+    SUMMARY_RESPONSE_FORMAT,
+    build_summary_request,
+    get_prompt_version,
+    merge_sections,
+)
+from app.services.usage_ledger import usage_ledger
+
+logger = logging.getLogger(__name__)
+
+# Seconds between batch status checks
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "60"))
+# Times failed items are resubmitted in a new batch
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "2"))
+
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def get_batch_deployment() -> Deployment:
+    """
+    Return the deployment used for batch jobs.
+
+    AZURE_OPENAI_BATCH_DEPLOYMENT selects a batch deployment by name;
+    otherwise the first configured deployment is used.
+    """
+    deployments = load_deployments()
+    name = os.getenv("AZURE_OPENAI_BATCH_DEPLOYMENT")
+    for deployment in deployments:
+        if deployment.name == name:
+            return deployment
+    return deployments[0]
+
+
+def parse_usage(usage: Dict | None):
+    """Turn the usage of a batch item's response body into a usage object."""
+    if not usage:
+        return None
+    from openai.types import CompletionUsage
+
+    return CompletionUsage.model_validate(
+        {
+            "total_tokens": (usage.get("prompt_tokens") or 0)
+            + (usage.get("completion_tokens") or 0),
+            **usage,
+        }
+    )
+
+
+def batch_line(custom_id: str, messages: List[Dict], model: str) -> str:
+    """Format one chat completion request as a line of a batch input file."""
+    line = {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/chat/completions",
+        "body": {
+            "model": model,
+            "messages": messages,
+            "temperature": 0,
+            "response_format": SUMMARY_RESPONSE_FORMAT,
+        },
+    }
+    return json.dumps(line, default=str) + "\n"
+
+
+def select_requests(source: Path, path: Path, custom_ids) -> None:
+    """Copy the requests of some custom_ids to a new batch input file."""
+    with (
+        open(source, encoding="utf-8") as lines,
+        open(path, "w", encoding="utf-8") as f,
+    ):
+        for line in lines:
+            if json.loads(line)["custom_id"] in custom_ids:
+                f.write(line)
+
+
+async def submit_batch(client, path: Path) -> str:
+    """Upload a batch input file and create the batch job."""
+    with open(path, "rb") as f:
+        input_file = await client.files.create(file=f, purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/chat/completions",
+        completion_window="24h",
+    )
+    logger.info("Submitted batch %s with input file %s", batch.id, input_file.id)
+    return batch.id
+
+
+async def wait_for_batch(client, batch_id: str, poll_interval: float):
+    """Poll a batch job until it reaches a terminal status."""
+    while True:
+        batch = await client.batches.retrieve(batch_id)
+        if batch.status in TERMINAL_STATUSES:
+            logger.info("Batch %s finished with status %s", batch_id, batch.status)
+            return batch
+        logger.info("Batch %s is %s", batch_id, batch.status)
+        await asyncio.sleep(poll_interval)
+
+
+async def read_results(client, batch) -> Dict[str, Dict]:
+    """
+    Read the output and error files of a finished batch.
+
+    Returns each item's response body keyed by custom_id; failed items map
+    to None.
+    """
+    results = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        content = await client.files.content(file_id)
+        for line in content.text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            if item.get("error") or response.get("status_code") != 200:
+                logger.warning(
+                    "Batch item %s failed: %s",
+                    item["custom_id"],
+                    item.get("error") or response.get("body"),
+                )
+                results[item["custom_id"]] = None
+            else:
+                results[item["custom_id"]] = response["body"]
+    return results
+
+
+async def write_requests(
+    path: Path, patient_ids: List[str], model: str, concurrency: int
+) -> Dict[str, Dict | Exception]:
+    """
+    Build summary requests for patients and stream them to a batch input file.
+
+    Requests are built with bounded concurrency and each prompt is written
+    as soon as it is built, so only the requests in flight are held in
+    memory. Returns each patient's request without its messages, with
+    "queued" telling whether a prompt was written, or the exception raised
+    while building it.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    requests = {}
+
+    with open(path, "w", encoding="utf-8") as f:
+
+        async def build(patient_id: str):
+            async with semaphore:
+                try:
+                    request = await build_summary_request(
+                        patient_id, max_replica_lag=REPLICA_MAX_LAG_SECONDS
+                    )
+                except Exception as e:
+                    logger.error("Could not build request for %s: %s", patient_id, e)
+                    requests[patient_id] = e
+                    return
+            messages = request.pop("messages")
+            if messages is not None:
+                f.write(batch_line(patient_id, messages, model))
+            requests[patient_id] = {**request, "queued": messages is not None}
+
+        await asyncio.gather(*(build(patient_id) for patient_id in patient_ids))
+    return requests
+
+
+async def run_batch_job(
+    output: Path,
+    checkpoint_path: Path,
+    work_dir: Path,
+    org_id: str | None = None,
+    ward_id: str | None = None,
+    client=None,
+    model: str | None = None,
+    poll_interval: float = BATCH_POLL_INTERVAL,
+    max_retries: int = BATCH_MAX_RETRIES,
+) -> Dict:
+    """
+    Regenerate summaries for an organisation or ward through batch jobs.
+
+    Patients whose fingerprint is unchanged since the checkpoint are skipped.
+    Requests for the rest are streamed to a JSONL file and submitted as one
+    batch; items that fail are resubmitted up to max_retries times. Results
+    are appended to the JSONL output in the same format as bulk generation,
+    and each item's token usage is recorded in the usage ledger, priced when
+    the deployment has prices configured.
+    """
+    deployment = None
+    if client is None:
+        deployment = get_batch_deployment()
+        client, model = deployment.client, deployment.name
+    work_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint = load_checkpoint(checkpoint_path)
+    prompt_version = get_prompt_version()
+    report = {"generated": 0, "skipped": 0, "failed": 0, "batches": 0}
+    report.update(prompt_tokens=0, completion_tokens=0)
+
+    async with sessionmanager.session() as db_session:
+        patient_ids = await get_patient_ids(db_session, org_id, ward_id)
+        fingerprints = {}
+        for start in range(0, len(patient_ids), BULK_BATCH_SIZE):
+            batch_ids = patient_ids[start : start + BULK_BATCH_SIZE]
+            fingerprints.update(await get_data_fingerprints(db_session, batch_ids))
+
+    changed = [
+        patient_id
+        for patient_id, fingerprint in fingerprints.items()
+        if checkpoint.get(patient_id) != f"{fingerprint}|{prompt_version}"
+    ]
+    report["skipped"] = len(patient_ids) - len(changed)
+    input_path = work_dir / "batch_input_0.jsonl"
+    requests = await write_requests(input_path, changed, model, BULK_CONCURRENCY)
+
+    with open(output, "a", encoding="utf-8") as out:
+
+        def ingest(patient_id: str, content: str | None, request: Dict):
+            merged = (
+                merge_sections(request["sections"], content)
+                if request["sections"] is not None
+                else {"summary": NO_DATA_SUMMARY, "sections": []}
+            )
+            # Checkpointed under the data the request was built from, which
+            # a replica may lag behind
+            record = {
+                "patient_id": patient_id,
+                "fingerprint": request["fingerprint"],
+                "prompt_version": prompt_version,
+                "summary": merged["summary"],
+                "sections": merged["sections"],
+                "ai_tags": request["ai_tags"],
+                "analytics": request["analytics"],
+            }
+            out.write(json.dumps(record, default=str) + "\n")
+            checkpoint[patient_id] = f"{request['fingerprint']}|{prompt_version}"
+            report["generated"] += 1
+
+        pending = {}
+        for patient_id, request in requests.items():
+            if isinstance(request, Exception):
+                report["failed"] += 1
+            elif not request["queued"]:
+                ingest(patient_id, None, request)
+            else:
+                pending[patient_id] = request
+
+        for attempt in range(max_retries + 1):
+            if not pending:
+                break
+            if attempt:
+                # Resubmit only the failed items' prompts, as already written
+                retry_path = work_dir / f"batch_input_{attempt}.jsonl"
+                select_requests(input_path, retry_path, pending)
+                input_path = retry_path
+            batch_id = await submit_batch(client, input_path)
+            batch = await wait_for_batch(client, batch_id, poll_interval)
+            report["batches"] += 1
+
+            results = await read_results(client, batch)
+            for patient_id, body in results.items():
+                if body is None or patient_id not in pending:
+                    continue
+                usage = body.get("usage") or {}
+                report["prompt_tokens"] += usage.get("prompt_tokens") or 0
+                report["completion_tokens"] += usage.get("completion_tokens") or 0
+                usage = parse_usage(usage)
+                usage_ledger.record(
+                    patient_id,
+                    prompt_version,
+                    "batch",
+                    model,
+                    deployment.cost(usage) if deployment else None,
+                    None,
+                    usage,
+                )
+                content = body["choices"][0]["message"]["content"]
+                ingest(patient_id, content, pending.pop(patient_id))
+
+            out.flush()
+            save_checkpoint(checkpoint_path, checkpoint)
+            if pending:
+                logger.warning(
+                    "%d batch items failed on attempt %d", len(pending), attempt + 1
+                )
+
+        report["failed"] += len(pending)
+        # Patients that needed no batch item may not be checkpointed yet
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    return report
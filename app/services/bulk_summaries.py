@@ -0,0 +1,193 @@
+"""
+Bulk Summary Service.
+
+This module regenerates summaries for many patients at once, for example
+overnight. Patients are processed in batches with bounded LLM concurrency,
+results are appended to a JSONL file, and a checkpoint of data fingerprints
+lets an interrupted run resume and lets later runs skip unchanged patients.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from app.data.patient_submissions import get_data_fingerprints, get_patient_ids
+from app.dependencies.database import REPLICA_MAX_LAG_SECONDS, sessionmanager
+from app.services.summary import get_patient_summary, get_prompt_version
+
+logger = logging.getLogger(__name__)
+
+# Patients fingerprinted and checkpointed together
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "100"))
+# Concurrent LLM generations
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "8"))
+
+
+def load_checkpoint(path: Path) -> Dict[str, str]:
+    """Load the patient fingerprints recorded by previous runs."""
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(path: Path, checkpoint: Dict[str, str]):
+    """Atomically write the checkpoint so a crash never leaves it half-written."""
+    temp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(temp_path, path)
+
+
+def index_output(path: Path) -> Dict[str, Tuple[int, str]]:
+    """
+    Index the latest record of each patient in a JSONL output.
+
+    Returns each patient's record offset and the fingerprint and prompt
+    version it was generated from. A last line cut short by a crash is
+    truncated, so appending resumes on a line boundary.
+    """
+    records = {}
+    if not path.exists():
+        return records
+    with open(path, "r+b") as f:
+        offset = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                logger.warning("Dropping a partial record at the end of %s", path)
+                f.truncate(offset)
+                break
+            record = json.loads(line)
+            records[record["patient_id"]] = (
+                offset,
+                f"{record['fingerprint']}|{record['prompt_version']}",
+            )
+            offset += len(line)
+    return records
+
+
+def read_record(path: Path, offset: int) -> Dict:
+    """Read the JSONL output record starting at an offset."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return json.loads(f.readline())
+
+
+class BulkStats:
+    """Counters reported at the end of a bulk run."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.generated = 0
+        self.skipped = 0
+        self.failed = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def report(self) -> Dict:
+        """Return throughput and token usage for the run so far."""
+        elapsed = time.monotonic() - self.started
+        return {
+            "generated": self.generated,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "elapsed_seconds": round(elapsed, 1),
+            "summaries_per_minute": (
+                round(self.generated / elapsed * 60, 2) if elapsed else 0.0
+            ),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+
+async def generate_bulk_summaries(
+    output: Path,
+    checkpoint_path: Path,
+    org_id: str | None = None,
+    ward_id: str | None = None,
+    batch_size: int = BULK_BATCH_SIZE,
+    concurrency: int = BULK_CONCURRENCY,
+) -> Dict:
+    """
+    Generate summaries for every active patient in an organisation or ward.
+
+    Each batch is fingerprinted in one query. Patients whose fingerprint
+    (combined with the prompt version) matches the checkpoint are skipped,
+    which covers both resuming after a crash and unchanged data. The
+    checkpoint is saved after every batch; records written after the last
+    save count as checkpointed, so a crash does not duplicate them. The
+    patient's latest record in the output is passed as the previous
+    summary, so only sections whose inputs changed are regenerated.
+    """
+    checkpoint = load_checkpoint(checkpoint_path)
+    records = index_output(output)
+    for patient_id, (_, version) in records.items():
+        checkpoint[patient_id] = version
+    prompt_version = get_prompt_version()
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = BulkStats()
+
+    async with sessionmanager.session() as db_session:
+        patient_ids = await get_patient_ids(db_session, org_id, ward_id)
+    logger.info("Bulk generation for %d patients", len(patient_ids))
+
+    async def generate(patient_id: str, out):
+        async with semaphore:
+            try:
+                previous = (
+                    read_record(output, records[patient_id][0])
+                    if patient_id in records
+                    else None
+                )
+                result = await get_patient_summary(
+                    patient_id,
+                    max_replica_lag=REPLICA_MAX_LAG_SECONDS,
+                    previous=previous,
+                    source="bulk",
+                )
+            except Exception as e:
+                stats.failed += 1
+                logger.error("Bulk summary failed for %s: %s", patient_id, e)
+                return
+
+        # Checkpointed under the data actually read, which a replica may lag
+        fingerprint = result["fingerprint"]
+        usage = result.get("usage", {})
+        stats.generated += 1
+        stats.prompt_tokens += usage.get("prompt_tokens") or 0
+        stats.completion_tokens += usage.get("completion_tokens") or 0
+        record = {
+            "patient_id": patient_id,
+            "fingerprint": fingerprint,
+            "prompt_version": prompt_version,
+            "summary": result["summary"],
+            "sections": result["sections"],
+            "ai_tags": result["ai_tags"],
+            "analytics": result["analytics"],
+        }
+        out.write(json.dumps(record, default=str) + "\n")
+        out.flush()
+        checkpoint[patient_id] = f"{fingerprint}|{prompt_version}"
+
+    with open(output, "a", encoding="utf-8") as out:
+        for start in range(0, len(patient_ids), batch_size):
+            batch: List[str] = patient_ids[start : start + batch_size]
+            async with sessionmanager.session() as db_session:
+                fingerprints = await get_data_fingerprints(db_session, batch)
+
+            pending = []
+            for patient_id, fingerprint in fingerprints.items():
+                if checkpoint.get(patient_id) == f"{fingerprint}|{prompt_version}":
+                    stats.skipped += 1
+                    continue
+                pending.append(generate(patient_id, out))
+
+            await asyncio.gather(*pending)
+            save_checkpoint(checkpoint_path, checkpoint)
+            logger.info("Bulk progress: %s", stats.report())
+
+    return stats.report()
@@ -0,0 +1,172 @@
+"""
+Cohort Analytics.
+
+This module reports behaviour trends across all patients of a ward or
+organisation. Aggregates are computed set-wise in SQL rather than from
+per-patient summaries, cached until the cohort's data fingerprint changes,
+and optionally described by a single LLM narrative over the aggregates only.
+"""
+
+import json
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from app.data.cohort import get_cohort_aggregates, get_cohort_fingerprint
+from app.dependencies.database import sessionmanager
+from app.preprocessing.submissions import load_mappings
+from app.services.llm_router import get_llm_router
+from app.services.summary import get_summary_etag, load_prompts
+from app.services.summary_cache import SummaryCache
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of cohort reports kept in memory per worker
+COHORT_CACHE_SIZE = int(os.getenv("COHORT_CACHE_SIZE", "256"))
+# Antecedents and before-events reported per submission type
+TOP_ANTECEDENTS = 5
+
+# Name of the weekly mean reported for each submission type
+MEAN_FIELDS = {
+    "OASMNR": "mean_severity",
+    "SASBA": "mean_severity",
+    "ABS": "mean_score",
+    "ABC": "mean_severity",
+}
+
+cohort_cache = SummaryCache(COHORT_CACHE_SIZE)
+
+
+def get_period_start(weeks: int) -> datetime:
+    """Return the start of the week `weeks - 1` weeks before the current one."""
+    today = datetime.now(timezone.utc).replace(tzinfo=None)
+    monday = today.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(
+        days=today.weekday()
+    )
+    return monday - timedelta(weeks=weeks - 1)
+
+
+def shape_aggregates(aggregates: Dict[str, List[Dict]], patients: int) -> Dict:
+    """Turn aggregate rows into per-type weekly trends and distributions."""
+    mappings = load_mappings()
+    weekly = defaultdict(list)
+    for row in sorted(aggregates["weekly"], key=lambda row: row["week"]):
+        weekly[row["source"]].append(
+            {
+                "week": row["week"].date().isoformat(),
+                "submissions": row["submissions"],
+                "incidents": row["incidents"] or 0,
+                "patients": row["patients"],
+                "incidents_per_patient": (
+                    round((row["incidents"] or 0) / patients, 3) if patients else 0.0
+                ),
+                MEAN_FIELDS[row["source"]]: (
+                    None if row["mean"] is None else round(float(row["mean"]), 2)
+                ),
+            }
+        )
+
+    severity = defaultdict(dict)
+    for row in aggregates["severity"]:
+        level = row["level"]
+        if row["source"] == "ABC":
+            level = mappings["abc_severity_map"].get(level, level)
+        severity[row["source"]][level or "unknown"] = row["count"] or 0
+
+    antecedents = defaultdict(list)
+    for row in sorted(aggregates["antecedents"], key=lambda row: -(row["count"] or 0)):
+        if len(antecedents[row["source"]]) == TOP_ANTECEDENTS:
+            continue
+        name = row["antecedent"]
+        if row["source"] != "ABC":
+            name = mappings["antecedent_map"].get(name, name)
+        antecedents[row["source"]].append({"antecedent": name, "count": row["count"]})
+
+    return {
+        "weekly": dict(weekly),
+        "severity": dict(severity),
+        "top_antecedents": dict(antecedents),
+    }
+
+
+async def generate_narrative(report: Dict) -> str:
+    """Describe a cohort report's aggregates with one LLM call."""
+    prompts = load_prompts("cohort_summary")
+    aggregates = {key: report[key] for key in ("weekly", "severity", "top_antecedents")}
+    messages = [
+        {
+            "role": "system",
+            "content": "\n".join([prompts["system"], prompts["instructions"]]),
+        },
+        {
+            "role": "user",
+            "content": prompts["user"].format(
+                since=report["since"],
+                patients=report["patients"],
+                aggregates=json.dumps(aggregates, separators=(",", ":")),
+            ),
+        },
+    ]
+    response = await get_llm_router().chat_completion(messages, temperature=0)
+    return response.choices[0].message.content
+
+
+async def get_cohort_report(
+    org_id: str | None = None,
+    ward_id: str | None = None,
+    weeks: int = 12,
+    narrative: bool = False,
+) -> tuple[str, Dict]:
+    """
+    Return the ETag and report of a ward or organisation over recent weeks.
+
+    A cheap fingerprint query decides whether the cached report is still
+    valid; otherwise the aggregates are recomputed in SQL on a replica. The
+    ETag covers the data and whether a narrative is asked for, so it is known
+    before any narrative is generated; the report carries a narrative only
+    when one was already generated for the same data, see add_narrative.
+    """
+    since = get_period_start(weeks)
+    key = f"{org_id}|{ward_id}|{since.date().isoformat()}"
+    replica = sessionmanager.choose_replica()
+    async with sessionmanager.session(replica) as db_session:
+        fingerprint = await get_cohort_fingerprint(db_session, org_id, ward_id)
+        data_tag = f"cohort|{key}|{fingerprint}"
+        report = cohort_cache.get(key, get_summary_etag(data_tag))
+        if report is None:
+            aggregates = await get_cohort_aggregates(db_session, since, org_id, ward_id)
+            patients = int(fingerprint.split("|", 1)[0])
+            report = {
+                "org_id": org_id,
+                "ward_id": ward_id,
+                "since": since.date().isoformat(),
+                "patients": patients,
+                **shape_aggregates(aggregates, patients),
+                "narrative": None,
+            }
+            cohort_cache.put(key, get_summary_etag(data_tag), report)
+
+    etag = get_summary_etag(f"{data_tag}|{narrative}")
+    if not narrative:
+        return etag, {**report, "narrative": None}
+    return etag, report
+
+
+async def add_narrative(report: Dict) -> Dict:
+    """
+    Generate a cohort report's narrative unless it already has one.
+
+    The report is the cached one, so the narrative is reused while the data
+    is unchanged.
+    """
+    if report["narrative"] is None and report["patients"]:
+        report["narrative"] = await generate_narrative(report)
+        logger.info(
+            "Generated cohort narrative for %s|%s|%s",
+            report["org_id"],
+            report["ward_id"],
+            report["since"],
+        )
+    return report
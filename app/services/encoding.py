@@ -0,0 +1,132 @@
+"""
+Response Encoding.
+
+This module encodes typed responses to JSON with Pydantic serializers built
+once per model, and compresses large bodies with brotli or gzip as the
+client accepts. Summaries are served many times from the cache, so their
+encoded and compressed bodies are kept with the cache entry; small bodies
+are sent uncompressed, where compression costs more than it saves.
+"""
+
+import asyncio
+import gzip
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+# Bodies smaller than this many bytes are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+# Bodies at least this large are compressed off the event loop
+COMPRESS_THREAD_MIN_BYTES = 256 * 1024
+# Compression levels balancing ratio against CPU time per response
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+@lru_cache(maxsize=1)
+def _brotli():
+    """Return the brotli module if it is installed, else None."""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def available_encodings() -> List[str]:
+    """List the supported content codings in order of preference."""
+    return ["br", "gzip"] if _brotli() is not None else ["gzip"]
+
+
+def negotiate_encoding(accept_encoding: str | None) -> Optional[str]:
+    """Pick the preferred content coding the client accepts, if any."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in available_encodings():
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body with a supported content coding."""
+    if encoding == "br":
+        return _brotli().compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class ModelEncoder:
+    """Encodes content as one response model, with the serializer built once."""
+
+    def __init__(self, model: Any):
+        self._adapter = TypeAdapter(model)
+
+    def __call__(self, content: Any) -> bytes:
+        """Validate content against the model and encode it as JSON."""
+        return self._adapter.dump_json(self._adapter.validate_python(content))
+
+
+class EncodedBody:
+    """A JSON body with its compressed variants, compressed on first use."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self._variants: Dict[str, bytes] = {}
+
+    async def get(self, encoding: Optional[str]) -> bytes:
+        """Return the body in a content coding, or as is for None."""
+        if encoding is None:
+            return self.body
+        if encoding not in self._variants:
+            if len(self.body) >= COMPRESS_THREAD_MIN_BYTES:
+                variant = await asyncio.to_thread(compress, self.body, encoding)
+            else:
+                variant = compress(self.body, encoding)
+            self._variants[encoding] = variant
+        return self._variants[encoding]
+
+
+async def encoded_response(
+    body: EncodedBody,
+    accept_encoding: str | None,
+    headers: Dict[str, str] | None = None,
+    status_code: int = 200,
+) -> Response:
+    """
+    Build a JSON response, compressed if large and the client accepts it.
+
+    Compressed responses vary by Accept-Encoding and carry a weak ETag, as
+    their bytes differ from the uncompressed representation.
+    """
+    headers = dict(headers or {})
+    encoding = (
+        negotiate_encoding(accept_encoding)
+        if len(body.body) >= COMPRESS_MIN_BYTES
+        else None
+    )
+    vary = [value for value in [headers.get("Vary")] if value]
+    headers["Vary"] = ", ".join(vary + ["Accept-Encoding"])
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+        if headers.get("ETag", "").startswith('"'):
+            headers["ETag"] = "W/" + headers["ETag"]
+    return Response(
+        content=await body.get(encoding),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
@@ -0,0 +1,317 @@
+"""
+LLM Deployment Router.
+
+This module spreads chat completion calls across several Azure OpenAI
+deployments, tracking rolling latency, error rate and token quota per
+deployment so each request goes to the healthiest one, with failover.
+"""
+
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Number of recent calls used for the rolling latency and error rate
+WINDOW_SIZE = 50
+# Seconds a deployment is skipped after consecutive failures
+COOLDOWN_SECONDS = 30
+# Consecutive failures before a deployment is put on cooldown
+MAX_CONSECUTIVE_FAILURES = 3
+
+
+def estimate_tokens(messages: List[Dict]) -> int:
+    """Roughly estimate the prompt tokens of a list of chat messages."""
+    return sum(len(message["content"]) for message in messages) // 4
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Whether a failed call may succeed on another deployment.
+
+    Rate limits, server errors, timeouts and connection errors are; other
+    client errors such as 400 or 422 would fail the same way everywhere.
+    """
+    import openai
+
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 429) or error.status_code >= 500
+    return isinstance(error, (openai.APIConnectionError, TimeoutError))
+
+
+def get_cached_tokens(usage) -> int:
+    """Return the prompt tokens served from the provider's prefix cache."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (getattr(details, "cached_tokens", None) or 0) if details else 0
+
+
+class Deployment:
+    """A single Azure OpenAI deployment and its rolling health statistics."""
+
+    def __init__(
+        self,
+        name: str,
+        endpoint: str,
+        api_key: str,
+        weight: float = 1.0,
+        tpm_quota: Optional[int] = None,
+        max_prompt_tokens: Optional[int] = None,
+        prices: Optional[Dict[str, float]] = None,
+    ):
+        self.name = name
+        self.endpoint = endpoint
+        self.weight = weight
+        self.tpm_quota = tpm_quota
+        self.max_prompt_tokens = max_prompt_tokens
+        self.prices = prices or {}
+        # Imported here so the SDK loads on first client rather than app import
+        from openai import AsyncAzureOpenAI
+
+        self.client = AsyncAzureOpenAI(
+            api_key=api_key,
+            azure_endpoint=endpoint,
+            api_version=endpoint.split("api-version=")[1],
+        )
+
+        self._latencies = deque(maxlen=WINDOW_SIZE)
+        self._outcomes = deque(maxlen=WINDOW_SIZE)
+        self._token_usage = deque()
+        self._consecutive_failures = 0
+        self._cooldown_until = 0.0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    @property
+    def latency(self) -> float:
+        """Average latency over the rolling window, in seconds."""
+        if not self._latencies:
+            return 0.0
+        return sum(self._latencies) / len(self._latencies)
+
+    @property
+    def error_rate(self) -> float:
+        """Fraction of failed calls over the rolling window."""
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    @property
+    def cache_hit_rate(self) -> float:
+        """Fraction of prompt tokens served from the provider's prefix cache."""
+        if not self.prompt_tokens:
+            return 0.0
+        return self.cached_tokens / self.prompt_tokens
+
+    def tokens_last_minute(self) -> int:
+        """Return the tokens consumed in the last 60 seconds."""
+        cutoff = time.monotonic() - 60
+        while self._token_usage and self._token_usage[0][0] < cutoff:
+            self._token_usage.popleft()
+        return sum(tokens for _, tokens in self._token_usage)
+
+    def is_available(self, prompt_tokens: int) -> bool:
+        """Check whether the deployment can take a prompt of the given size."""
+        if time.monotonic() < self._cooldown_until:
+            return False
+        if self.max_prompt_tokens and prompt_tokens > self.max_prompt_tokens:
+            return False
+        if (
+            self.tpm_quota
+            and self.tokens_last_minute() + prompt_tokens > self.tpm_quota
+        ):
+            return False
+        return True
+
+    def score(self) -> float:
+        """Lower is better: rolling latency penalised by errors, scaled by weight."""
+        return (self.latency + 1.0) * (1.0 + 10 * self.error_rate) / self.weight
+
+    def record_success(self, latency: float, usage, estimated_tokens: int):
+        """Record a successful call and its token usage."""
+        self._latencies.append(latency)
+        self._outcomes.append(True)
+        self._consecutive_failures = 0
+        if usage is None:
+            self._token_usage.append((time.monotonic(), estimated_tokens))
+            return
+
+        self._token_usage.append((time.monotonic(), usage.total_tokens))
+        self.prompt_tokens += usage.prompt_tokens
+        self.cached_tokens += get_cached_tokens(usage)
+
+    def cost(self, usage) -> Optional[float]:
+        """
+        Price a call from its token usage, or None without configured prices.
+
+        Prices are per 1,000 tokens; cached prompt tokens use cached_price
+        when set and the prompt price otherwise.
+        """
+        if usage is None or not self.prices:
+            return None
+        cached = get_cached_tokens(usage)
+        prompt_price = self.prices.get("prompt_price", 0.0)
+        cached_price = self.prices.get("cached_price", prompt_price)
+        return (
+            (usage.prompt_tokens - cached) * prompt_price
+            + cached * cached_price
+            + usage.completion_tokens * self.prices.get("completion_price", 0.0)
+        ) / 1000
+
+    def record_failure(self):
+        """Record a failed call and put the deployment on cooldown if needed."""
+        self._outcomes.append(False)
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+            self._cooldown_until = time.monotonic() + COOLDOWN_SECONDS
+            logger.warning("Deployment %s put on cooldown", self.name)
+
+
+def load_deployments() -> List[Deployment]:
+    """
+    Load deployments from the environment.
+
+    AZURE_OPENAI_DEPLOYMENTS may hold a JSON list of objects with the keys
+    name, endpoint, api_key, weight, tpm_quota and max_prompt_tokens, plus
+    optional prompt_price, cached_price and completion_price per 1,000
+    tokens for cost accounting. Without it, the single AZURE_OPENAI_*
+    deployment is used.
+    """
+    config = os.getenv("AZURE_OPENAI_DEPLOYMENTS")
+    if config:
+        try:
+            entries = json.loads(config)
+            return [
+                Deployment(
+                    name=entry["name"],
+                    endpoint=entry["endpoint"],
+                    api_key=entry.get("api_key") or os.getenv("AZURE_OPENAI_API_KEY"),
+                    weight=entry.get("weight", 1.0),
+                    tpm_quota=entry.get("tpm_quota"),
+                    max_prompt_tokens=entry.get("max_prompt_tokens"),
+                    prices={
+                        key: entry[key]
+                        for key in ("prompt_price", "cached_price", "completion_price")
+                        if key in entry
+                    },
+                )
+                for entry in entries
+            ]
+        except (json.JSONDecodeError, KeyError, IndexError) as e:
+            raise ValueError(f"Invalid AZURE_OPENAI_DEPLOYMENTS: {str(e)}") from e
+
+    required_env_vars = [
+        "AZURE_OPENAI_API_KEY",
+        "AZURE_OPENAI_ENDPOINT",
+        "AZURE_OPENAI_DEPLOYMENT_NAME",
+    ]
+    for var in required_env_vars:
+        if not os.getenv(var):
+            logger.error("Missing environment variable: %s", var)
+            raise ValueError(f"Missing required environment variable: {var}")
+
+    return [
+        Deployment(
+            name=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+            endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        )
+    ]
+
+
+class LLMRouter:
+    """Routes chat completions to the best available deployment with failover."""
+
+    def __init__(self, deployments: List[Deployment]):
+        if not deployments:
+            raise ValueError("LLMRouter requires at least one deployment")
+        self.deployments = deployments
+
+    def rank(self, prompt_tokens: int) -> List[Deployment]:
+        """
+        Order deployments for a prompt of the given size.
+
+        Deployments with a prompt limit are tiered: the smallest tier that fits
+        is preferred, so small patients go to the cheaper model and large ones
+        to the long-context model. Within a tier the best score wins.
+        """
+        available = [d for d in self.deployments if d.is_available(prompt_tokens)]
+        if not available:
+            # Everything is throttled or cooling down: try anything that fits
+            available = [
+                d
+                for d in self.deployments
+                if not d.max_prompt_tokens or prompt_tokens <= d.max_prompt_tokens
+            ]
+        return sorted(
+            available,
+            key=lambda d: (d.max_prompt_tokens or float("inf"), d.score()),
+        )
+
+    async def chat_completion(
+        self,
+        messages: List[Dict],
+        on_success: Optional[Callable[[Deployment, float, Any], None]] = None,
+        **kwargs,
+    ):
+        """
+        Create a chat completion, failing over between deployments.
+
+        Only retryable errors fail over; other errors are raised at once
+        without counting against the deployment's health.
+
+        on_success is called with the deployment used, the latency in
+        seconds and the response usage, e.g. to record the call's cost.
+        """
+        prompt_tokens = estimate_tokens(messages)
+        candidates = self.rank(prompt_tokens)
+        if not candidates:
+            raise ValueError(
+                f"No deployment accepts a prompt of ~{prompt_tokens} tokens"
+            )
+
+        last_error = None
+        for deployment in candidates:
+            start_time = time.time()
+            try:
+                response = await deployment.client.chat.completions.create(
+                    messages=messages, model=deployment.name, **kwargs
+                )
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                deployment.record_failure()
+                logger.warning(
+                    "Deployment %s failed, trying next: %s", deployment.name, str(e)
+                )
+                last_error = e
+                continue
+
+            response_time = time.time() - start_time
+            deployment.record_success(response_time, response.usage, prompt_tokens)
+            logger.info(
+                "OpenAI API response time: %.2f seconds (deployment %s, "
+                "%d cached prompt tokens, %.0f%% cache hit rate)",
+                response_time,
+                deployment.name,
+                get_cached_tokens(response.usage) if response.usage else 0,
+                deployment.cache_hit_rate * 100,
+            )
+            if on_success is not None:
+                on_success(deployment, response_time, response.usage)
+            return response
+
+        raise RuntimeError(f"All deployments failed: {str(last_error)}") from last_error
+
+
+_router: Optional[LLMRouter] = None
+
+
+def get_llm_router() -> LLMRouter:
+    """Return the process-wide LLM router, creating it on first use."""
+    global _router
+    if _router is None:
+        _router = LLMRouter(load_deployments())
+    return _router
@@ -0,0 +1,161 @@
+"""
+CPU Offload.
+
+This module moves CPU-heavy work for very large patients off the event loop.
+Work on small inputs runs inline, where a process hop would cost more than
+it saves; work on inputs of at least OFFLOAD_MIN_ROWS rows runs in a process
+pool, so one giant patient no longer stalls every other request on the
+worker. A loop lag monitor measures how late the event loop wakes up, to
+show the effect.
+"""
+
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Rows at or above which work is sent to the process pool
+OFFLOAD_MIN_ROWS = int(os.getenv("OFFLOAD_MIN_ROWS", "5000"))
+# Worker processes in the pool; 0 runs everything inline
+OFFLOAD_WORKERS = int(os.getenv("OFFLOAD_WORKERS", str(min(2, os.cpu_count() or 1))))
+# Seconds between event loop lag probes
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+# Probes kept for the reported lag percentiles
+LOOP_LAG_WINDOW = 600
+
+
+def _import(module: str):
+    """Import a module in a worker process."""
+    importlib.import_module(module)
+
+
+class CpuOffload:
+    """Runs CPU-bound functions inline or in a process pool by input size."""
+
+    def __init__(self, workers: int, min_rows: int):
+        self.workers = workers
+        self.min_rows = min_rows
+        self.inline = 0
+        self.offloaded = 0
+        self._pool: ProcessPoolExecutor | None = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Create the process pool on first use."""
+        if self._pool is None:
+            # Spawned workers do not inherit the parent's event loop or
+            # open connections, unlike forked ones
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any work can be offloaded."""
+        return self.workers > 0
+
+    def should_offload(self, rows: int) -> bool:
+        """Whether work on this many rows is worth sending to the pool."""
+        return self.enabled and rows >= self.min_rows
+
+    async def run(self, function: Callable[..., T], *args, rows: int) -> T:
+        """
+        Call a function on rows of input, in the pool if the input is large.
+
+        The function and its arguments must be picklable; callers pass
+        plain column buffers rather than ORM objects to keep that cheap.
+        """
+        if not self.should_offload(rows):
+            self.inline += 1
+            return function(*args)
+
+        self.offloaded += 1
+        started = time.monotonic()
+        result = await asyncio.get_running_loop().run_in_executor(
+            self._get_pool(), function, *args
+        )
+        logger.info(
+            "Offloaded %s on %d rows in %.2fs",
+            function.__name__,
+            rows,
+            time.monotonic() - started,
+        )
+        return result
+
+    async def warm_up(self, module: str):
+        """Start the workers and import a module in each ahead of first use."""
+        if not self.enabled:
+            return
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        await asyncio.gather(
+            *(loop.run_in_executor(pool, _import, module) for _ in range(self.workers))
+        )
+
+    def shutdown(self):
+        """Stop the worker processes, cancelling queued work."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict:
+        """Report the pool size and how much work ran inline or offloaded."""
+        return {
+            "workers": self.workers,
+            "min_rows": self.min_rows,
+            "inline": self.inline,
+            "offloaded": self.offloaded,
+        }
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop runs a periodic wake-up."""
+
+    def __init__(self, interval: float, window: int):
+        self.interval = interval
+        self._lags: deque[float] = deque(maxlen=window)
+        self._task = None
+
+    def start(self):
+        """Start probing the event loop in the background."""
+        if self._task is not None:
+            return
+
+        async def probe():
+            while True:
+                started = time.monotonic()
+                await asyncio.sleep(self.interval)
+                self._lags.append(time.monotonic() - started - self.interval)
+
+        self._task = asyncio.create_task(probe())
+
+    def stop(self):
+        """Stop probing."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict:
+        """Report the median, 99th percentile and maximum recent lag in ms."""
+        if not self._lags:
+            return {}
+        lags = sorted(self._lags)
+        return {
+            "p50_ms": round(lags[len(lags) // 2] * 1000, 1),
+            "p99_ms": round(lags[int(len(lags) * 0.99)] * 1000, 1),
+            "max_ms": round(lags[-1] * 1000, 1),
+        }
+
+
+cpu_offload = CpuOffload(OFFLOAD_WORKERS, OFFLOAD_MIN_ROWS)
+loop_lag = LoopLagMonitor(LOOP_LAG_INTERVAL, LOOP_LAG_WINDOW)
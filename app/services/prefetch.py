@@ -0,0 +1,153 @@
+"""
+Summary Prefetch.
+
+This module speculatively generates summaries for the patients a clinician
+is likely to open next, their bookmarks and the patients on a ward they are
+viewing, so the first click usually hits a warm cache. Prefetching runs at
+low priority: it only generates while interactive traffic leaves spare LLM
+capacity, and skips patients whose cached summary is still valid.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Dict, List
+
+from app.data.patient_submissions import get_data_fingerprint, get_data_fingerprints
+from app.dependencies.admission import summary_admission
+from app.dependencies.database import REPLICA_MAX_LAG_SECONDS, sessionmanager
+from app.services.llm_router import get_llm_router
+from app.services.summary import get_patient_summary, get_summary_etag
+from app.services.summary_cache import summary_cache
+
+logger = logging.getLogger(__name__)
+
+# Background generations running at once per worker
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "2"))
+# Patients waiting to be prefetched; further requests are dropped
+PREFETCH_QUEUE_SIZE = int(os.getenv("PREFETCH_QUEUE_SIZE", "1000"))
+# Fraction of the interactive concurrency limit above which prefetch pauses
+PREFETCH_MAX_LOAD = float(os.getenv("PREFETCH_MAX_LOAD", "0.5"))
+# Seconds to wait before checking again for spare capacity
+PREFETCH_IDLE_POLL = 1.0
+
+
+class PrefetchScheduler:
+    """Queues patients and generates their summaries in the background."""
+
+    def __init__(self, concurrency: int, queue_size: int):
+        self.concurrency = concurrency
+        self._queue: asyncio.Queue[str] = asyncio.Queue(maxsize=queue_size)
+        self._pending: set[str] = set()
+        self._workers: List[asyncio.Task] = []
+        self.scheduled = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self):
+        """Start the background prefetch workers."""
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._work()) for _ in range(self.concurrency)
+        ]
+
+    async def stop(self):
+        """Cancel the workers and forget queued patients."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._pending.clear()
+        self._queue = asyncio.Queue(maxsize=self._queue.maxsize)
+
+    async def schedule(self, patient_ids: List[str]) -> int:
+        """
+        Queue patients whose cached summary is missing or stale.
+
+        Fingerprints are compared in one query; patients with a valid cached
+        summary or already queued are skipped. Returns the number queued.
+        """
+        async with sessionmanager.session() as db_session:
+            fingerprints = await get_data_fingerprints(db_session, patient_ids)
+
+        queued = 0
+        for patient_id, fingerprint in fingerprints.items():
+            if patient_id in self._pending or summary_cache.etag(
+                patient_id
+            ) == get_summary_etag(fingerprint):
+                self.skipped += 1
+                continue
+            try:
+                self._queue.put_nowait(patient_id)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                continue
+            self._pending.add(patient_id)
+            queued += 1
+        self.scheduled += queued
+        return queued
+
+    def _has_spare_capacity(self) -> bool:
+        """Check that interactive load and LLM quota leave room to prefetch."""
+        if summary_admission.in_flight >= (
+            PREFETCH_MAX_LOAD * summary_admission.max_concurrency
+        ):
+            return False
+        return any(d.is_available(0) for d in get_llm_router().deployments)
+
+    async def _work(self):
+        """Generate queued summaries one at a time while capacity allows."""
+        while True:
+            patient_id = await self._queue.get()
+            try:
+                while not self._has_spare_capacity():
+                    await asyncio.sleep(PREFETCH_IDLE_POLL)
+                await self._prefetch(patient_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.warning("Prefetch of patient %s failed: %s", patient_id, e)
+            finally:
+                self._pending.discard(patient_id)
+                self._queue.task_done()
+
+    async def _prefetch(self, patient_id: str):
+        """Generate and cache one patient's summary unless it is still valid."""
+        async with sessionmanager.session() as db_session:
+            fingerprint = await get_data_fingerprint(db_session, patient_id)
+        etag = get_summary_etag(fingerprint)
+        if summary_cache.etag(patient_id) == etag:
+            # Generated by a user request while this one was queued
+            self.skipped += 1
+            return
+
+        summary = await get_patient_summary(
+            patient_id,
+            max_replica_lag=REPLICA_MAX_LAG_SECONDS,
+            previous=summary_cache.latest(patient_id),
+            source="prefetch",
+        )
+        # Cached under the data actually read, which a replica may lag behind
+        summary_cache.put(
+            patient_id,
+            get_summary_etag(summary["fingerprint"]),
+            summary,
+            prefetched=True,
+        )
+
+    def stats(self) -> Dict:
+        """Report queue state, prefetch counters and cache hit rates."""
+        return {
+            "queued": self._queue.qsize(),
+            "scheduled": self.scheduled,
+            "skipped": self.skipped,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            **summary_cache.stats(),
+        }
+
+
+prefetcher = PrefetchScheduler(PREFETCH_CONCURRENCY, PREFETCH_QUEUE_SIZE)
@@ -0,0 +1,236 @@
+"""
+Request Profiling.
+
+This module profiles individual summary requests on demand. A background
+thread samples the event loop thread's stack to build a CPU profile in
+collapsed-stack (flamegraph) format, tracemalloc records allocations, and
+phase timers attribute wall time to the data layer, analytics, retrieval
+and LLM wait. Only one request is profiled at a time, at most once per
+PROFILE_MIN_INTERVAL, so the hook is safe to leave enabled in production.
+
+Samples are taken from the shared event loop, so they also include any
+other requests running concurrently with the profiled one.
+"""
+
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds between stack samples
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+# Minimum seconds between the starts of two profiled requests
+PROFILE_MIN_INTERVAL = float(os.getenv("PROFILE_MIN_INTERVAL", "60"))
+# Number of finished profiles kept in memory
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+# Optional directory where finished profiles are also written
+PROFILE_DIR = os.getenv("PROFILE_DIR", "")
+# Frames recorded per allocation by tracemalloc
+TRACEMALLOC_FRAMES = 10
+# Allocation sites reported per profile
+TOP_ALLOCATIONS = 15
+
+# Frames are attributed to the first matching category, innermost first
+CATEGORY_RULES = [
+    ("serialisation", "/app/preprocessing/", "serialize"),
+    ("preprocessing", "/app/preprocessing/", ""),
+    ("data_layer", "/app/data/", ""),
+    ("database_driver", "/sqlalchemy/", ""),
+    ("database_driver", "/asyncpg/", ""),
+    ("llm_client", "/openai/", ""),
+    ("llm_client", "/httpx/", ""),
+    ("llm_client", "/httpcore/", ""),
+    ("analytics", "/app/services/analytics", ""),
+    ("retrieval", "/app/services/retrieval", ""),
+    ("services", "/app/", ""),
+]
+
+_current_profile: contextvars.ContextVar[Optional["RequestProfile"]] = (
+    contextvars.ContextVar("current_profile", default=None)
+)
+
+
+def _categorise(frame) -> str:
+    """Attribute a sampled stack to a category from its innermost frames."""
+    if frame.f_code.co_name == "select" and "selectors" in frame.f_code.co_filename:
+        return "idle"
+    while frame is not None:
+        filename = frame.f_code.co_filename.replace("\\", "/")
+        for category, path, function in CATEGORY_RULES:
+            if path in filename and function in frame.f_code.co_name:
+                return category
+        frame = frame.f_back
+    return "other"
+
+
+def _collapse(frame) -> str:
+    """Render a stack root-first as a collapsed-stack line."""
+    names = []
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "?")
+        names.append(f"{module}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class RequestProfile:
+    """CPU samples, phase timings and allocations of one request."""
+
+    def __init__(self, patient_id: str):
+        self.id = uuid.uuid4().hex
+        self.patient_id = patient_id
+        self.started_at = time.time()
+        self.wall_seconds = None
+        self.phases: Counter[str] = Counter()
+        self.stacks: Counter[str] = Counter()
+        self.categories: Counter[str] = Counter()
+        self.memory: Dict = {}
+
+    def folded(self) -> str:
+        """Return the CPU samples in collapsed-stack format."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.items())
+
+    def report(self) -> Dict:
+        """Summarise the profile as JSON-serialisable data."""
+        samples = sum(self.categories.values())
+        return {
+            "id": self.id,
+            "patient_id": self.patient_id,
+            "started_at": self.started_at,
+            "wall_seconds": self.wall_seconds,
+            "sample_interval": PROFILE_SAMPLE_INTERVAL,
+            "samples": samples,
+            "phases": {name: round(s, 4) for name, s in self.phases.items()},
+            "cpu_share": {
+                category: round(count / samples, 3)
+                for category, count in self.categories.most_common()
+            },
+            "memory": self.memory,
+        }
+
+
+@contextlib.contextmanager
+def phase(name: str):
+    """Add the wall time of a block to the current profile, if any."""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.phases[name] += time.perf_counter() - started
+
+
+class Profiler:
+    """Runs rate-limited request profiles and keeps the latest results."""
+
+    def __init__(self, min_interval: float, keep: int):
+        self.min_interval = min_interval
+        self.keep = keep
+        self.profiles: OrderedDict[str, RequestProfile] = OrderedDict()
+        self.skipped = 0
+        self._active = False
+        self._last_started = float("-inf")
+
+    def _sample(self, profile: RequestProfile, thread_id: int, stop: threading.Event):
+        """Sample the target thread's stack until stopped."""
+        while not stop.wait(PROFILE_SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            profile.categories[_categorise(frame)] += 1
+            profile.stacks[_collapse(frame)] += 1
+
+    @contextlib.asynccontextmanager
+    async def profile(self, patient_id: str) -> AsyncIterator[RequestProfile | None]:
+        """
+        Profile the enclosed block, or yield None when rate-limited.
+
+        The block must run on the event loop thread that enters it.
+        """
+        now = time.monotonic()
+        if self._active or now - self._last_started < self.min_interval:
+            self.skipped += 1
+            yield None
+            return
+
+        self._active = True
+        self._last_started = now
+        profile = RequestProfile(patient_id)
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        # Leave out the sampler's own allocations
+        own_traces = [tracemalloc.Filter(False, __file__)]
+        baseline = tracemalloc.take_snapshot().filter_traces(own_traces)
+
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=self._sample,
+            args=(profile, threading.get_ident(), stop),
+            daemon=True,
+        )
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            yield profile
+        finally:
+            stop.set()
+            sampler.join()
+            profile.wall_seconds = round(time.perf_counter() - started, 4)
+            _current_profile.reset(token)
+            current, peak = tracemalloc.get_traced_memory()
+            top = (
+                tracemalloc.take_snapshot()
+                .filter_traces(own_traces)
+                .compare_to(baseline, "lineno")
+            )
+            if started_tracing:
+                tracemalloc.stop()
+            profile.memory = {
+                "current_bytes": current,
+                "peak_bytes": peak,
+                "top_allocations": [
+                    {"site": str(stat.traceback), "size_diff": stat.size_diff}
+                    for stat in top[:TOP_ALLOCATIONS]
+                ],
+            }
+            self._active = False
+            self._store(profile)
+
+    def _store(self, profile: RequestProfile):
+        """Keep a finished profile and optionally write it to PROFILE_DIR."""
+        self.profiles[profile.id] = profile
+        while len(self.profiles) > self.keep:
+            self.profiles.popitem(last=False)
+        logger.info(
+            "Profiled summary of patient %s in %.2fs (profile %s)",
+            profile.patient_id,
+            profile.wall_seconds,
+            profile.id,
+        )
+        if PROFILE_DIR:
+            directory = Path(PROFILE_DIR)
+            directory.mkdir(parents=True, exist_ok=True)
+            (directory / f"{profile.id}.folded").write_text(profile.folded())
+            (directory / f"{profile.id}.json").write_text(
+                json.dumps(profile.report(), indent=2)
+            )
+
+
+profiler = Profiler(PROFILE_MIN_INTERVAL, PROFILE_KEEP)
@@ -0,0 +1,182 @@
+"""
+Incident Note Retrieval.
+
+This module keeps a per-patient TF-IDF index over the free-text fields of
+incident submissions, so the prompt can include only the notes most relevant
+to each summary section instead of every comment ever recorded.
+"""
+
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, List
+
+import numpy as np
+
+# Notes retrieved for each summary section
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+# Patient indexes kept in memory
+RETRIEVAL_MAX_PATIENTS = int(os.getenv("RETRIEVAL_MAX_PATIENTS", "256"))
+
+# Keywords describing what each summary section in prompts.yaml looks for
+SECTION_QUERIES = {
+    "Incident Overview": (
+        "incident behaviour aggressive assault hit kick punch shout scream "
+        "escalated severe injury damage"
+    ),
+    "Triggers and Antecedents": (
+        "trigger antecedent before noise noisy environment demand refused "
+        "visitor pain tired hungry change routine activity fit seizure"
+    ),
+    "Behavioral Responses and Consequences": (
+        "intervention response restraint restrained calmed redirected "
+        "distraction medication prn seclusion settled outcome effective"
+    ),
+    "Notable Trends and Insights": (
+        "again repeated pattern unusual first recurring increase decrease "
+        "family staff night morning"
+    ),
+}
+
+STOP_WORDS = set(
+    "and the was were for with that this then from had has have his her she "
+    "him they them not but are patient".split()
+)
+
+TOKEN_PATTERN = re.compile(r"[a-z]{3,}")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase terms, dropping stop words."""
+    return [
+        term for term in TOKEN_PATTERN.findall(text.lower()) if term not in STOP_WORDS
+    ]
+
+
+class NoteIndex:
+    """
+    Incrementally updated TF-IDF index over a patient's incident notes.
+
+    Documents are stored in CSR form (term ids and counts per note) so the
+    index stays compact and scoring is a handful of vectorised NumPy ops.
+    """
+
+    def __init__(self):
+        self.vocabulary: Dict[str, int] = {}
+        self.doc_ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._indices: List[int] = []
+        self._counts: List[int] = []
+        self._indptr: List[int] = [0]
+        self._arrays = None
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._positions
+
+    def add(self, doc_id: str, text: str):
+        """Add a note to the index; notes already indexed are skipped."""
+        if doc_id in self._positions:
+            return
+        terms = {}
+        for term in tokenize(text):
+            term_id = self.vocabulary.setdefault(term, len(self.vocabulary))
+            terms[term_id] = terms.get(term_id, 0) + 1
+        if not terms:
+            return
+
+        self._positions[doc_id] = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self._indices.extend(terms.keys())
+        self._counts.extend(terms.values())
+        self._indptr.append(len(self._indices))
+        self._arrays = None
+
+    def _build(self):
+        """Build the NumPy arrays used for scoring after the index changed."""
+        indices = np.array(self._indices, dtype=np.int32)
+        indptr = np.array(self._indptr, dtype=np.int64)
+        document_frequency = np.bincount(indices, minlength=len(self.vocabulary))
+        idf = np.log((1 + len(self.doc_ids)) / (1 + document_frequency)) + 1
+        weights = np.array(self._counts, dtype=np.float32) * idf[indices]
+        norms = np.sqrt(np.add.reduceat(weights**2, indptr[:-1]))
+        self._arrays = (indices, indptr, idf, weights, norms)
+
+    def search(self, query: str, k: int, allowed: set | None = None) -> List[str]:
+        """Return the ids of the k notes most similar to the query."""
+        if not self.doc_ids:
+            return []
+        if self._arrays is None:
+            self._build()
+        indices, indptr, idf, weights, norms = self._arrays
+
+        query_weights = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is not None:
+                query_weights[term_id] = idf[term_id]
+        if not query_weights.any():
+            return []
+
+        scores = np.add.reduceat(weights * query_weights[indices], indptr[:-1])
+        scores /= norms
+        if allowed is not None:
+            mask = np.fromiter(
+                (doc_id in allowed for doc_id in self.doc_ids),
+                dtype=bool,
+                count=len(self.doc_ids),
+            )
+            scores[~mask] = 0
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [self.doc_ids[i] for i in top if scores[i] > 0]
+
+
+_indexes: "OrderedDict[str, NoteIndex]" = OrderedDict()
+
+
+def get_note_index(patient_id: str) -> NoteIndex:
+    """Return the patient's note index, evicting the least recently used one."""
+    index = _indexes.get(patient_id)
+    if index is None:
+        index = _indexes[patient_id] = NoteIndex()
+        while len(_indexes) > RETRIEVAL_MAX_PATIENTS:
+            _indexes.popitem(last=False)
+    _indexes.move_to_end(patient_id)
+    return index
+
+
+def _note_key(note: Dict) -> str:
+    """Key a note by id and content, so edited notes are indexed afresh."""
+    digest = hashlib.sha1(note["text"].encode()).hexdigest()[:12]
+    return f"{note['id']}:{digest}"
+
+
+def select_notes(patient_id: str, notes: List[Dict], k: int = RETRIEVAL_TOP_K):
+    """
+    Select the incident notes to include in a patient's prompt.
+
+    Small sets of notes are returned whole. Otherwise the patient's index is
+    updated with any new notes and the top-k notes for each summary section
+    are returned, in their original chronological order.
+    """
+    limit = k * len(SECTION_QUERIES)
+    if len(notes) <= limit:
+        return notes
+
+    index = get_note_index(patient_id)
+    keys = [_note_key(note) for note in notes]
+    for key, note in zip(keys, notes):
+        index.add(key, note["text"])
+
+    current = set(keys)
+    selected = set()
+    for query in SECTION_QUERIES.values():
+        selected.update(index.search(query, k, allowed=current))
+
+    # Top up with the most recent notes if few notes match any section
+    for key in reversed(keys):
+        if len(selected) >= k:
+            break
+        selected.add(key)
+
+    return [note for key, note in zip(keys, notes) if key in selected]
@@ -6,139 +6,385 @@ integrating with Azure LLM for text generation and handling database queries
 for patient submissions and assessments.
 """
 
+import hashlib
+import json
 import logging
-import os
 import time
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List
 
-import yaml
 from fastapi import HTTPException
-from openai import AzureOpenAI
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.data.patient_submissions import (
-    get_abc,
-    get_abs,
-    get_ai_tags,
-    get_oasmnrs,
-    get_sasbas,
-)
+from app.data.patient_submissions import get_patient_data
+from app.preprocessing.submissions import load_mappings
+from app.services.analytics import analyse_patient
+from app.services.llm_router import get_llm_router
+from app.services.profiling import phase
+from app.services.retrieval import select_notes
+from app.services.usage_ledger import usage_ledger
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def load_prompts():
-    """Load templates from the YAML configuration file."""
+@lru_cache(maxsize=4)
+def load_prompts(section: str = "patient_summary"):
+    """Load a section of the YAML prompt templates once per process."""
+    # Imported here to keep the YAML parser off the import path
+    import yaml
+
     try:
         prompt_path = Path(__file__).parent.parent / "config" / "prompts.yaml"
         if not prompt_path.exists():
             raise FileNotFoundError(f"Prompts file not found at {prompt_path}")
         with open(prompt_path, encoding="utf-8") as f:
             prompts = yaml.safe_load(f)
-            if "patient_summary" not in prompts:
-                raise KeyError("patient_summary section not found in prompts.yaml")
-            return prompts["patient_summary"]
+            if section not in prompts:
+                raise KeyError(f"{section} section not found in prompts.yaml")
+            return prompts[section]
     except Exception as e:
         logger.error("Error loading prompts: %s", str(e))
         raise
 
 
-async def get_patient_summary(db_session: AsyncSession, patient_id: str) -> Dict:
-    """Generate an AI summary for a patient based on their submissions."""
-    try:
-        # Log the start of processing
-        logger.info("Processing summary for patient %s", patient_id)
+def format_field_legend(mappings: Dict) -> str:
+    """Describe the display values each mapped field can take."""
+    lines = ["Field legend (possible values of coded fields):"]
+    for map_name, values in mappings.items():
+        field = map_name.removesuffix("_map")
+        lines.append(f"- {field}: " + "; ".join(values.values()))
+    return "\n".join(lines)
+
+
+def format_sections(sections: List[Dict]) -> str:
+    """Describe the summary sections and the key each is returned under."""
+    lines = ["Sections (JSON key: title):"]
+    for section in sections:
+        lines.append(f"{section['key']}: {section['title']}")
+        lines.extend(f"  {line}" for line in section["guidance"].splitlines())
+    return "\n".join(lines)
 
-        # Get submissions sequentially since they share the same session
-        oasmnr_submissions = await get_oasmnrs(db_session, patient_id)
-        sasba_submissions = await get_sasbas(db_session, patient_id)
-        abs_submissions = await get_abs(db_session, patient_id)
-        abc_submissions = await get_abc(db_session, patient_id)
-        trends = await get_ai_tags(db_session, patient_id)
-
-        if not any(
-            [oasmnr_submissions, sasba_submissions, abs_submissions, abc_submissions]
-        ):
-            logger.warning("No submissions found for patient %s", patient_id)
-            return {"summary": "No data available for this patient"}
-
-        # Check environment variables
-        required_env_vars = [
-            "AZURE_OPENAI_API_KEY",
-            "AZURE_OPENAI_ENDPOINT",
-            "AZURE_OPENAI_DEPLOYMENT_NAME",
+
+@lru_cache(maxsize=1)
+def get_static_prompt() -> str:
+    """
+    Build the static part of the prompt once per process.
+
+    The system prompt, summary instructions, section list and field legend
+    never depend on
+    the patient, so keeping them together and byte-identical lets the
+    provider reuse its cached prefix across calls.
+    """
+    prompts = load_prompts()
+    return "\n".join(
+        [
+            prompts["system"],
+            prompts["instructions"],
+            format_sections(prompts["sections"]),
+            format_field_legend(load_mappings()),
         ]
-        for var in required_env_vars:
-            if not os.getenv(var):
-                logger.error("Missing environment variable: %s", var)
-                raise ValueError(f"Missing required environment variable: {var}")
-
-        # Initialize OpenAI client
-        client = AzureOpenAI(
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_version=os.getenv("AZURE_OPENAI_ENDPOINT").split("api-version=")[1],
-        )
+    )
 
-        deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-        prompts = load_prompts()
 
-        # Format the context
-        oasmnr_context = (
-            str(oasmnr_submissions)
-            if oasmnr_submissions
-            else "No OASMNR submissions available"
-        )
-        sasba_context = (
-            str(sasba_submissions)
-            if sasba_submissions
-            else "No SASBA submissions available"
-        )
-        abs_context = (
-            str(abs_submissions) if abs_submissions else "No ABS submissions available"
+@lru_cache(maxsize=1)
+def get_prompt_version() -> str:
+    """Return a short hash of the prompt and mapping configuration files."""
+    config_dir = Path(__file__).parent.parent / "config"
+    digest = hashlib.sha256()
+    for name in ("prompts.yaml", "mapping.json"):
+        digest.update((config_dir / name).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def get_summary_etag(fingerprint: str) -> str:
+    """Build a strong ETag from a patient data fingerprint and prompt version."""
+    digest = hashlib.sha256(f"{fingerprint}|{get_prompt_version()}".encode())
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+NO_DATA_SUMMARY = "No data available for this patient"
+
+# Asks the model for a JSON object holding the requested sections
+SUMMARY_RESPONSE_FORMAT = {"type": "json_object"}
+
+# Stands in for input slices the requested sections do not depend on
+UNNEEDED_CONTEXT = "Unchanged, not needed for the requested sections"
+
+# Submission types, each with its own submission and trend input slices
+SUBMISSION_KEYS = ("oasmnr", "sasba", "abs", "abc")
+
+
+def _digest(value) -> str:
+    """Hash a value's text form for change detection."""
+    return hashlib.sha256(str(value).encode("utf-8")).hexdigest()[:16]
+
+
+def plan_sections(slices: Dict[str, str], previous: Dict | None) -> List[Dict]:
+    """
+    Decide which summary sections need generating.
+
+    Each section's digest covers the prompt version and the input slices it
+    depends on; sections of the previous summary whose digest is unchanged
+    are reused, the rest are left with content None.
+    """
+    slice_digests = {name: _digest(value) for name, value in slices.items()}
+    previous_sections = {
+        section["key"]: section for section in (previous or {}).get("sections", [])
+    }
+    plan = []
+    for section in load_prompts()["sections"]:
+        digest = _digest(
+            [get_prompt_version(), section["key"]]
+            + [slice_digests[name] for name in section["inputs"]]
         )
-        abc_context = (
-            str(abc_submissions) if abc_submissions else "No ABC submissions available"
+        old = previous_sections.get(section["key"])
+        reuse = old is not None and old.get("inputs_digest") == digest
+        plan.append(
+            {
+                "key": section["key"],
+                "title": section["title"],
+                "content": old["content"] if reuse else None,
+                "regenerated": not reuse,
+                "inputs_digest": digest,
+                "inputs": section["inputs"],
+            }
         )
+    return plan
 
-        # Format the prompt with the context
-        user_prompt = prompts["user"].format(
-            oasmnr_submissions_context=oasmnr_context,
-            sasba_submissions_context=sasba_context,
-            abs_submissions_context=abs_context,
-            abc_submissions_context=abc_context,
-            trends=trends,
-        )
 
-        # Prepare messages
-        messages = [
-            {"role": "system", "content": prompts["system"]},
-            {
-                "role": "user",
-                "content": user_prompt,
-            },
+async def build_summary_request(
+    patient_id: str,
+    max_replica_lag: float | None = None,
+    previous: Dict | None = None,
+) -> Dict | None:
+    """
+    Fetch a patient's data and build the chat messages for their summary.
+
+    Only sections whose inputs changed since the previous summary are
+    requested; when earlier sections are reused, input slices none of the
+    requested sections need are left out. Returns the
+    messages (None when every section can be reused) and the section plan
+    with the AI tags and analytics that accompany the summary; the plan is
+    None when the patient has no submissions. The fingerprint of the data
+    read is returned too, for caching the summary under the right ETag.
+    """
+    # Get submissions concurrently, each on its own session
+    with phase("data_layer"):
+        patient_data = await get_patient_data(patient_id, max_replica_lag)
+    oasmnr_submissions = patient_data["oasmnr"]
+    sasba_submissions = patient_data["sasba"]
+    abs_submissions = patient_data["abs"]
+    abc_submissions = patient_data["abc"]
+    trends = patient_data["trends"]
+
+    if not any(
+        [oasmnr_submissions, sasba_submissions, abs_submissions, abc_submissions]
+    ):
+        logger.warning("No submissions found for patient %s", patient_id)
+        return {
+            "messages": None,
+            "sections": None,
+            "ai_tags": {},
+            "analytics": {},
+            "fingerprint": patient_data["fingerprint"],
+        }
+
+    with phase("analytics"):
+        # Trends run up to now, so incidents that stopped show as a drop
+        analytics = analyse_patient(patient_data["columns"], until=time.time())
+    prompts = load_prompts()
+
+    # Format the context
+    oasmnr_context = oasmnr_submissions or "No OASMNR submissions available"
+    sasba_context = sasba_submissions or "No SASBA submissions available"
+    abs_context = abs_submissions or "No ABS submissions available"
+    abc_context = abc_submissions or "No ABC submissions available"
+    with phase("retrieval"):
+        notes = [
+            {key: note[key] for key in ("source", "time", "field", "text")}
+            for note in select_notes(patient_id, patient_data["notes"])
         ]
+    notes_context = str(notes) if notes else "No incident notes available"
 
-        print("\nMessages:", messages, "\n")
+    slices = {
+        "oasmnr": oasmnr_context,
+        "sasba": sasba_context,
+        "abs": abs_context,
+        "abc": abc_context,
+        "notes": notes_context,
+        "period": analytics.get("period"),
+        **{
+            f"{key}_trends": {
+                "count": trends.get(f"{key}_count", 0),
+                **analytics.get(key.upper(), {}),
+            }
+            for key in SUBMISSION_KEYS
+        },
+    }
+    sections = plan_sections(slices, previous)
+    requested = [section for section in sections if section["content"] is None]
+    result = {
+        "ai_tags": trends,
+        "analytics": analytics,
+        "sections": sections,
+        "fingerprint": patient_data["fingerprint"],
+    }
+    if not requested:
+        return {"messages": None, **result}
 
-        # Make API call
-        start_time = time.time()
-        response = client.chat.completions.create(
-            messages=messages,
-            model=deployment_name,
-            temperature=0,
-        )
-        end_time = time.time()
+    previous_sections = {
+        section["key"]: section["content"]
+        for section in sections
+        if section["content"] is not None
+    }
+    if previous_sections:
+        # Slices only the reused sections depend on are left out
+        needed = {name for section in requested for name in section["inputs"]}
+        slices = {
+            name: value if name in needed else UNNEEDED_CONTEXT
+            for name, value in slices.items()
+        }
+
+    # Format the prompt with the context
+    user_prompt = prompts["user"].format(
+        oasmnr_submissions_context=slices["oasmnr"],
+        sasba_submissions_context=slices["sasba"],
+        abs_submissions_context=slices["abs"],
+        abc_submissions_context=slices["abc"],
+        incident_notes_context=slices["notes"],
+        trends={
+            "period": slices["period"],
+            **{key.upper(): slices[f"{key}_trends"] for key in SUBMISSION_KEYS},
+        },
+        previous_sections=(
+            json.dumps(previous_sections) if previous_sections else "None"
+        ),
+        requested_sections=", ".join(section["key"] for section in requested),
+    )
+
+    # Prepare messages: the static system prompt forms a byte-stable prefix
+    # that the provider can cache, with the patient data last
+    messages = [
+        {"role": "system", "content": get_static_prompt()},
+        {
+            "role": "user",
+            "content": user_prompt,
+        },
+    ]
+
+    return {"messages": messages, **result}
+
+
+def format_summary(content: str) -> str:
+    """Clean up the summary text returned by the model."""
+    return content.replace("\\n", "\n")
+
+
+def merge_sections(sections: List[Dict], content: str | None) -> Dict:
+    """
+    Fill the requested sections from the model's JSON reply.
+
+    Returns the rendered summary text with the sections. Sections the reply
+    omits are left empty and requested again on the next update. A reply
+    that is not a JSON object is returned unstructured, without sections, so
+    the next update regenerates every section.
+    """
+    if content is not None:
+        try:
+            written = json.loads(content)
+            if not isinstance(written, dict):
+                raise ValueError("summary is not a JSON object")
+        except ValueError as e:
+            logger.warning("Unstructured summary returned: %s", str(e))
+            return {"summary": format_summary(content), "sections": []}
+        for section in sections:
+            if section["content"] is None:
+                text = written.get(section["key"])
+                if text is None:
+                    # Not reused while its inputs are unchanged, so the next
+                    # update requests the omitted section again
+                    section["inputs_digest"] = None
+                section["content"] = format_summary(str(text or "")).strip()
+
+    summary = "\n\n".join(
+        f"{section['title']}\n{section['content']}"
+        for section in sections
+        if section["content"]
+    )
+    return {"summary": summary, "sections": sections}
+
+
+async def get_patient_summary(
+    patient_id: str,
+    max_replica_lag: float | None = None,
+    previous: Dict | None = None,
+    source: str = "interactive",
+) -> Dict:
+    """
+    Generate an AI summary for a patient based on their submissions.
+
+    All database work completes, and its connections are returned to the
+    pool, before the LLM call starts. Background callers pass
+    max_replica_lag to bound how stale replica reads may be. Given the
+    previous summary, only sections whose inputs changed are regenerated.
+    Each LLM call is recorded in the usage ledger under the given source.
+    The result's fingerprint describes the data the summary was built from,
+    which may be older than the primary's when read from a replica.
+    """
+    try:
+        # Log the start of processing
+        logger.info("Processing summary for patient %s", patient_id)
+
+        request = await build_summary_request(patient_id, max_replica_lag, previous)
+        if request["sections"] is None:
+            return {
+                "summary": NO_DATA_SUMMARY,
+                "sections": [],
+                "ai_tags": {},
+                "analytics": {},
+                "usage": {},
+                "fingerprint": request["fingerprint"],
+            }
+
+        messages = request["messages"]
+        content, usage = None, {}
+        if messages is not None:
+            router = get_llm_router()
+            logger.debug(
+                "Requesting %d sections for patient %s (~%d prompt characters)",
+                sum(section["content"] is None for section in request["sections"]),
+                patient_id,
+                sum(len(message["content"]) for message in messages),
+            )
 
-        # Log response time
-        response_time = end_time - start_time
-        logger.info("OpenAI API response time: %.2f seconds", response_time)
+            # Make API call, routed to the best available deployment
+            with phase("llm_wait"):
+                response = await router.chat_completion(
+                    messages,
+                    on_success=lambda deployment, latency, usage: usage_ledger.record(
+                        patient_id,
+                        get_prompt_version(),
+                        source,
+                        deployment.name,
+                        deployment.cost(usage),
+                        latency,
+                        usage,
+                    ),
+                    temperature=0,
+                    response_format=SUMMARY_RESPONSE_FORMAT,
+                )
+            content = response.choices[0].message.content
+            usage = response.usage.model_dump() if response.usage else {}
 
-        formatted_summary = response.choices[0].message.content.replace("\\n", "\n")
-        return formatted_summary
+        return {
+            **merge_sections(request["sections"], content),
+            "ai_tags": request["ai_tags"],
+            "analytics": request["analytics"],
+            "usage": usage,
+            "fingerprint": request["fingerprint"],
+        }
 
     except FileNotFoundError as e:
         logger.error("Configuration error: %s", str(e))
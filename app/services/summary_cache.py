@@ -0,0 +1,103 @@
+"""
+Summary Cache.
+
+This module keeps recently generated summaries in memory, keyed by patient
+and validated by ETag, so a request whose data has not changed is served
+without calling the LLM. The encoded response body is kept with each entry,
+so repeat requests skip serialisation. Entries written by the prefetcher
+are tracked to report how many prefetched summaries were later used or
+wasted.
+"""
+
+import os
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from app.services.encoding import EncodedBody
+
+# Maximum number of patient summaries kept in memory per worker
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "1024"))
+
+
+class SummaryCache:
+    """LRU cache of generated summaries with prefetch usage counters."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, Dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self.prefetch_hits = 0
+        self.prefetch_wasted = 0
+
+    def etag(self, patient_id: str) -> Optional[str]:
+        """Return the ETag of the cached summary of a patient, if any."""
+        entry = self._entries.get(patient_id)
+        return entry["etag"] if entry else None
+
+    def latest(self, patient_id: str) -> Optional[Dict]:
+        """Return the cached summary even if stale, to reuse its sections."""
+        entry = self._entries.get(patient_id)
+        return entry["summary"] if entry else None
+
+    def get(self, patient_id: str, etag: str) -> Optional[Dict]:
+        """Return the cached summary if it was generated for this ETag."""
+        entry = self._entries.get(patient_id)
+        if entry is None or entry["etag"] != etag:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(patient_id)
+        self.hits += 1
+        if entry["prefetched"] and not entry["served"]:
+            self.prefetch_hits += 1
+        entry["served"] = True
+        return entry["summary"]
+
+    def put(self, patient_id: str, etag: str, summary: Dict, prefetched=False):
+        """Store a summary, counting replaced prefetches that were never served."""
+        self._discard(patient_id)
+        self._entries[patient_id] = {
+            "etag": etag,
+            "summary": summary,
+            "prefetched": prefetched,
+            "served": False,
+            "body": None,
+        }
+        if prefetched:
+            self.prefetched += 1
+        while len(self._entries) > self.max_size:
+            self._discard(next(iter(self._entries)))
+
+    def body(self, patient_id: str, encode: Callable[[Dict], bytes]) -> EncodedBody:
+        """Return a cached summary's response body, encoding it on first use."""
+        entry = self._entries[patient_id]
+        if entry["body"] is None:
+            entry["body"] = EncodedBody(encode(entry["summary"]))
+        return entry["body"]
+
+    def _discard(self, patient_id: str):
+        """Remove an entry, counting it as wasted if prefetched and unused."""
+        entry = self._entries.pop(patient_id, None)
+        if entry and entry["prefetched"] and not entry["served"]:
+            self.prefetch_wasted += 1
+
+    def stats(self) -> Dict:
+        """Report cache and prefetch hit rates and wasted generations."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "prefetched": self.prefetched,
+            "prefetch_hits": self.prefetch_hits,
+            "prefetch_wasted": self.prefetch_wasted,
+            "prefetch_hit_rate": (
+                self.prefetch_hits / self.prefetched if self.prefetched else 0.0
+            ),
+        }
+
+
+summary_cache = SummaryCache(SUMMARY_CACHE_SIZE)
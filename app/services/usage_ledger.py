@@ -0,0 +1,167 @@
+"""
+Usage Ledger.
+
+This module records the token usage, latency, deployment and cost of every
+summary LLM call. Entries are buffered in memory and written to the
+llm_usage_ledger table in batches, with the patient's organisation resolved
+once per batch, so recording never adds a database round trip to a request.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from sqlalchemy import insert, select
+
+from app.dependencies.database import sessionmanager
+from app.models.simplified_models import SimplifiedPatient
+from app.models.usage_models import LlmUsage, UsageBase
+from app.services.llm_router import get_cached_tokens
+
+logger = logging.getLogger(__name__)
+
+# Seconds between ledger flushes
+LEDGER_FLUSH_INTERVAL = float(os.getenv("LEDGER_FLUSH_INTERVAL", "5"))
+# Buffered entries that trigger an early flush, and rows per insert
+LEDGER_BATCH_SIZE = int(os.getenv("LEDGER_BATCH_SIZE", "500"))
+# Entries kept while the database is unavailable; older ones are dropped
+LEDGER_MAX_BUFFER = int(os.getenv("LEDGER_MAX_BUFFER", "10000"))
+
+
+class UsageLedger:
+    """Buffers LLM usage entries and writes them in batches."""
+
+    def __init__(self, batch_size: int, max_buffer: int):
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self.written = 0
+        self.dropped = 0
+        self._buffer: List[Dict] = []
+        self._lock = asyncio.Lock()
+        self._flush_task = None
+        self._early_flush = None
+        self._table_ready = False
+
+    async def ensure_table(self):
+        """Create the ledger table and its indexes if they do not exist."""
+        if self._table_ready:
+            return
+        async with sessionmanager.connect() as connection:
+            await connection.run_sync(
+                UsageBase.metadata.create_all,
+                tables=[LlmUsage.__table__],
+                checkfirst=True,
+            )
+        self._table_ready = True
+
+    @property
+    def pending(self) -> int:
+        """Entries buffered but not yet written."""
+        return len(self._buffer)
+
+    def record(
+        self,
+        patient_id: str,
+        prompt_version: str,
+        source: str,
+        deployment: str,
+        cost: float | None,
+        latency: float | None,
+        usage,
+    ):
+        """
+        Buffer one LLM call; flushes early once a batch has accumulated.
+
+        latency is None for calls without a meaningful latency, such as
+        items of a batch job.
+        """
+        cached_tokens = get_cached_tokens(usage) if usage else 0
+        self._buffer.append(
+            {
+                "created_at": datetime.now(timezone.utc),
+                "patient_id": patient_id,
+                "prompt_version": prompt_version,
+                "source": source,
+                "deployment": deployment,
+                "prompt_tokens": usage.prompt_tokens if usage else 0,
+                "cached_tokens": cached_tokens,
+                "completion_tokens": usage.completion_tokens if usage else 0,
+                "cache_hit": cached_tokens > 0,
+                "latency_ms": None if latency is None else round(latency * 1000),
+                "cost": cost,
+            }
+        )
+        # Once per accumulated batch, so a failing database is not retried per call
+        if len(self._buffer) % self.batch_size == 0 and not self._lock.locked():
+            self._early_flush = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        """Write buffered entries, keeping them for retry if the write fails."""
+        async with self._lock:
+            while self._buffer:
+                batch = self._buffer[: self.batch_size]
+                del self._buffer[: self.batch_size]
+                started = time.monotonic()
+                try:
+                    await self._write(batch)
+                except Exception as e:
+                    logger.error("Could not write %d ledger entries: %s", len(batch), e)
+                    self._requeue(batch)
+                    return
+                self.written += len(batch)
+                logger.debug(
+                    "Wrote %d ledger entries in %.3fs",
+                    len(batch),
+                    time.monotonic() - started,
+                )
+
+    def _requeue(self, batch: List[Dict]):
+        """Put a failed batch back, dropping the oldest entries beyond the cap."""
+        self._buffer[:0] = batch
+        overflow = len(self._buffer) - self.max_buffer
+        if overflow > 0:
+            del self._buffer[:overflow]
+            self.dropped += overflow
+            logger.warning("Dropped %d ledger entries", overflow)
+
+    async def _write(self, batch: List[Dict]):
+        """Insert a batch, resolving each patient's organisation in one query."""
+        await self.ensure_table()
+        async with sessionmanager.session() as db_session:
+            patient_ids = {entry["patient_id"] for entry in batch}
+            result = await db_session.execute(
+                select(SimplifiedPatient.id, SimplifiedPatient.org_id).where(
+                    SimplifiedPatient.id.in_(patient_ids)
+                )
+            )
+            orgs = {str(patient_id): org_id for patient_id, org_id in result}
+            await db_session.execute(
+                insert(LlmUsage),
+                [{**entry, "org_id": orgs.get(entry["patient_id"])} for entry in batch],
+            )
+            await db_session.commit()
+
+    def start(self, interval: float = LEDGER_FLUSH_INTERVAL):
+        """Start flushing the buffer periodically in the background."""
+        if self._flush_task is not None:
+            return
+
+        async def run():
+            while True:
+                await asyncio.sleep(interval)
+                await self.flush()
+
+        self._flush_task = asyncio.create_task(run())
+
+    async def stop(self):
+        """Stop periodic flushing and write what is left."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+
+usage_ledger = UsageLedger(LEDGER_BATCH_SIZE, LEDGER_MAX_BUFFER)
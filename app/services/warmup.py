@@ -0,0 +1,181 @@
+"""
+Service Warm-up.
+
+This module pre-warms the database pool, JWKS keys, prompts, mappings, LLM
+clients, CPU offload workers and the data version index in parallel before
+the app takes traffic, and records the state reported by the readiness and
+liveness endpoints.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+from app.data.data_versions import data_version_index
+from app.dependencies.database import sessionmanager
+from app.dependencies.security import token_validator
+from app.services.llm_router import get_llm_router
+from app.services.offload import cpu_offload
+from app.services.summary import get_prompt_version, get_static_prompt
+from app.services.usage_ledger import usage_ledger
+
+logger = logging.getLogger(__name__)
+
+# Pooled connections opened during warm-up
+WARMUP_DB_CONNECTIONS = int(os.getenv("WARMUP_DB_CONNECTIONS", "5"))
+# Seconds allowed for each warm-up step
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "30"))
+# Seconds allowed for each LLM reachability check
+LLM_CHECK_TIMEOUT = float(os.getenv("LLM_CHECK_TIMEOUT", "5"))
+# Seconds between background LLM reachability checks after warm-up
+LLM_CHECK_INTERVAL = float(os.getenv("LLM_CHECK_INTERVAL", "30"))
+
+# Approximate process start, used to report cold-start-to-ready time
+PROCESS_STARTED = time.monotonic()
+
+state = {
+    "ready": False,
+    "import_seconds": None,
+    "startup_seconds": None,
+    "first_request_seconds": None,
+    "components": {},
+    "llm_reachable": {},
+    "llm_checked_at": 0.0,
+}
+
+
+async def check_llm_reachability() -> dict[str, bool]:
+    """Check that each LLM deployment endpoint answers."""
+    import openai
+
+    async def check(deployment) -> bool:
+        try:
+            await asyncio.wait_for(
+                deployment.client.models.list(), timeout=LLM_CHECK_TIMEOUT
+            )
+        except openai.APIStatusError:
+            # The endpoint answered, even if listing models is not allowed
+            return True
+        except Exception as e:
+            logger.warning("LLM deployment %s unreachable: %s", deployment.name, e)
+            return False
+        return True
+
+    deployments = get_llm_router().deployments
+    results = await asyncio.gather(*(check(d) for d in deployments))
+    state["llm_reachable"] = {d.name: ok for d, ok in zip(deployments, results)}
+    state["llm_checked_at"] = time.monotonic()
+    return state["llm_reachable"]
+
+
+_llm_check_task = None
+
+
+def start_llm_checks(interval: float = LLM_CHECK_INTERVAL):
+    """
+    Recheck LLM reachability in the background every interval seconds.
+
+    Readiness reports the latest result, so probes never wait on the LLM.
+    """
+    global _llm_check_task
+    if _llm_check_task is not None:
+        return
+
+    async def run_checks():
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await check_llm_reachability()
+            except Exception as e:
+                logger.error("LLM reachability check failed: %s", e)
+                state["llm_reachable"] = {}
+                state["llm_checked_at"] = time.monotonic()
+
+    _llm_check_task = asyncio.create_task(run_checks())
+
+
+def stop_llm_checks():
+    """Stop the background LLM reachability checks."""
+    global _llm_check_task
+    if _llm_check_task is not None:
+        _llm_check_task.cancel()
+        _llm_check_task = None
+
+
+async def _warm(name: str, coro) -> bool:
+    """Run one warm-up step, recording its outcome and duration."""
+    started = time.monotonic()
+    try:
+        await asyncio.wait_for(coro, timeout=WARMUP_TIMEOUT)
+        ok, error = True, None
+    except Exception as e:
+        logger.error("Warm-up of %s failed: %s", name, e)
+        ok, error = False, str(e)
+    state["components"][name] = {
+        "ok": ok,
+        "seconds": round(time.monotonic() - started, 3),
+        "error": error,
+    }
+    return ok
+
+
+async def warm_up():
+    """
+    Warm every dependency in parallel and mark the service ready.
+
+    The service is ready once the database is reachable and prompts load;
+    JWKS, LLM and usage ledger failures are reported but retried lazily
+    on first use; without the data version index, fingerprints fall back to
+    counting rows.
+    """
+
+    async def load_config():
+        get_static_prompt()
+        get_prompt_version()
+
+    async def load_llm():
+        reachable = await check_llm_reachability()
+        if not any(reachable.values()):
+            raise RuntimeError("No LLM deployment reachable")
+
+    results = await asyncio.gather(
+        _warm("database", sessionmanager.warm_up(WARMUP_DB_CONNECTIONS)),
+        _warm("config", load_config()),
+        _warm("jwks", token_validator.refresh_keys()),
+        _warm("llm", load_llm()),
+        _warm("ledger", usage_ledger.ensure_table()),
+        _warm("data_versions", data_version_index.ensure_installed()),
+        _warm("cpu_offload", cpu_offload.warm_up("app.data.patient_submissions")),
+    )
+    database_ok, config_ok = results[0], results[1]
+
+    state["startup_seconds"] = round(time.monotonic() - PROCESS_STARTED, 3)
+    state["ready"] = database_ok and config_ok
+    logger.info(
+        "Warm-up finished in %.2f seconds since process start (ready: %s)",
+        state["startup_seconds"],
+        state["ready"],
+    )
+
+
+def record_first_request():
+    """Record the time from process start to the first summary served."""
+    if state["first_request_seconds"] is None:
+        state["first_request_seconds"] = round(time.monotonic() - PROCESS_STARTED, 3)
+        logger.info(
+            "First summary served %.2f seconds after process start",
+            state["first_request_seconds"],
+        )
+
+
+async def recheck_readiness() -> bool:
+    """Retry the failed required warm-up steps, e.g. after a database outage."""
+    if state["ready"] or state["startup_seconds"] is None:
+        return state["ready"]
+
+    database_ok = state["components"]["database"]["ok"] or await _warm(
+        "database", sessionmanager.warm_up(1)
+    )
+    state["ready"] = database_ok and state["components"]["config"]["ok"]
+    return state["ready"]
@@ -0,0 +1,71 @@
+"""
+Speed of the NumPy trend analytics against the pure-Python baseline.
+
+Builds the analytics column buffers of a synthetic patient, with incidents
+of every submission type spread over a number of weeks, checks that both
+implementations agree, and reports the best time per call of each.
+
+Usage:
+    python -m benchmarks.analytics --incidents 1000 10000 100000
+"""
+
+import argparse
+import random
+import timeit
+from datetime import datetime, timezone
+from functools import partial
+
+from app.services.analytics import WEEK_SECONDS, analyse_patient, new_columns
+from benchmarks import analytics_baseline
+
+
+def synthetic_columns(incidents: int, weeks: int, seed: int = 0) -> dict:
+    """Column buffers of a patient with incidents of every type over weeks."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+    columns = new_columns()
+    for buffers in columns.values():
+        # Incidents become steadily more frequent, giving trends to find
+        times = sorted(
+            start + rng.triangular(0, weeks, weeks) * WEEK_SECONDS
+            for _ in range(incidents // len(columns))
+        )
+        buffers["time"].extend(times)
+        for field in buffers:
+            if field == "recordings":
+                buffers[field].extend(float(rng.randint(1, 5)) for _ in times)
+            elif field == "severity":
+                buffers[field].extend(
+                    float("nan") if rng.random() < 0.1 else float(rng.randint(1, 4))
+                    for _ in times
+                )
+            elif field == "score":
+                buffers[field].extend(float(rng.randint(14, 56)) for _ in times)
+    return columns
+
+
+def main(args: argparse.Namespace):
+    print(f"{'incidents':>10} {'numpy ms':>10} {'python ms':>10} {'speedup':>8}")
+    for incidents in args.incidents:
+        columns = synthetic_columns(incidents, args.weeks)
+        if analyse_patient(columns) != analytics_baseline.analyse_patient(columns):
+            print(f"{incidents:>10} findings differ; see tests/test_analytics.py")
+        times = []
+        for analyse in (analyse_patient, analytics_baseline.analyse_patient):
+            timer = timeit.Timer(partial(analyse, columns))
+            number, _ = timer.autorange()
+            times.append(min(timer.repeat(args.repeat, number)) / number * 1000)
+        print(
+            f"{incidents:>10} {times[0]:>10.2f} {times[1]:>10.2f} "
+            f"{times[1] / times[0]:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--incidents", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--weeks", type=int, default=104)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,164 @@
+"""
+Pure-Python Analytics Baseline.
+
+Computes the same findings as app.services.analytics with lists and loops
+instead of NumPy. It is the baseline the vectorised engine is benchmarked
+against, and the reference its output is tested against.
+"""
+
+import math
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from app.services.analytics import (
+    MIN_CHANGE_POINT_GAIN,
+    MIN_SEGMENT_WEEKS,
+    ROLLING_WEEKS,
+    WEEK_SECONDS,
+)
+
+
+def _date(seconds: float) -> str:
+    """Format epoch seconds as an ISO date."""
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).date().isoformat()
+
+
+def _mean(values: List[float]) -> float:
+    """Arithmetic mean of a non-empty list."""
+    return sum(values) / len(values)
+
+
+def detect_change_point(values: List[float]) -> int | None:
+    """Find the best two-mean split by trying every split in turn."""
+    n = len(values)
+    if n < 2 * MIN_SEGMENT_WEEKS:
+        return None
+
+    total = sum(values)
+    squares = sum(value * value for value in values)
+    total_sse = squares - total**2 / n
+    if total_sse <= 0:
+        return None
+
+    best, best_sse = None, None
+    left = sum(values[:MIN_SEGMENT_WEEKS])
+    for split in range(MIN_SEGMENT_WEEKS, n - MIN_SEGMENT_WEEKS + 1):
+        sse = squares - left**2 / split - (total - left) ** 2 / (n - split)
+        if best_sse is None or sse < best_sse:
+            best, best_sse = split, sse
+        left += values[split]
+    if 1 - best_sse / total_sse < MIN_CHANGE_POINT_GAIN:
+        return None
+    return best
+
+
+def incident_findings(buffers: Dict, end: float) -> Dict:
+    """Weekly incident counts and severity of one submission type up to end."""
+    times = buffers["time"]
+    start = min(times)
+    weeks = int((end - start) // WEEK_SECONDS) + 1
+    week_index = [int((time - start) // WEEK_SECONDS) for time in times]
+    weights = [
+        1.0 if math.isnan(value) else value
+        for value in buffers.get("recordings", [1.0] * len(times))
+    ]
+    weekly = [0.0] * weeks
+    for week, weight in zip(week_index, weights):
+        weekly[week] += weight
+
+    findings = {
+        "from": _date(start),
+        "to": _date(max(times)),
+        "total": round(sum(weekly), 2),
+        "weekly_mean": round(_mean(weekly), 2),
+        "last_week": round(weekly[-1], 2),
+    }
+    if weeks >= 2:
+        findings["week_over_week_delta"] = round(weekly[-1] - weekly[-2], 2)
+    if weeks >= 2 * ROLLING_WEEKS:
+        recent = _mean(weekly[-ROLLING_WEEKS:])
+        previous = _mean(weekly[-2 * ROLLING_WEEKS : -ROLLING_WEEKS])
+        findings[f"rolling_{ROLLING_WEEKS}_week_rate"] = round(recent, 2)
+        findings[f"previous_{ROLLING_WEEKS}_week_rate"] = round(previous, 2)
+
+    if "severity" in buffers:
+        rated = [
+            (week, value)
+            for week, value in zip(week_index, buffers["severity"])
+            if not math.isnan(value)
+        ]
+        if rated:
+            findings["severity_mean"] = round(_mean([v for _, v in rated]), 2)
+            recent = [v for week, v in rated if week >= weeks - ROLLING_WEEKS]
+            if recent:
+                findings[f"severity_mean_last_{ROLLING_WEEKS}_weeks"] = round(
+                    _mean(recent), 2
+                )
+
+    change = detect_change_point(weekly)
+    if change is not None:
+        findings["change_point"] = {
+            "week_starting": _date(start + change * WEEK_SECONDS),
+            "weekly_mean_before": round(_mean(weekly[:change]), 2),
+            "weekly_mean_after": round(_mean(weekly[change:]), 2),
+        }
+    return findings
+
+
+def abs_findings(buffers: Dict) -> Dict:
+    """Trajectory of ABS total scores."""
+    scored = [
+        (time, score)
+        for time, score in zip(buffers["time"], buffers["score"])
+        if not math.isnan(score)
+    ]
+    if not scored:
+        return {}
+    times = [time for time, _ in scored]
+    scores = [score for _, score in scored]
+
+    findings = {
+        "first_score": scores[0],
+        "last_score": scores[-1],
+        "mean_score": round(_mean(scores), 2),
+        "max_score": max(scores),
+    }
+    if len(scores) >= 2 and times[-1] > times[0]:
+        weeks = [(time - times[0]) / WEEK_SECONDS for time in times]
+        mean_week, mean_score = _mean(weeks), _mean(scores)
+        slope = sum(
+            (week - mean_week) * (score - mean_score)
+            for week, score in zip(weeks, scores)
+        ) / sum((week - mean_week) ** 2 for week in weeks)
+        findings["score_change_per_week"] = round(slope, 2)
+
+    change = detect_change_point(scores)
+    if change is not None:
+        findings["change_point"] = {
+            "date": _date(times[change]),
+            "mean_score_before": round(_mean(scores[:change]), 2),
+            "mean_score_after": round(_mean(scores[change:]), 2),
+        }
+    return findings
+
+
+def analyse_patient(columns: Dict, until: float | None = None) -> Dict:
+    """Compute the findings of app.services.analytics.analyse_patient."""
+    all_times = [t for buffers in columns.values() for t in buffers["time"]]
+    if not all_times:
+        return {}
+
+    start, end = min(all_times), max(all_times)
+    if until is not None:
+        end = max(end, until)
+    weeks = int((end - start) // WEEK_SECONDS) + 1
+    findings = {"period": {"from": _date(start), "to": _date(end), "weeks": weeks}}
+
+    for source, buffers in columns.items():
+        if not buffers["time"]:
+            continue
+        if source == "ABS":
+            findings[source] = abs_findings(buffers)
+        else:
+            findings[source] = incident_findings(buffers, end)
+    return findings
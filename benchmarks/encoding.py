@@ -0,0 +1,137 @@
+"""
+Cost of encoding and compressing summary and cohort responses.
+
+Builds a synthetic summary, with sections and trend analytics, and a
+synthetic cohort report, then times for each:
+
+- default: validating the response model, jsonable_encoder and json.dumps,
+  as FastAPI does for a route returning a dict
+- encoder: the ModelEncoder serializer built once per model
+- gzip and br: compressing the encoded body (br only if brotli is installed)
+
+A cached summary skips all of these, since its encoded body and compressed
+variants are kept with the cache entry.
+
+Usage:
+    python -m benchmarks.encoding --weeks 104
+"""
+
+import argparse
+import json
+import random
+import timeit
+from datetime import datetime, timedelta
+from functools import partial
+
+from fastapi.encoders import jsonable_encoder
+
+from app.schemas.frameworks import CohortResponse, SummaryResponse
+from app.services.analytics import analyse_patient
+from app.services.cohort import MEAN_FIELDS, shape_aggregates
+from app.services.encoding import ModelEncoder, available_encodings, compress
+from app.services.summary import load_prompts
+from benchmarks.analytics import synthetic_columns
+
+
+def synthetic_summary(weeks: int) -> dict:
+    """A summary with every section filled and analytics over weeks."""
+    return {
+        "summary": "\n\n".join(
+            f"{section['title']}\n" + "Settled morning, agitated after visits. " * 12
+            for section in load_prompts()["sections"]
+        ),
+        "sections": [
+            {
+                "key": section["key"],
+                "title": section["title"],
+                "content": "Settled morning, agitated after visits. " * 12,
+                "regenerated": True,
+            }
+            for section in load_prompts()["sections"]
+        ],
+        "ai_tags": {"oasmnr_count": 420, "abs_count": 96, "abc_count": 12},
+        "analytics": analyse_patient(synthetic_columns(2_000, weeks)),
+    }
+
+
+def synthetic_cohort(weeks: int, seed: int = 0) -> dict:
+    """A cohort report of a ward with weekly aggregates of every type."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    aggregates = {
+        "weekly": [
+            {
+                "source": source,
+                "week": start + timedelta(weeks=week),
+                "submissions": rng.randint(20, 200),
+                "incidents": rng.randint(20, 400),
+                "patients": rng.randint(5, 30),
+                "mean": rng.uniform(1, 4),
+            }
+            for source in MEAN_FIELDS
+            for week in range(weeks)
+        ],
+        "severity": [
+            {"source": source, "level": level, "count": rng.randint(0, 500)}
+            for source in MEAN_FIELDS
+            for level in (1, 2, 3, 4)
+        ],
+        "antecedents": [
+            {"source": source, "antecedent": antecedent, "count": rng.randint(0, 90)}
+            for source in MEAN_FIELDS
+            for antecedent in range(1, 9)
+        ],
+    }
+    return {
+        "ward_id": "ward",
+        "since": start.date().isoformat(),
+        "patients": 30,
+        **shape_aggregates(aggregates, 30),
+    }
+
+
+def default_encode(model, content: dict) -> bytes:
+    """Encode a response as FastAPI does without a prebuilt serializer."""
+    return json.dumps(jsonable_encoder(model.model_validate(content))).encode()
+
+
+def best_microseconds(function, repeat: int) -> float:
+    """The best time per call of a function, in microseconds."""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e6
+
+
+def main(args: argparse.Namespace):
+    encodings = available_encodings()
+    header = f"{'response':>9} {'bytes':>8} {'default us':>11} {'encoder us':>11}"
+    for encoding in encodings:
+        header += f" {encoding + ' bytes':>10} {encoding + ' us':>9}"
+    print(header)
+    for name, model, content in (
+        ("summary", SummaryResponse, synthetic_summary(args.weeks)),
+        ("cohort", CohortResponse, synthetic_cohort(args.weeks)),
+    ):
+        encoder = ModelEncoder(model)
+        body = encoder(content)
+        if json.loads(body) != json.loads(default_encode(model, content)):
+            print(f"{name:>9} encodings differ")
+        default = best_microseconds(
+            partial(default_encode, model, content), args.repeat
+        )
+        encoded = best_microseconds(partial(encoder, content), args.repeat)
+        line = f"{name:>9} {len(body):>8} {default:>11.0f} {encoded:>11.0f}"
+        for encoding in encodings:
+            compressed = compress(body, encoding)
+            seconds = best_microseconds(partial(compress, body, encoding), args.repeat)
+            line += f" {len(compressed):>10} {seconds:>9.0f}"
+        print(line)
+    if "br" not in encodings:
+        print("brotli is not installed, so only gzip is measured")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--weeks", type=int, default=104)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
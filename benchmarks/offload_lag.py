@@ -0,0 +1,136 @@
+"""
+Event loop lag while serialising a large patient inline or offloaded.
+
+Builds a synthetic history of ABS submissions, as loaded from the database,
+and serialises it into prompt text twice while a LoopLagMonitor probes the
+event loop every 10 ms:
+
+- inline: rows preprocessed and serialised on the event loop, as for
+  patients under OFFLOAD_MIN_ROWS
+- offloaded: rows packed into column buffers on the event loop, as
+  fetch_columns does, then serialised by a warmed-up CpuOffload worker
+
+Reports the wall time and the p50/p99/max lag other requests would see.
+
+Usage:
+    python -m benchmarks.offload_lag --rows 5000 20000 50000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import sqlalchemy
+
+from app.data.patient_submissions import (
+    _pack_column,
+    _pipeline,
+    serialize_columns,
+)
+from app.models.simplified_models import SimplifiedAbs
+from app.preprocessing.submissions import ABS_SCALE_FIELDS, preprocess_abs_submission
+from app.services.analytics import new_columns
+from app.services.offload import CpuOffload, LoopLagMonitor
+
+
+def synthetic_submissions(rows: int, seed: int = 0) -> list[SimplifiedAbs]:
+    """ABS submissions of one patient every 15 minutes, some with comments."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    return [
+        SimplifiedAbs(
+            id=uuid.UUID(int=rng.getrandbits(128)),
+            patient_id=uuid.UUID(int=1),
+            **{field: rng.randint(0, 4) for field in ABS_SCALE_FIELDS},
+            observation_start=start + timedelta(minutes=15 * i),
+            observation_location="Ward",
+            status="ACTIVE",
+            updated_at=start,
+            additional_comments="Settled after 1:1 time" if i % 7 == 0 else None,
+            score=rng.randint(14, 56),
+            severity="MILD",
+        )
+        for i in range(rows)
+    ]
+
+
+async def serialize_inline(submissions: list[SimplifiedAbs]) -> str:
+    """Serialise submissions on the event loop, as the streaming path does."""
+
+    async def rows():
+        for submission in submissions:
+            yield preprocess_abs_submission(submission)
+
+    return await _pipeline(rows(), "ABS", [], new_columns())
+
+
+async def serialize_offloaded(
+    submissions: list[SimplifiedAbs], offload: CpuOffload
+) -> str:
+    """Pack submissions into column buffers and serialise them in the pool."""
+    columns = [
+        attribute.columns[0]
+        for attribute in sqlalchemy.inspect(SimplifiedAbs).column_attrs
+        if not attribute.deferred
+    ]
+    buffers = {}
+    for column in columns:
+        buffers[column.key] = _pack_column(
+            column, [getattr(submission, column.key) for submission in submissions]
+        )
+        # fetch_columns yields to the loop between partitions of rows
+        await asyncio.sleep(0)
+    result = await offload.run(serialize_columns, "ABS", buffers, rows=len(submissions))
+    return result["text"]
+
+
+async def measure(serialize) -> tuple[float, dict, int]:
+    """Return the wall time, loop lag and text length of one serialisation."""
+    monitor = LoopLagMonitor(0.01, 100_000)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    monitor._lags.clear()
+    started = time.perf_counter()
+    text = await serialize()
+    seconds = time.perf_counter() - started
+    # Let the probe delayed by the work record its lag
+    await asyncio.sleep(0.02)
+    monitor.stop()
+    return seconds, monitor.stats(), len(text)
+
+
+async def main(args: argparse.Namespace):
+    offload = CpuOffload(workers=1, min_rows=0)
+    await offload.warm_up("app.data.patient_submissions")
+    print(
+        f"{'rows':>7} {'mode':>10} {'wall ms':>9} {'p50 ms':>8} "
+        f"{'p99 ms':>8} {'max ms':>8}"
+    )
+    try:
+        for rows in args.rows:
+            submissions = synthetic_submissions(rows)
+            lengths = set()
+            for mode, serialize in (
+                ("inline", lambda: serialize_inline(submissions)),
+                ("offloaded", lambda: serialize_offloaded(submissions, offload)),
+            ):
+                seconds, lag, length = await measure(serialize)
+                lengths.add(length)
+                print(
+                    f"{rows:>7} {mode:>10} {seconds * 1000:>9.0f} "
+                    f"{lag.get('p50_ms', 0):>8.1f} {lag.get('p99_ms', 0):>8.1f} "
+                    f"{lag.get('max_ms', 0):>8.1f}"
+                )
+            if len(lengths) > 1:
+                print(f"{rows:>7} prompt texts differ; see tests/test_offload.py")
+    finally:
+        offload.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[5_000, 20_000, 50_000])
+    asyncio.run(main(parser.parse_args()))
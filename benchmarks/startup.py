@@ -0,0 +1,107 @@
+"""
+Cold start time of the app: import, deferred imports and first request.
+
+Each run starts a fresh interpreter that imports app.main, then times what
+startup no longer pays for until first use: loading the prompts, importing
+the LLM client, and the first and second requests through the ASGI app
+(without the lifespan, so no database, JWKS or LLM is needed). Reports the
+median of the runs, any deferred module app.main imports after all, and
+the packages taking longest to import in one `python -X importtime` run.
+
+Usage:
+    python -m benchmarks.startup --runs 5
+"""
+
+import argparse
+import collections
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules app.main must not import; they load on first use
+DEFERRED_MODULES = ["openai", "yaml", "app.models.database"]
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+timings = {"import app.main": time.perf_counter() - started}
+imported = [m for m in %(deferred)r if m in sys.modules]
+
+from fastapi.testclient import TestClient
+from app.services.summary import get_prompt_version, get_static_prompt
+
+started = time.perf_counter()
+get_static_prompt()
+get_prompt_version()
+timings["load prompts"] = time.perf_counter() - started
+
+started = time.perf_counter()
+import openai
+timings["import openai"] = time.perf_counter() - started
+
+client = TestClient(app.main.app)
+for name in ("first request", "second request"):
+    started = time.perf_counter()
+    client.get("/healthz")
+    timings[name] = time.perf_counter() - started
+print(json.dumps({"timings": timings, "imported": imported}))
+"""
+
+
+def run_child(env: dict) -> dict:
+    """Run one cold start in a new interpreter and return its timings."""
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD % {"deferred": DEFERRED_MODULES}],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    )
+    return json.loads(output.stdout.splitlines()[-1])
+
+
+def heaviest_packages(env: dict, top: int) -> list[tuple[int, str]]:
+    """The packages taking longest to import, by summed self time in us."""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    )
+    packages = collections.Counter()
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_time, _, name = line[len("import time:") :].split("|")
+        packages[name.strip().split(".")[0]] += int(self_time)
+    return [(time, package) for package, time in packages.most_common(top)]
+
+
+def main(args: argparse.Namespace):
+    # The session manager reads DATABASE_URL lazily; nothing connects to it
+    env = {**os.environ, "DATABASE_URL": "postgresql://localhost/startup"}
+    runs = [run_child(env) for _ in range(args.runs)]
+
+    print(f"{'step':>16} {'median ms':>10} {'min ms':>8}")
+    for step in runs[0]["timings"]:
+        times = [run["timings"][step] * 1000 for run in runs]
+        print(f"{step:>16} {statistics.median(times):>10.1f} {min(times):>8.1f}")
+
+    imported = sorted({module for run in runs for module in run["imported"]})
+    if imported:
+        print(f"deferred modules imported by app.main: {', '.join(imported)}")
+
+    print(f"\n{'import ms':>10}  package")
+    for self_time, package in heaviest_packages(env, args.top):
+        print(f"{self_time / 1000:>10.1f}  {package}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    main(parser.parse_args())
@@ -0,0 +1,118 @@
+"""
+Peak memory of materialised against streamed submission loading.
+
+Loads one patient's ABS history from Postgres twice, measuring the peak of
+Python allocations with tracemalloc:
+
+- materialised: every row fetched with result.scalars().all(), preprocessed
+  into a list of dictionaries and turned into prompt text with str()
+- streamed: rows fetched through a server-side cursor, STREAM_BATCH_SIZE at
+  a time, and serialised one by one
+
+The rows are written to a temporary schema, which is dropped afterwards.
+
+Usage:
+    BENCHMARK_DATABASE_URL=postgresql+asyncpg://... \\
+        python -m benchmarks.stream_memory --rows 50000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.data.patient_submissions import STREAM_BATCH_SIZE, get_abs, stream_abs
+from app.models.simplified_models import SimplifiedAbs
+from app.preprocessing.submissions import ABS_SCALE_FIELDS, serialize_rows
+
+
+async def insert_rows(engine, patient_id: uuid.UUID, rows: int):
+    """Write a history of ABS submissions for one patient."""
+    start = datetime(2024, 1, 1)
+    async with engine.begin() as connection:
+        await connection.run_sync(SimplifiedAbs.__table__.create)
+        for offset in range(0, rows, 5000):
+            await connection.execute(
+                SimplifiedAbs.__table__.insert(),
+                [
+                    {
+                        "id": uuid.uuid4(),
+                        "patient_id": patient_id,
+                        **{field: random.randint(0, 4) for field in ABS_SCALE_FIELDS},
+                        "observation_start": start + timedelta(minutes=15 * i),
+                        "observation_location": "Ward",
+                        "status": "ACTIVE",
+                        "updated_at": start,
+                        "additional_comments": "Settled after 1:1 time",
+                        "score": random.randint(14, 56),
+                        "severity": "MILD",
+                    }
+                    for i in range(offset, min(offset + 5000, rows))
+                ],
+            )
+
+
+async def measure(load) -> tuple[int, int]:
+    """Return the peak traced memory of a load and the length of its text."""
+    tracemalloc.start()
+    try:
+        prompt = await load()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, len(prompt)
+
+
+async def main(args: argparse.Namespace):
+    schema = f"stream_memory_{uuid.uuid4().hex}"
+    admin = create_async_engine(args.database_url)
+    async with admin.begin() as connection:
+        await connection.execute(text(f"CREATE SCHEMA {schema}"))
+    engine = create_async_engine(
+        args.database_url,
+        connect_args={"server_settings": {"search_path": schema}},
+    )
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    patient_id = uuid.uuid4()
+    try:
+        await insert_rows(engine, patient_id, args.rows)
+
+        async def materialised():
+            async with sessions() as db_session:
+                return str(await get_abs(db_session, patient_id))
+
+        async def streamed():
+            async with sessions() as db_session:
+                return await serialize_rows(stream_abs(db_session, patient_id))
+
+        # Warm up connections and module state outside the measurements
+        await streamed()
+        print(f"{args.rows} rows, stream batch size {STREAM_BATCH_SIZE}")
+        for name, load in (("materialised", materialised), ("streamed", streamed)):
+            peak, length = await measure(load)
+            print(f"{name:>12}: peak {peak / 2**20:8.1f} MiB, text {length} chars")
+    finally:
+        await engine.dispose()
+        async with admin.begin() as connection:
+            await connection.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await admin.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument(
+        "--database-url",
+        default=os.getenv("BENCHMARK_DATABASE_URL"),
+        help="Async SQLAlchemy URL of a disposable Postgres database",
+    )
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or BENCHMARK_DATABASE_URL is required")
+    asyncio.run(main(args))
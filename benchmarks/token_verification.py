@@ -0,0 +1,67 @@
+"""
+Time of cached against cold bearer token verification.
+
+Signs tokens with a generated RSA key and validates them with a
+TokenValidator holding the matching public key, so no JWKS endpoint is
+needed:
+
+- cold: every token is new, so each pays for RS256 signature verification
+  (run in a worker thread, as for a user's first request)
+- cached: the same tokens again, answered from the verified token cache
+
+Usage:
+    python -m benchmarks.token_verification --tokens 1000
+"""
+
+import argparse
+import asyncio
+import time
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from app.dependencies.security import TokenValidator
+
+
+def make_tokens(count: int, key_size: int) -> tuple[list[str], object]:
+    """Tokens of distinct users signed with a new key, and its public key."""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+    expires = int(time.time()) + 3600
+    tokens = [
+        jwt.encode(
+            {"sub": f"user-{i}", "exp": expires, "permissions": ["summary:read"]},
+            private_key,
+            algorithm="RS256",
+            headers={"kid": "benchmark"},
+        )
+        for i in range(count)
+    ]
+    return tokens, private_key.public_key()
+
+
+async def validate_all(validator: TokenValidator, tokens: list[str]) -> float:
+    """Validate tokens one at a time and return the mean milliseconds each."""
+    started = time.perf_counter()
+    for token in tokens:
+        await validator.validate_token(token)
+    return (time.perf_counter() - started) / len(tokens) * 1000
+
+
+async def main(args: argparse.Namespace):
+    tokens, public_key = make_tokens(args.tokens, args.key_size)
+    validator = TokenValidator(cache_size=args.tokens)
+    validator.public_keys = {"benchmark": public_key}
+    validator.keys_fetched_at = time.time()
+
+    cold = await validate_all(validator, tokens)
+    cached = min([await validate_all(validator, tokens) for _ in range(args.repeat)])
+    print(f"{'tokens':>8} {'cold ms':>10} {'cached ms':>10} {'speedup':>8}")
+    print(f"{args.tokens:>8} {cold:>10.3f} {cached:>10.4f} {cold / cached:>7.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--tokens", type=int, default=1_000)
+    parser.add_argument("--key-size", type=int, default=2048)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,8 @@
+"""Shared test setup."""
+
+import os
+
+# The database session manager reads DATABASE_URL when first used; unit
+# tests stub it out, and a placeholder keeps any use that slips through
+# failing on connection rather than on configuration
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/test")
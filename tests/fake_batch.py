@@ -0,0 +1,131 @@
+"""
+Fake Batch Client.
+
+An in-process stand-in for the provider's files and batches APIs, used to
+run batch jobs in tests without an LLM deployment. Batches stay in progress
+for a set number of status checks, then complete with a canned summary for
+every request, except chosen items that fail a set number of times.
+"""
+
+import json
+import uuid
+from types import SimpleNamespace
+from typing import Dict
+
+
+class _FakeFiles:
+    """Stores uploaded and generated files in memory."""
+
+    def __init__(self):
+        self.contents = {}
+
+    async def create(self, file, purpose: str):
+        file_id = f"file-{uuid.uuid4().hex}"
+        self.contents[file_id] = file.read().decode("utf-8")
+        return SimpleNamespace(id=file_id, purpose=purpose)
+
+    async def content(self, file_id: str):
+        return SimpleNamespace(text=self.contents[file_id])
+
+
+class _FakeBatches:
+    """Runs batches, writing output and error files once they complete."""
+
+    def __init__(self, files: _FakeFiles, failures: Dict[str, int], polls: int):
+        self.files = files
+        self.failures = dict(failures)
+        self.polls = polls
+        self.batches = {}
+        self.submitted = []
+        self.retrieved = 0
+
+    async def create(self, input_file_id: str, endpoint: str, completion_window: str):
+        requests = [
+            json.loads(line) for line in self.files.contents[input_file_id].splitlines()
+        ]
+        self.submitted.append([request["custom_id"] for request in requests])
+        batch = SimpleNamespace(
+            id=f"batch-{uuid.uuid4().hex}",
+            status="validating",
+            endpoint=endpoint,
+            completion_window=completion_window,
+            output_file_id=None,
+            error_file_id=None,
+            polls_left=self.polls,
+            requests=requests,
+        )
+        self.batches[batch.id] = batch
+        return batch
+
+    async def retrieve(self, batch_id: str):
+        self.retrieved += 1
+        batch = self.batches[batch_id]
+        if batch.status == "completed":
+            return batch
+        if batch.polls_left:
+            batch.polls_left -= 1
+            batch.status = "in_progress"
+            return batch
+        self._complete(batch)
+        return batch
+
+    def _complete(self, batch):
+        outputs, errors = [], []
+        for request in batch.requests:
+            custom_id = request["custom_id"]
+            if self.failures.get(custom_id):
+                self.failures[custom_id] -= 1
+                errors.append(
+                    {
+                        "custom_id": custom_id,
+                        "response": None,
+                        "error": {"code": "server_error", "message": "Fake failure"},
+                    }
+                )
+                continue
+            prompt = request["body"]["messages"][-1]["content"]
+            outputs.append(
+                {
+                    "custom_id": custom_id,
+                    "response": {
+                        "status_code": 200,
+                        "body": {
+                            "choices": [
+                                {
+                                    "message": {
+                                        "role": "assistant",
+                                        "content": json.dumps(
+                                            {"patient_overview": "Fake summary."}
+                                        ),
+                                    }
+                                }
+                            ],
+                            "usage": {
+                                "prompt_tokens": len(prompt) // 4,
+                                "completion_tokens": 5,
+                            },
+                        },
+                    },
+                    "error": None,
+                }
+            )
+
+        if outputs:
+            batch.output_file_id = f"file-{uuid.uuid4().hex}"
+            self.files.contents[batch.output_file_id] = "\n".join(
+                map(json.dumps, outputs)
+            )
+        if errors:
+            batch.error_file_id = f"file-{uuid.uuid4().hex}"
+            self.files.contents[batch.error_file_id] = "\n".join(
+                map(json.dumps, errors)
+            )
+        batch.status = "completed"
+
+
+class FakeBatchClient:
+    """Minimal async client exposing files and batches like the OpenAI SDK."""
+
+    def __init__(self, failures: Dict[str, int] | None = None, polls: int = 0):
+        self.files = _FakeFiles()
+        self.batches = _FakeBatches(self.files, failures or {}, polls)
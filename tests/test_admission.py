@@ -0,0 +1,56 @@
+"""Tests of admission control against request deadlines."""
+
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.dependencies.admission import AdmissionController
+
+
+async def hold(controller: AdmissionController, started: asyncio.Event, release):
+    """Occupy a slot until released."""
+    async with controller.admit(time.monotonic() + 60):
+        started.set()
+        await release.wait()
+
+
+def test_idle_worker_admits_short_deadlines():
+    controller = AdmissionController(max_concurrency=1)
+    assert controller.service_time is None
+
+    async def admit():
+        async with controller.admit(time.monotonic() + 0.5):
+            pass
+
+    asyncio.run(admit())
+    # Seeded from the observed time rather than a fixed guess
+    assert controller.service_time < 0.5
+
+    controller.service_time = 10.0
+    asyncio.run(admit())
+
+
+def test_busy_worker_sheds_requests_that_cannot_finish():
+    controller = AdmissionController(max_concurrency=2)
+    controller.service_time = 10.0
+
+    async def admit_while_busy():
+        started, release = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(hold(controller, started, release))
+        await started.wait()
+        try:
+            with pytest.raises(HTTPException) as error:
+                async with controller.admit(time.monotonic() + 5):
+                    pass
+            async with controller.admit(time.monotonic() + 30):
+                pass
+        finally:
+            release.set()
+            await holder
+        return error.value
+
+    error = asyncio.run(admit_while_busy())
+    assert error.status_code == 503
+    assert "Retry-After" in error.headers
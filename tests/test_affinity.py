@@ -0,0 +1,92 @@
+"""Tests of the consistent-hash ring and patient affinity routing."""
+
+import uuid
+from collections import Counter
+
+from starlette.requests import Request
+
+from app.services.affinity import (
+    FORWARDED_HEADER,
+    HashRing,
+    PatientAffinity,
+    parse_nodes,
+)
+
+NODES = [f"http://node-{i}:8000" for i in range(4)]
+PATIENTS = [str(uuid.UUID(int=i)) for i in range(4000)]
+
+
+def request(headers=None):
+    """A bare request with the given headers."""
+    return Request(
+        {
+            "type": "http",
+            "headers": [
+                (name.encode(), value.encode())
+                for name, value in (headers or {}).items()
+            ],
+        }
+    )
+
+
+def test_empty_ring_has_no_owner():
+    assert HashRing([]).owner("patient") is None
+
+
+def test_owner_is_stable_and_independent_of_node_order():
+    ring = HashRing(NODES)
+    reversed_ring = HashRing(list(reversed(NODES)))
+    owners = [ring.owner(patient) for patient in PATIENTS]
+    assert owners == [ring.owner(patient) for patient in PATIENTS]
+    assert owners == [reversed_ring.owner(patient) for patient in PATIENTS]
+
+
+def test_patients_spread_over_nodes():
+    ring = HashRing(NODES)
+    owners = Counter(ring.owner(patient) for patient in PATIENTS)
+    assert set(owners) == set(NODES)
+    assert max(owners.values()) < 1.5 * len(PATIENTS) / len(NODES)
+
+
+def test_adding_a_node_only_moves_patients_to_it():
+    ring = HashRing(NODES)
+    before = {patient: ring.owner(patient) for patient in PATIENTS}
+    ring.set_nodes(NODES + ["http://node-new:8000"])
+    moved = [patient for patient in PATIENTS if ring.owner(patient) != before[patient]]
+    assert all(ring.owner(patient) == "http://node-new:8000" for patient in moved)
+    assert len(moved) < 0.35 * len(PATIENTS)
+
+
+def test_removing_a_node_only_moves_its_patients():
+    ring = HashRing(NODES)
+    before = {patient: ring.owner(patient) for patient in PATIENTS}
+    ring.set_nodes(NODES[1:])
+    for patient in PATIENTS:
+        if before[patient] != NODES[0]:
+            assert ring.owner(patient) == before[patient]
+
+
+def test_parse_nodes():
+    value = "http://b:8000/, http://a:8000\nhttp://b:8000,,"
+    assert parse_nodes(value) == ["http://a:8000", "http://b:8000"]
+
+
+def test_affinity_routes_to_remote_owner_once():
+    affinity = PatientAffinity(NODES[0], NODES, "forward")
+    remote = next(p for p in PATIENTS if affinity.ring.owner(p) != NODES[0])
+    local = next(p for p in PATIENTS if affinity.ring.owner(p) == NODES[0])
+
+    assert affinity.remote_owner(remote, request()) == affinity.ring.owner(remote)
+    assert affinity.remote_owner(local, request()) is None
+    # A forwarded request is served where it lands
+    assert affinity.remote_owner(remote, request({FORWARDED_HEADER: NODES[1]})) is None
+    assert affinity.owns(local) and not affinity.owns(remote)
+
+    groups = affinity.partition([local, remote], request())
+    assert groups == {None: [local], affinity.ring.owner(remote): [remote]}
+
+
+def test_single_node_owns_everything():
+    affinity = PatientAffinity(NODES[0], NODES[:1], "forward")
+    assert not affinity.enabled
+    assert all(affinity.owns(patient) for patient in PATIENTS[:100])
@@ -0,0 +1,150 @@
+"""Tests of the NumPy trend analytics against the pure-Python baseline."""
+
+import math
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from app.services.analytics import (
+    WEEK_SECONDS,
+    analyse_patient,
+    collect_row,
+    detect_change_point,
+    new_columns,
+)
+from benchmarks import analytics_baseline
+from benchmarks.analytics import synthetic_columns
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def assert_close(actual, expected):
+    """Compare findings, allowing float rounding to differ in the last place."""
+    if isinstance(expected, dict):
+        assert actual.keys() == expected.keys()
+        for key in expected:
+            assert_close(actual[key], expected[key])
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, abs=0.011)
+    else:
+        assert actual == expected
+
+
+@pytest.mark.parametrize("incidents", [1, 7, 40, 500, 5000])
+@pytest.mark.parametrize("weeks", [1, 5, 52])
+def test_matches_baseline(incidents, weeks):
+    columns = synthetic_columns(incidents * 4, weeks, seed=incidents + weeks)
+    assert_close(analyse_patient(columns), analytics_baseline.analyse_patient(columns))
+
+
+def test_no_rows():
+    assert analyse_patient(new_columns()) == {}
+
+
+def test_collect_row_skips_rows_without_time():
+    columns = new_columns()
+    collect_row(columns, "OASMNR", {"time_of_behaviour": None, "recordings": 2})
+    collect_row(
+        columns,
+        "OASMNR",
+        {"time_of_behaviour": START.replace(tzinfo=None), "severity": None},
+    )
+    assert columns["OASMNR"]["time"] == [START.timestamp()]
+    assert math.isnan(columns["OASMNR"]["recordings"][0])
+    assert math.isnan(columns["OASMNR"]["severity"][0])
+
+
+def test_weekly_counts_weight_recordings():
+    columns = new_columns()
+    for day, recordings in [(0, 2), (1, None), (8, 3), (15, 1)]:
+        collect_row(
+            columns,
+            "OASMNR",
+            {
+                "time_of_behaviour": START + timedelta(days=day),
+                "recordings": recordings,
+                "severity": 2,
+            },
+        )
+    findings = analyse_patient(columns)["OASMNR"]
+    assert findings["total"] == 7
+    assert findings["last_week"] == 1
+    assert findings["week_over_week_delta"] == -2
+    assert findings["severity_mean"] == 2
+
+
+def test_change_point_found_at_step():
+    values = [1.0] * 6 + [5.0] * 6
+    assert detect_change_point(np.array(values)) == 6
+    assert analytics_baseline.detect_change_point(values) == 6
+
+
+def test_no_change_point_in_flat_or_short_series():
+    assert detect_change_point(np.full(12, 3.0)) is None
+    assert detect_change_point(np.array([1.0, 1.0, 5.0, 5.0])) is None
+
+
+@pytest.mark.parametrize("weeks_after", [0, 1, 9])
+def test_matches_baseline_up_to_now(weeks_after):
+    columns = synthetic_columns(400, 20, seed=weeks_after)
+    now = START.timestamp() + (20 + weeks_after) * WEEK_SECONDS
+    assert_close(
+        analyse_patient(columns, until=now),
+        analytics_baseline.analyse_patient(columns, until=now),
+    )
+
+
+def test_type_findings_ignore_earlier_types():
+    columns = new_columns()
+    for week in range(10):
+        collect_row(
+            columns, "ABC", {"occurred_at": START + timedelta(weeks=week, hours=1)}
+        )
+    before = analyse_patient(columns)["ABC"]
+    collect_row(columns, "SASBA", {"time_of_behaviour": START - timedelta(weeks=30)})
+    assert analyse_patient(columns)["ABC"] == before
+
+
+def test_stopped_incidents_drop_to_zero():
+    columns = new_columns()
+    for week in range(12):
+        collect_row(
+            columns,
+            "OASMNR",
+            {"time_of_behaviour": START + timedelta(weeks=week), "recordings": 1},
+        )
+        if week < 4:
+            collect_row(columns, "ABC", {"occurred_at": START + timedelta(weeks=week)})
+
+    findings = analyse_patient(columns)
+    abc = findings["ABC"]
+    # ABC stopped after four weeks; the period runs on to the last OASMNR
+    assert abc["to"] == (START + timedelta(weeks=3)).date().isoformat()
+    assert abc["last_week"] == 0
+    assert abc["weekly_mean"] == round(4 / 12, 2)
+    assert abc["rolling_4_week_rate"] == 0
+    assert abc["change_point"]["weekly_mean_after"] == 0
+    assert findings["OASMNR"]["last_week"] == 1
+    assert_close(findings, analytics_baseline.analyse_patient(columns))
+
+    # Live summaries run up to now, so every type shows the quiet weeks
+    now = (START + timedelta(weeks=14)).timestamp()
+    findings = analyse_patient(columns, until=now)
+    assert findings["period"]["weeks"] == 15
+    assert findings["OASMNR"]["last_week"] == 0
+    assert findings["OASMNR"]["week_over_week_delta"] == 0
+    assert findings["OASMNR"]["rolling_4_week_rate"] == 0.25
+    assert_close(findings, analytics_baseline.analyse_patient(columns, until=now))
+
+
+def test_abs_score_trajectory():
+    columns = new_columns()
+    for week, score in enumerate([20, 22, 24, 26, None, 30]):
+        columns["ABS"]["time"].append(START.timestamp() + week * WEEK_SECONDS)
+        columns["ABS"]["score"].append(math.nan if score is None else float(score))
+    findings = analyse_patient(columns)["ABS"]
+    assert findings["first_score"] == 20
+    assert findings["last_score"] == 30
+    assert findings["score_change_per_week"] == 2
+    assert_close(findings, analytics_baseline.analyse_patient(columns)["ABS"])
@@ -0,0 +1,160 @@
+"""Tests of batch-job summary generation against the fake batch client."""
+
+import asyncio
+import contextlib
+import json
+
+import pytest
+
+from app.services import batch_jobs
+from tests.fake_batch import FakeBatchClient
+
+PATIENTS = ["p1", "p2", "p3", "p4"]
+
+
+class FakeSessionManager:
+    """Hands out placeholder sessions; the data functions are stubbed."""
+
+    @contextlib.asynccontextmanager
+    async def session(self, replica=None):
+        yield None
+
+
+@pytest.fixture
+def data(monkeypatch):
+    """Stub the patient data read by batch jobs; tests change fingerprints."""
+    fingerprints = {patient_id: "v1" for patient_id in PATIENTS}
+    recorded = []
+
+    async def get_patient_ids(db_session, org_id, ward_id):
+        return list(PATIENTS)
+
+    async def get_data_fingerprints(db_session, patient_ids):
+        return {patient_id: fingerprints[patient_id] for patient_id in patient_ids}
+
+    async def build_summary_request(patient_id, max_replica_lag=None):
+        if patient_id == "p4":
+            return {
+                "messages": None,
+                "sections": None,
+                "ai_tags": {},
+                "analytics": {},
+                "fingerprint": fingerprints[patient_id],
+            }
+        return {
+            "messages": [{"role": "user", "content": f"Prompt for {patient_id}"}],
+            "sections": [
+                {
+                    "key": "patient_overview",
+                    "title": "Patient Overview",
+                    "content": None,
+                    "regenerated": True,
+                    "inputs_digest": "digest",
+                    "inputs": ["period"],
+                }
+            ],
+            "ai_tags": {"abs_count": 1},
+            "analytics": {},
+            "fingerprint": fingerprints[patient_id],
+        }
+
+    monkeypatch.setattr(batch_jobs, "sessionmanager", FakeSessionManager())
+    monkeypatch.setattr(batch_jobs, "get_patient_ids", get_patient_ids)
+    monkeypatch.setattr(batch_jobs, "get_data_fingerprints", get_data_fingerprints)
+    monkeypatch.setattr(batch_jobs, "build_summary_request", build_summary_request)
+    monkeypatch.setattr(
+        batch_jobs.usage_ledger, "record", lambda *args: recorded.append(args)
+    )
+    return {"fingerprints": fingerprints, "recorded": recorded}
+
+
+def run(tmp_path, client, max_retries=2):
+    """Run a batch job into tmp_path and return its report."""
+    return asyncio.run(
+        batch_jobs.run_batch_job(
+            output=tmp_path / "summaries.jsonl",
+            checkpoint_path=tmp_path / "summaries.ckpt.json",
+            work_dir=tmp_path / "work",
+            client=client,
+            model="batch-model",
+            poll_interval=0,
+            max_retries=max_retries,
+        )
+    )
+
+
+def read_output(tmp_path):
+    """The records written to the JSONL output."""
+    with open(tmp_path / "summaries.jsonl", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_submits_polls_and_ingests(tmp_path, data):
+    client = FakeBatchClient(polls=2)
+    report = run(tmp_path, client)
+
+    assert report["generated"] == 4
+    assert report["failed"] == 0
+    assert report["batches"] == 1
+    # Patients without data need no batch item
+    assert client.batches.submitted == [["p1", "p2", "p3"]]
+    assert client.batches.retrieved == 3
+
+    records = {record["patient_id"]: record for record in read_output(tmp_path)}
+    assert records["p1"]["summary"] == "Patient Overview\nFake summary."
+    assert records["p4"]["summary"] == batch_jobs.NO_DATA_SUMMARY
+    assert [args[0] for args in data["recorded"]] == ["p1", "p2", "p3"]
+    assert data["recorded"][0][2:4] == ("batch", "batch-model")
+
+    with open(tmp_path / "work" / "batch_input_0.jsonl", encoding="utf-8") as f:
+        line = json.loads(f.readline())
+    assert line["body"]["model"] == "batch-model"
+    assert line["body"]["messages"][-1]["content"] == "Prompt for p1"
+
+
+def test_failed_items_are_resubmitted(tmp_path, data):
+    client = FakeBatchClient(failures={"p2": 1, "p3": 5})
+    report = run(tmp_path, client, max_retries=1)
+
+    assert client.batches.submitted == [["p1", "p2", "p3"], ["p2", "p3"]]
+    assert report["generated"] == 3
+    assert report["failed"] == 1
+    assert {record["patient_id"] for record in read_output(tmp_path)} == {
+        "p1",
+        "p2",
+        "p4",
+    }
+
+
+def test_resume_skips_unchanged_patients(tmp_path, data):
+    run(tmp_path, FakeBatchClient(failures={"p3": 5}), max_retries=0)
+
+    data["fingerprints"]["p1"] = "v2"
+    client = FakeBatchClient()
+    report = run(tmp_path, client)
+
+    # p1 changed and p3 failed before; the rest are checkpointed
+    assert client.batches.submitted == [["p1", "p3"]]
+    assert report["skipped"] == 2
+    assert report["generated"] == 2
+    assert [record["patient_id"] for record in read_output(tmp_path)][-2:] == [
+        "p1",
+        "p3",
+    ]
+
+
+def test_build_errors_count_as_failures(tmp_path, data, monkeypatch):
+    build = batch_jobs.build_summary_request
+
+    async def build_summary_request(patient_id, max_replica_lag=None):
+        if patient_id == "p2":
+            raise RuntimeError("database unavailable")
+        return await build(patient_id, max_replica_lag)
+
+    monkeypatch.setattr(batch_jobs, "build_summary_request", build_summary_request)
+    client = FakeBatchClient()
+    report = run(tmp_path, client)
+
+    assert client.batches.submitted == [["p1", "p3"]]
+    assert report["failed"] == 1
+    assert report["generated"] == 3
@@ -0,0 +1,121 @@
+"""Tests of resuming bulk summary runs and incremental regeneration."""
+
+import asyncio
+import contextlib
+import json
+
+import pytest
+
+from app.services import bulk_summaries
+
+PATIENTS = ["p1", "p2", "p3"]
+
+
+class FakeSessionManager:
+    """Hands out placeholder sessions; the data functions are stubbed."""
+
+    @contextlib.asynccontextmanager
+    async def session(self, replica=None):
+        yield None
+
+
+@pytest.fixture
+def data(monkeypatch):
+    """Stub the patient data and generation; tests change fingerprints."""
+    fingerprints = {patient_id: "v1" for patient_id in PATIENTS}
+    calls = []
+
+    async def get_patient_ids(db_session, org_id, ward_id):
+        return list(PATIENTS)
+
+    async def get_data_fingerprints(db_session, patient_ids):
+        return {patient_id: fingerprints[patient_id] for patient_id in patient_ids}
+
+    async def get_patient_summary(
+        patient_id, max_replica_lag=None, previous=None, source="interactive"
+    ):
+        calls.append((patient_id, previous))
+        return {
+            "summary": f"Summary of {patient_id} at {fingerprints[patient_id]}",
+            "sections": [
+                {
+                    "key": "patient_overview",
+                    "title": "Patient Overview",
+                    "content": "Settled",
+                    "regenerated": previous is None,
+                    "inputs_digest": fingerprints[patient_id],
+                    "inputs": ["period"],
+                }
+            ],
+            "ai_tags": {},
+            "analytics": {},
+            "fingerprint": fingerprints[patient_id],
+        }
+
+    monkeypatch.setattr(bulk_summaries, "sessionmanager", FakeSessionManager())
+    monkeypatch.setattr(bulk_summaries, "get_patient_ids", get_patient_ids)
+    monkeypatch.setattr(bulk_summaries, "get_data_fingerprints", get_data_fingerprints)
+    monkeypatch.setattr(bulk_summaries, "get_patient_summary", get_patient_summary)
+    monkeypatch.setattr(bulk_summaries, "get_prompt_version", lambda: "prompts")
+    return {"fingerprints": fingerprints, "calls": calls}
+
+
+def run(tmp_path):
+    """Run a bulk generation into tmp_path and return its report."""
+    return asyncio.run(
+        bulk_summaries.generate_bulk_summaries(
+            output=tmp_path / "summaries.jsonl",
+            checkpoint_path=tmp_path / "summaries.ckpt.json",
+        )
+    )
+
+
+def output_lines(tmp_path):
+    with open(tmp_path / "summaries.jsonl", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_changed_patients_are_passed_their_previous_summary(tmp_path, data):
+    assert run(tmp_path)["generated"] == 3
+    assert all(previous is None for _, previous in data["calls"])
+
+    data["calls"].clear()
+    data["fingerprints"]["p2"] = "v2"
+    report = run(tmp_path)
+    assert (report["generated"], report["skipped"]) == (1, 2)
+    ((patient_id, previous),) = data["calls"]
+    assert patient_id == "p2"
+    assert previous["summary"] == "Summary of p2 at v1"
+    assert previous["sections"][0]["inputs_digest"] == "v1"
+
+
+def test_latest_record_is_the_previous_summary(tmp_path, data):
+    run(tmp_path)
+    data["fingerprints"]["p1"] = "v2"
+    run(tmp_path)
+    data["fingerprints"]["p1"] = "v3"
+    data["calls"].clear()
+    run(tmp_path)
+    ((_, previous),) = data["calls"]
+    assert previous["summary"] == "Summary of p1 at v2"
+
+
+def test_records_written_before_a_crash_are_not_duplicated(tmp_path, data):
+    run(tmp_path)
+    # A crash after p2's new line was written, before the checkpoint was
+    # saved, and while p3's line was half-written
+    data["fingerprints"]["p2"] = "v2"
+    data["fingerprints"]["p3"] = "v2"
+    record = dict(output_lines(tmp_path)[1], fingerprint="v2")
+    with open(tmp_path / "summaries.jsonl", "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+        f.write('{"patient_id": "p3", "fingerp')
+
+    data["calls"].clear()
+    report = run(tmp_path)
+    assert (report["generated"], report["skipped"]) == (1, 2)
+    assert [patient_id for patient_id, _ in data["calls"]] == ["p3"]
+    lines = output_lines(tmp_path)
+    assert [line["patient_id"] for line in lines] == ["p1", "p2", "p3", "p2", "p3"]
+    checkpoint = json.loads((tmp_path / "summaries.ckpt.json").read_text())
+    assert checkpoint["p2"] == "v2|prompts"
@@ -0,0 +1,216 @@
+"""
+Tests of the patient data version triggers against a real Postgres.
+
+Set TEST_DATABASE_URL to an async SQLAlchemy URL of a disposable database,
+for example postgresql+asyncpg://postgres@localhost/test, to run them. Each
+test works in its own schema, which is dropped afterwards.
+"""
+
+import asyncio
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.data.data_versions import (
+    backfill_data_versions,
+    get_data_version,
+    get_data_versions,
+    install_data_versions,
+    triggers_installed,
+    version_fingerprint,
+)
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"
+)
+
+# The columns of the submission and history tables the triggers use. The
+# assessment type is a lowercase enum, as in the application database.
+SCHEMA = """
+CREATE TYPE assessment_type AS ENUM ('oasmnr', 'sasba');
+CREATE TABLE oasmnr_submissions (
+    id uuid PRIMARY KEY, patient_id uuid, assessment_type assessment_type,
+    updated_at timestamp
+);
+CREATE TABLE abs_submissions (id uuid PRIMARY KEY, patient_id uuid, updated_at timestamp);
+CREATE TABLE abc_submissions (id uuid PRIMARY KEY, patient_id uuid, updated_at timestamp);
+CREATE TABLE oasmnr_history (id uuid PRIMARY KEY, oasmnr_id uuid, updated_at timestamp);
+CREATE TABLE abs_history (id uuid PRIMARY KEY, abs_id uuid, updated_at timestamp);
+CREATE TABLE abc_history (id uuid PRIMARY KEY, abc_id uuid, updated_at timestamp)
+"""
+
+
+def run(test):
+    """Run an async test body against a fresh schema."""
+
+    async def main():
+        schema = f"data_versions_{uuid.uuid4().hex}"
+        admin = create_async_engine(TEST_DATABASE_URL)
+        async with admin.begin() as connection:
+            await connection.execute(text(f"CREATE SCHEMA {schema}"))
+        engine = create_async_engine(
+            TEST_DATABASE_URL,
+            connect_args={"server_settings": {"search_path": schema}},
+        )
+        try:
+            async with engine.begin() as connection:
+                for statement in SCHEMA.split(";"):
+                    await connection.execute(text(statement))
+            await test(engine)
+        finally:
+            await engine.dispose()
+            async with admin.begin() as connection:
+                await connection.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+            await admin.dispose()
+
+    asyncio.run(main())
+
+
+async def insert(connection, table: str, **values):
+    """Insert one row with a new id and return the id."""
+    values = {"id": uuid.uuid4(), "updated_at": datetime(2024, 1, 1), **values}
+    columns = ", ".join(values)
+    await connection.execute(
+        text(
+            f"INSERT INTO {table} ({columns}) "
+            f"VALUES ({', '.join(f':{column}' for column in values)})"
+        ),
+        values,
+    )
+    return values["id"]
+
+
+async def fingerprint(engine, patient_id) -> str:
+    """The version fingerprint of one patient."""
+    async with engine.connect() as connection:
+        return version_fingerprint(await get_data_version(connection, patient_id))
+
+
+def test_install_backfills_every_submission_type():
+    async def test(engine):
+        patient = uuid.uuid4()
+        async with engine.begin() as connection:
+            oasmnr = await insert(
+                connection,
+                "oasmnr_submissions",
+                patient_id=patient,
+                assessment_type="oasmnr",
+            )
+            await insert(
+                connection,
+                "oasmnr_submissions",
+                patient_id=patient,
+                assessment_type="sasba",
+            )
+            abs_id = await insert(connection, "abs_submissions", patient_id=patient)
+            await insert(connection, "abc_submissions", patient_id=patient)
+            await insert(connection, "oasmnr_history", oasmnr_id=oasmnr)
+            await insert(connection, "abs_history", abs_id=abs_id)
+        async with engine.begin() as connection:
+            assert await install_data_versions(connection) == 4
+            assert await triggers_installed(connection)
+        assert await fingerprint(engine, patient) == "v|1|1|1|1"
+
+        # A second backfill only bumps versions
+        async with engine.begin() as connection:
+            await backfill_data_versions(connection)
+        assert await fingerprint(engine, patient) == "v|2|2|2|2"
+
+    run(test)
+
+
+def test_triggers_bump_the_changed_type():
+    async def test(engine):
+        patient, other = uuid.uuid4(), uuid.uuid4()
+        async with engine.begin() as connection:
+            await install_data_versions(connection)
+
+        async with engine.begin() as connection:
+            sasba = await insert(
+                connection,
+                "oasmnr_submissions",
+                patient_id=patient,
+                assessment_type="sasba",
+            )
+        assert await fingerprint(engine, patient) == "v|0|1|0|0"
+
+        async with engine.begin() as connection:
+            await insert(connection, "oasmnr_history", oasmnr_id=sasba)
+            abc = await insert(connection, "abc_submissions", patient_id=patient)
+            await insert(connection, "abc_history", abc_id=abc)
+        assert await fingerprint(engine, patient) == "v|0|2|0|2"
+
+        # Retyping a submission bumps its old and new type
+        async with engine.begin() as connection:
+            await connection.execute(
+                text(
+                    "UPDATE oasmnr_submissions SET assessment_type = 'oasmnr' "
+                    "WHERE id = :id"
+                ),
+                {"id": sasba},
+            )
+        assert await fingerprint(engine, patient) == "v|1|3|0|2"
+
+        # Moving a submission to another patient bumps both patients
+        async with engine.begin() as connection:
+            await connection.execute(
+                text("UPDATE abc_submissions SET patient_id = :other WHERE id = :id"),
+                {"other": other, "id": abc},
+            )
+            await connection.execute(
+                text("DELETE FROM oasmnr_submissions WHERE id = :id"), {"id": sasba}
+            )
+        assert await fingerprint(engine, patient) == "v|2|3|0|3"
+        assert await fingerprint(engine, other) == "v|0|0|0|1"
+
+        # Rolled back writes leave the versions alone
+        async with engine.connect() as connection:
+            await insert(connection, "abs_submissions", patient_id=patient)
+            await connection.rollback()
+        assert await fingerprint(engine, patient) == "v|2|3|0|3"
+
+    run(test)
+
+
+def test_concurrent_writers_to_one_patient_lose_no_increments():
+    writers, writes = 8, 10
+
+    async def test(engine):
+        patient = uuid.uuid4()
+        async with engine.begin() as connection:
+            await install_data_versions(connection)
+
+        async def writer(index: int):
+            for _ in range(writes):
+                async with engine.begin() as connection:
+                    # Two types per transaction, in opposite orders across
+                    # writers, to exercise the deadlock-free key order
+                    tables = ["abs_submissions", "abc_submissions"]
+                    for table in tables[:: 1 if index % 2 else -1]:
+                        await insert(connection, table, patient_id=patient)
+                    await asyncio.sleep(0)
+
+        await asyncio.gather(*(writer(index) for index in range(writers)))
+        total = writers * writes
+        assert await fingerprint(engine, patient) == f"v|0|0|{total}|{total}"
+
+    run(test)
+
+
+def test_versions_are_keyed_by_canonical_patient_id():
+    async def test(engine):
+        patient = uuid.uuid4()
+        async with engine.begin() as connection:
+            await install_data_versions(connection)
+            await insert(connection, "abs_submissions", patient_id=patient)
+        async with engine.connect() as connection:
+            versions = await get_data_versions(connection, [str(patient).upper()])
+        assert version_fingerprint(versions[str(patient)]) == "v|0|0|1|0"
+
+    run(test)
@@ -0,0 +1,104 @@
+"""Tests of replica health checks and replica selection."""
+
+import asyncio
+import contextlib
+
+import pytest
+
+from app.dependencies import database
+from app.dependencies.database import DatabaseSessionManager
+
+PRIMARY = "postgresql+asyncpg://user@primary/db"
+REPLICAS = [f"postgresql+asyncpg://user@replica-{i}/db" for i in range(3)]
+
+
+class FakeEngine:
+    """Answers the lag query with a set lag, or fails when lag is an error."""
+
+    def __init__(self, lag):
+        self.lag = lag
+
+    @contextlib.asynccontextmanager
+    async def connect(self):
+        if isinstance(self.lag, Exception):
+            raise self.lag
+
+        class Connection:
+            async def scalar(connection, query):
+                return self.lag
+
+        yield Connection()
+
+
+@pytest.fixture
+def manager():
+    """A session manager with three replicas that have passed a check."""
+    manager = DatabaseSessionManager(PRIMARY, replica_hosts=REPLICAS)
+    manager._ensure_initialized()
+    for replica in manager._replicas:
+        replica.healthy = True
+        replica.lag = 0.0
+    return manager
+
+
+def check(replica, lag):
+    """Run a replica's health check against a fake engine."""
+    replica.engine = FakeEngine(lag)
+    asyncio.run(replica.check())
+
+
+def test_unchecked_replicas_are_not_used():
+    manager = DatabaseSessionManager(PRIMARY, replica_hosts=REPLICAS)
+    manager._ensure_initialized()
+    assert all(replica.healthy is None for replica in manager._replicas)
+    assert manager.choose_replica() is None
+
+    check(manager._replicas[1], 0.5)
+    assert manager.choose_replica() is manager._replicas[1]
+    assert manager.choose_replica(max_lag=0.1) is None
+
+
+def test_failed_check_marks_replica_unhealthy(manager):
+    replica = manager._replicas[0]
+    check(replica, ConnectionError("refused"))
+    assert replica.healthy is False
+    assert replica.lag is None
+    assert replica not in {manager.choose_replica() for _ in range(6)}
+
+    check(replica, 2)
+    assert replica.healthy is True
+    assert replica.lag == 2.0
+
+
+def test_lagging_replicas_are_skipped(manager):
+    manager._replicas[0].lag = 10.0
+    manager._replicas[1].lag = 3.0
+    chosen = {manager.choose_replica(max_lag=5) for _ in range(6)}
+    assert chosen == set(manager._replicas[1:])
+    assert manager.choose_replica(max_lag=1) is manager._replicas[2]
+    # Without a bound, lag does not matter
+    assert {manager.choose_replica() for _ in range(6)} == set(manager._replicas)
+
+
+def test_falls_back_to_primary(manager):
+    for replica in manager._replicas:
+        replica.lag = 10.0
+    assert manager.choose_replica(max_lag=5) is None
+    for replica in manager._replicas:
+        replica.healthy = False
+    assert manager.choose_replica() is None
+    assert DatabaseSessionManager(PRIMARY, replica_hosts=[]).choose_replica() is None
+
+
+def test_least_connections_prefers_idle_replica(manager):
+    manager._replicas[0].in_flight = 2
+    manager._replicas[2].in_flight = 1
+    assert {manager.choose_replica() for _ in range(6)} == {manager._replicas[1]}
+
+
+def test_round_robin_rotates_over_candidates(manager, monkeypatch):
+    monkeypatch.setattr(database, "REPLICA_SELECTION", "round_robin")
+    manager._replicas[1].healthy = False
+    chosen = [manager.choose_replica() for _ in range(4)]
+    assert set(chosen) == {manager._replicas[0], manager._replicas[2]}
+    assert chosen[0] is not chosen[1]
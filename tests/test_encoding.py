@@ -0,0 +1,98 @@
+"""Tests of content coding negotiation and compressed responses."""
+
+import asyncio
+import gzip
+import zlib
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import encoding
+from app.services.encoding import (
+    COMPRESS_MIN_BYTES,
+    EncodedBody,
+    encoded_response,
+    negotiate_encoding,
+)
+
+ETAG = '"summary-etag"'
+LARGE_BODY = b'{"summary": "' + b"x" * COMPRESS_MIN_BYTES + b'"}'
+
+
+@pytest.fixture
+def brotli(monkeypatch):
+    """Pretend brotli is installed, compressing with zlib."""
+    module = SimpleNamespace(compress=lambda body, quality: zlib.compress(body))
+    monkeypatch.setattr(encoding, "_brotli", lambda: module)
+
+
+@pytest.fixture
+def no_brotli(monkeypatch):
+    monkeypatch.setattr(encoding, "_brotli", lambda: None)
+
+
+def respond(body: bytes, accept_encoding: str | None, headers=None):
+    return asyncio.run(
+        encoded_response(EncodedBody(body), accept_encoding, headers or {})
+    )
+
+
+def test_no_header_means_identity(brotli):
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("") is None
+    assert negotiate_encoding("identity") is None
+
+
+def test_brotli_is_preferred_when_installed(brotli):
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("GZIP") == "gzip"
+
+
+def test_without_brotli_gzip_is_used(no_brotli):
+    assert negotiate_encoding("gzip, deflate, br") == "gzip"
+    assert negotiate_encoding("br") is None
+    assert negotiate_encoding("*") == "gzip"
+
+
+def test_zero_quality_refuses_a_coding(brotli):
+    assert negotiate_encoding("br;q=0, gzip") == "gzip"
+    assert negotiate_encoding("br; q=0.0, gzip;q=0") is None
+    assert negotiate_encoding("br;q=0.5, gzip;q=1") == "br"
+    # An unparseable quality counts as refusal
+    assert negotiate_encoding("br;q=high, gzip") == "gzip"
+
+
+def test_wildcard_covers_codings_not_listed(brotli):
+    assert negotiate_encoding("*") == "br"
+    assert negotiate_encoding("br;q=0, *") == "gzip"
+    assert negotiate_encoding("*;q=0") is None
+    assert negotiate_encoding("*;q=0, gzip") == "gzip"
+
+
+def test_compressed_response_has_weak_etag(no_brotli):
+    response = respond(LARGE_BODY, "gzip", {"ETag": ETAG, "Vary": "Authorization"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"] == f"W/{ETAG}"
+    assert response.headers["Vary"] == "Authorization, Accept-Encoding"
+    assert gzip.decompress(response.body) == LARGE_BODY
+
+
+def test_weak_etag_is_not_weakened_again(no_brotli):
+    response = respond(LARGE_BODY, "gzip", {"ETag": f"W/{ETAG}"})
+    assert response.headers["ETag"] == f"W/{ETAG}"
+
+
+def test_uncompressed_responses_keep_strong_etag(no_brotli):
+    small = respond(b'{"summary": ""}', "gzip", {"ETag": ETAG})
+    identity = respond(LARGE_BODY, None, {"ETag": ETAG})
+    for response in (small, identity):
+        assert "Content-Encoding" not in response.headers
+        assert response.headers["ETag"] == ETAG
+        assert response.headers["Vary"] == "Accept-Encoding"
+
+
+def test_compressed_variants_are_kept(no_brotli):
+    body = EncodedBody(LARGE_BODY)
+    first = asyncio.run(body.get("gzip"))
+    assert asyncio.run(body.get("gzip")) is first
+    assert asyncio.run(body.get(None)) is LARGE_BODY
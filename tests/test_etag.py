@@ -0,0 +1,36 @@
+"""Tests of summary ETags and If-None-Match handling."""
+
+from app.routers.patient_summary import etag_matches
+from app.services.summary import get_summary_etag
+
+ETAG = get_summary_etag("3|2024-01-01|0|None|1|2024-02-01")
+
+
+def test_summary_etag_is_quoted_and_follows_the_fingerprint():
+    assert ETAG.startswith('"') and ETAG.endswith('"')
+    assert ETAG == get_summary_etag("3|2024-01-01|0|None|1|2024-02-01")
+    assert ETAG != get_summary_etag("4|2024-01-01|0|None|1|2024-02-01")
+
+
+def test_missing_header_never_matches():
+    assert not etag_matches(ETAG, None)
+    assert not etag_matches(ETAG, "")
+
+
+def test_exact_and_listed_tags_match():
+    assert etag_matches(ETAG, ETAG)
+    assert etag_matches(ETAG, f'"other", {ETAG}')
+    assert not etag_matches(ETAG, '"other"')
+
+
+def test_weak_tags_match():
+    assert etag_matches(ETAG, f"W/{ETAG}")
+    assert etag_matches(ETAG, f'W/"other",W/{ETAG}')
+
+
+def test_wildcard_matches():
+    assert etag_matches(ETAG, "*")
+
+
+def test_unquoted_tag_does_not_match():
+    assert not etag_matches(ETAG, ETAG.strip('"'))
@@ -0,0 +1,49 @@
+"""Tests of the readiness endpoints."""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import health
+from app.routers.patient_summary import get_token_payload
+from app.services import warmup
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """A client of the health routes with a settable token payload."""
+    app = FastAPI()
+    app.include_router(health.router)
+    payload = {"permissions": []}
+    app.dependency_overrides[get_token_payload] = lambda: payload
+    monkeypatch.setitem(warmup.state, "ready", True)
+    monkeypatch.setitem(warmup.state, "startup_seconds", 1.0)
+    monkeypatch.setitem(warmup.state, "llm_reachable", {"gpt-4o": True})
+    monkeypatch.setattr(
+        health.sessionmanager, "pool_status", lambda: {"replicas": ["replica-0"]}
+    )
+    client = TestClient(app)
+    client.payload = payload
+    return client
+
+
+def test_readyz_reports_status_only(client, monkeypatch):
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json() == {"ready": True}
+
+    monkeypatch.setitem(warmup.state, "ready", False)
+    monkeypatch.setitem(warmup.state, "startup_seconds", None)
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json() == {"ready": False}
+
+
+def test_readyz_details_need_permission(client):
+    assert client.get("/readyz/details").status_code == 403
+
+    client.payload["permissions"].append(health.HEALTH_PERMISSION)
+    details = client.get("/readyz/details").json()
+    assert details["database_pool"] == {"replicas": ["replica-0"]}
+    # The latest background result is reported without checking again
+    assert details["llm_reachable"] == {"gpt-4o": True}
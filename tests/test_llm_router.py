@@ -0,0 +1,203 @@
+"""Tests of deployment ranking and failover in the LLM router."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.services import llm_router
+from app.services.llm_router import Deployment, LLMRouter, load_deployments
+
+ENDPOINT = "https://example.openai.azure.com/?api-version=2024-06-01"
+MESSAGES = [{"role": "user", "content": "x" * 4000}]
+
+
+class StubCompletions:
+    """Answers chat completions from a script of responses and errors."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def create(self, messages, model, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else "ok"
+        if isinstance(outcome, Exception):
+            raise outcome
+        return SimpleNamespace(
+            model=model,
+            usage=SimpleNamespace(
+                total_tokens=1100,
+                prompt_tokens=1000,
+                completion_tokens=100,
+                prompt_tokens_details=None,
+            ),
+        )
+
+
+def deployment(name: str, *outcomes, **kwargs) -> Deployment:
+    """A deployment whose client answers with the given outcomes."""
+    deployment = Deployment(name, ENDPOINT, "key", **kwargs)
+    deployment.completions = StubCompletions(outcomes)
+    deployment.client = SimpleNamespace(
+        chat=SimpleNamespace(completions=deployment.completions)
+    )
+    return deployment
+
+
+def status_error(status_code: int) -> openai.APIStatusError:
+    """The SDK's error for an HTTP status."""
+    response = httpx.Response(
+        status_code, request=httpx.Request("POST", "https://example.com")
+    )
+    return openai.APIStatusError(f"Error {status_code}", response=response, body=None)
+
+
+def complete(router: LLMRouter, on_success=None):
+    return asyncio.run(router.chat_completion(MESSAGES, on_success=on_success))
+
+
+def test_lower_latency_ranks_first():
+    slow, fast = deployment("slow"), deployment("fast")
+    for _ in range(5):
+        slow.record_success(4.0, None, 1000)
+        fast.record_success(1.0, None, 1000)
+    assert LLMRouter([slow, fast]).rank(1000) == [fast, slow]
+
+
+def test_errors_rank_a_deployment_lower():
+    flaky, steady = deployment("flaky"), deployment("steady")
+    for _ in range(5):
+        flaky.record_success(1.0, None, 1000)
+        steady.record_success(2.0, None, 1000)
+    flaky.record_failure()
+    assert LLMRouter([flaky, steady]).rank(1000) == [steady, flaky]
+
+
+def test_weight_scales_the_score():
+    light, heavy = deployment("light"), deployment("heavy", weight=3.0)
+    assert LLMRouter([light, heavy]).rank(1000) == [heavy, light]
+
+
+def test_deployments_without_token_headroom_are_skipped():
+    busy, idle = deployment("busy", tpm_quota=5000), deployment("idle")
+    busy.record_success(0.1, None, 4500)
+    idle.record_success(5.0, None, 1000)
+    router = LLMRouter([busy, idle])
+    assert router.rank(400) == [busy, idle]
+    assert router.rank(1000) == [idle]
+
+
+def test_smallest_fitting_tier_is_preferred():
+    small = deployment("small", max_prompt_tokens=2000)
+    large = deployment("large", max_prompt_tokens=100_000)
+    router = LLMRouter([large, small])
+    assert router.rank(1000) == [small, large]
+    assert router.rank(5000) == [large]
+
+
+def test_all_unavailable_falls_back_to_those_that_fit():
+    cooling = deployment("cooling")
+    small = deployment("small", max_prompt_tokens=500)
+    for _ in range(llm_router.MAX_CONSECUTIVE_FAILURES):
+        cooling.record_failure()
+    assert not cooling.is_available(1000)
+    assert LLMRouter([cooling, small]).rank(1000) == [cooling]
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        status_error(429),
+        status_error(503),
+        openai.APIConnectionError(request=httpx.Request("POST", "https://x")),
+        TimeoutError(),
+    ],
+)
+def test_retryable_errors_fail_over(error):
+    first, second = deployment("first", error), deployment("second")
+    succeeded = []
+    response = complete(
+        LLMRouter([first, second]),
+        on_success=lambda deployment, latency, usage: succeeded.append(deployment),
+    )
+    assert response.model == "second"
+    assert succeeded == [second]
+    assert first.error_rate == 1.0
+    assert second.tokens_last_minute() == 1100
+
+
+@pytest.mark.parametrize("status_code", [400, 401, 422])
+def test_non_retryable_errors_are_raised_at_once(status_code):
+    first, second = deployment("first", status_error(status_code)), deployment("second")
+    with pytest.raises(openai.APIStatusError):
+        complete(LLMRouter([first, second]))
+    assert second.completions.calls == 0
+    # The request was at fault, not the deployment
+    assert first.error_rate == 0.0
+
+
+def test_all_deployments_failing_raises():
+    router = LLMRouter(
+        [deployment("first", status_error(500)), deployment("second", TimeoutError())]
+    )
+    with pytest.raises(RuntimeError, match="All deployments failed"):
+        complete(router)
+
+
+def test_repeated_failures_put_a_deployment_on_cooldown():
+    errors = [status_error(500)] * llm_router.MAX_CONSECUTIVE_FAILURES
+    # Weighted so it stays first despite its errors until the cooldown
+    first = deployment("first", *errors, weight=100.0)
+    second = deployment("second")
+    router = LLMRouter([first, second])
+    for _ in errors:
+        complete(router)
+    assert router.rank(1000) == [second]
+    complete(router)
+    assert first.completions.calls == len(errors)
+
+
+def test_single_deployment_from_environment(monkeypatch):
+    monkeypatch.delenv("AZURE_OPENAI_DEPLOYMENTS", raising=False)
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "key")
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", ENDPOINT)
+    monkeypatch.setenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o")
+    (only,) = load_deployments()
+    assert only.name == "gpt-4o"
+    assert only.endpoint == ENDPOINT
+    assert only.tpm_quota is None and only.max_prompt_tokens is None
+
+    monkeypatch.delenv("AZURE_OPENAI_DEPLOYMENT_NAME")
+    with pytest.raises(ValueError, match="AZURE_OPENAI_DEPLOYMENT_NAME"):
+        load_deployments()
+
+
+def test_deployments_from_json(monkeypatch):
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "shared-key")
+    monkeypatch.setenv(
+        "AZURE_OPENAI_DEPLOYMENTS",
+        json.dumps(
+            [
+                {"name": "mini", "endpoint": ENDPOINT, "max_prompt_tokens": 8000},
+                {
+                    "name": "large",
+                    "endpoint": ENDPOINT,
+                    "weight": 2,
+                    "tpm_quota": 90000,
+                    "prompt_price": 0.005,
+                },
+            ]
+        ),
+    )
+    mini, large = load_deployments()
+    assert (mini.name, mini.max_prompt_tokens) == ("mini", 8000)
+    assert (large.weight, large.tpm_quota) == (2, 90000)
+    assert large.prices == {"prompt_price": 0.005}
+
+    monkeypatch.setenv("AZURE_OPENAI_DEPLOYMENTS", '[{"name": "no endpoint"}]')
+    with pytest.raises(ValueError, match="Invalid AZURE_OPENAI_DEPLOYMENTS"):
+        load_deployments()
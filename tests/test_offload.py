@@ -0,0 +1,135 @@
+"""Tests of CPU offloading of large patients' submissions."""
+
+import asyncio
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+import sqlalchemy
+
+from app.data.patient_submissions import (
+    SUBMISSION_SOURCES,
+    _pack_column,
+    _pipeline,
+    serialize_columns,
+)
+from app.models.simplified_models import SimplifiedAbs, SimplifiedOasmnr
+from app.preprocessing.submissions import ABS_SCALE_FIELDS
+from app.services.analytics import new_columns
+from app.services.offload import CpuOffload
+
+START = datetime(2024, 1, 1, 9)
+
+
+def abs_rows(count: int, rng: random.Random) -> list[SimplifiedAbs]:
+    """ABS submissions as loaded from the database, some with comments."""
+    return [
+        SimplifiedAbs(
+            id=uuid.UUID(int=rng.getrandbits(128)),
+            patient_id=uuid.UUID(int=1),
+            **{field: rng.randint(1, 4) for field in ABS_SCALE_FIELDS},
+            observation_start=START + timedelta(minutes=15 * i),
+            observation_location="Ward",
+            status="ACTIVE",
+            updated_at=START,
+            additional_comments="Settled after 1:1 time" if i % 7 == 0 else None,
+            score=rng.randint(14, 56),
+            severity=rng.choice(["MILD", "MODERATE", None]),
+        )
+        for i in range(count)
+    ]
+
+
+def oasmnr_rows(count: int, rng: random.Random) -> list[SimplifiedOasmnr]:
+    """OASMNR submissions with runs that merge into episodes."""
+    return [
+        SimplifiedOasmnr(
+            id=uuid.UUID(int=rng.getrandbits(128)),
+            patient_id=uuid.UUID(int=1),
+            time_of_behaviour=START + timedelta(minutes=10 * i),
+            behaviour=rng.choice(["VA", "PO"]),
+            severity=rng.randint(1, 4),
+            antecedent=1,
+            intervention="A",
+            recordings=rng.choice([1, 2, None]),
+            status="ACTIVE",
+            assessment_type="oasmnr",
+            contributing_factors=["NoisyEnvironment"] if i % 3 else None,
+            antecedent_other="Loud visitor" if i % 11 == 0 else None,
+            intervention_other=None,
+            severity_score=None,
+            intrusiveness=None,
+        )
+        for i in range(count)
+    ]
+
+
+def column_buffers(model, submissions) -> dict:
+    """Pack submissions into column buffers as fetch_columns does."""
+    columns = [
+        attribute.columns[0]
+        for attribute in sqlalchemy.inspect(model).column_attrs
+        if not attribute.deferred
+    ]
+    return {
+        column.key: _pack_column(
+            column, [getattr(submission, column.key) for submission in submissions]
+        )
+        for column in columns
+    }
+
+
+def serialize_inline(source: str, submissions) -> dict:
+    """Serialise submissions as the streaming path does on the event loop."""
+    preprocess = SUBMISSION_SOURCES[source][3]
+
+    async def rows():
+        for submission in submissions:
+            yield preprocess(submission)
+
+    notes, columns = [], new_columns()
+    text = asyncio.run(_pipeline(rows(), source, notes, columns))
+    return {"text": text, "notes": notes, "columns": columns[source]}
+
+
+def test_inputs_at_min_rows_run_in_the_pool():
+    offload = CpuOffload(workers=1, min_rows=100)
+    try:
+        assert asyncio.run(offload.run(os.getpid, rows=99)) == os.getpid()
+        assert asyncio.run(offload.run(os.getpid, rows=100)) != os.getpid()
+        assert offload.stats()["inline"] == 1
+        assert offload.stats()["offloaded"] == 1
+    finally:
+        offload.shutdown()
+    assert not CpuOffload(workers=0, min_rows=100).should_offload(10_000)
+
+
+def test_offloaded_serialisation_matches_inline():
+    rng = random.Random(0)
+    offload = CpuOffload(workers=1, min_rows=500)
+    try:
+        for source, model, submissions in (
+            ("ABS", SimplifiedAbs, abs_rows(500, rng)),
+            ("OASMNR", SimplifiedOasmnr, oasmnr_rows(500, rng)),
+        ):
+            inline = serialize_inline(source, submissions)
+            offloaded = asyncio.run(
+                offload.run(
+                    serialize_columns,
+                    source,
+                    column_buffers(model, submissions),
+                    rows=len(submissions),
+                )
+            )
+            assert offloaded["text"] == inline["text"]
+            assert offloaded["notes"] == inline["notes"]
+            assert offloaded["columns"].keys() == inline["columns"].keys()
+            for field, values in inline["columns"].items():
+                assert np.array_equal(
+                    offloaded["columns"][field], values, equal_nan=True
+                )
+        assert offload.stats()["offloaded"] == 2
+    finally:
+        offload.shutdown()
@@ -0,0 +1,62 @@
+"""Tests of the prefetch routes' permission and size limits."""
+
+import contextlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import prefetch
+from app.routers.patient_summary import get_token_payload
+
+WARD = [f"patient-{i}" for i in range(5)]
+
+
+class FakeSessionManager:
+    """Hands out placeholder sessions; the data functions are stubbed."""
+
+    def choose_replica(self, max_lag=None):
+        return None
+
+    @contextlib.asynccontextmanager
+    async def session(self, replica=None):
+        yield None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """A client of the prefetch routes with a settable token payload."""
+    app = FastAPI()
+    app.include_router(prefetch.router)
+    payload = {"sub": "user", "permissions": []}
+    app.dependency_overrides[get_token_payload] = lambda: payload
+
+    async def get_patient_ids(db_session, org_id=None, ward_id=None, limit=None):
+        return WARD[:limit]
+
+    async def schedule(patient_ids, request):
+        return {"queued": len(patient_ids), "forwarded": 0}
+
+    monkeypatch.setattr(prefetch, "sessionmanager", FakeSessionManager())
+    monkeypatch.setattr(prefetch, "get_patient_ids", get_patient_ids)
+    monkeypatch.setattr(prefetch, "schedule", schedule)
+    monkeypatch.setattr(prefetch, "PREFETCH_MAX_PATIENTS", 3)
+    client = TestClient(app)
+    client.payload = payload
+    return client
+
+
+def test_prefetch_lists_need_permission(client):
+    assert client.post("/prefetch/wards/ward").status_code == 403
+    assert client.post("/prefetch/patients", json=["p1"]).status_code == 403
+
+    client.payload["permissions"].append(prefetch.PREFETCH_PERMISSION)
+    assert client.post("/prefetch/wards/ward").status_code == 202
+    assert client.post("/prefetch/patients", json=["p1"]).status_code == 202
+
+
+def test_prefetch_lists_are_capped(client):
+    client.payload["permissions"].append(prefetch.PREFETCH_PERMISSION)
+    assert client.post("/prefetch/wards/ward").json()["queued"] == 3
+    response = client.post("/prefetch/patients", json=WARD)
+    assert response.status_code == 400
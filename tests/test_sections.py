@@ -0,0 +1,115 @@
+"""Tests of section planning and merging of sectioned summaries."""
+
+import asyncio
+import json
+
+from app.services import summary
+from app.services.analytics import new_columns
+from app.services.summary import load_prompts, merge_sections, plan_sections
+
+SECTIONS = load_prompts()["sections"]
+INPUTS = sorted({name for section in SECTIONS for name in section["inputs"]})
+
+
+def slices(**changes):
+    """Input slices of a patient, with some slices changed."""
+    return {name: changes.get(name, f"{name} data") for name in INPUTS}
+
+
+def generate(plan):
+    """Fill the plan's requested sections as the model would."""
+    reply = {
+        section["key"]: f"{section['key']} text"
+        for section in plan
+        if section["content"] is None
+    }
+    return merge_sections(plan, json.dumps(reply))
+
+
+def test_first_summary_generates_every_section():
+    plan = plan_sections(slices(), None)
+    assert [section["key"] for section in plan] == [s["key"] for s in SECTIONS]
+    assert all(section["regenerated"] for section in plan)
+    assert all(section["content"] is None for section in plan)
+
+
+def test_unchanged_inputs_reuse_every_section():
+    previous = generate(plan_sections(slices(), None))
+    plan = plan_sections(slices(), previous)
+    assert not any(section["regenerated"] for section in plan)
+    assert merge_sections(plan, None)["summary"] == previous["summary"]
+
+
+def test_changed_input_regenerates_only_its_sections():
+    previous = generate(plan_sections(slices(), None))
+    changed = INPUTS[0]
+    plan = plan_sections(slices(**{changed: "new data"}), previous)
+    assert {section["key"] for section in plan if section["regenerated"]} == {
+        section["key"] for section in SECTIONS if changed in section["inputs"]
+    }
+    for section in plan:
+        if not section["regenerated"]:
+            assert section["content"] == f"{section['key']} text"
+
+
+def test_merge_renders_sections_in_order():
+    plan = plan_sections(slices(), None)
+    reply = {section["key"]: "Line one\\nLine two" for section in plan}
+    del reply[plan[0]["key"]]
+    reply[plan[1]["key"]] = ""
+    merged = merge_sections(plan, json.dumps(reply))
+    assert merged["sections"][0]["content"] == ""
+    assert merged["sections"][1]["content"] == ""
+    assert merged["summary"] == "\n\n".join(
+        f"{section['title']}\nLine one\nLine two" for section in plan[2:]
+    )
+
+
+def test_omitted_section_is_requested_again():
+    plan = plan_sections(slices(), None)
+    reply = {section["key"]: "" for section in plan}
+    del reply[plan[0]["key"]]
+    previous = merge_sections(plan, json.dumps(reply))
+    plan = plan_sections(slices(), previous)
+    assert [section["key"] for section in plan if section["regenerated"]] == [
+        plan[0]["key"]
+    ]
+
+
+def test_unstructured_reply_drops_sections():
+    previous = merge_sections(plan_sections(slices(), None), "Plain text summary")
+    assert previous == {"summary": "Plain text summary", "sections": []}
+    plan = plan_sections(slices(), previous)
+    assert all(section["regenerated"] for section in plan)
+
+
+def test_submissions_of_every_type_reach_the_prompt(monkeypatch):
+    async def get_patient_data(patient_id, max_replica_lag=None):
+        return {
+            "oasmnr": "[OASMNR rows]",
+            "sasba": "",
+            "abs": "[ABS rows]",
+            "abc": "[ABC rows]",
+            "trends": {"oasmnr_count": 1, "abs_count": 1, "abc_count": 1},
+            "notes": [],
+            "columns": new_columns(),
+            "fingerprint": "fingerprint",
+        }
+
+    monkeypatch.setattr(summary, "get_patient_data", get_patient_data)
+    request = asyncio.run(summary.build_summary_request("patient"))
+    prompt = request["messages"][-1]["content"]
+    for rows in ("[OASMNR rows]", "[ABS rows]", "[ABC rows]"):
+        assert rows in prompt
+    assert summary.UNNEEDED_CONTEXT not in prompt
+
+    # With earlier sections reused, only the slices of the requested ones
+    # are sent
+    previous = generate(request["sections"])
+    for section in previous["sections"]:
+        if "abs" in section["inputs"]:
+            section["inputs_digest"] = None
+    request = asyncio.run(summary.build_summary_request("patient", None, previous))
+    prompt = request["messages"][-1]["content"]
+    assert "[ABS rows]" in prompt
+    assert summary.UNNEEDED_CONTEXT in prompt
@@ -0,0 +1,141 @@
+"""Tests of the verified token cache and JWKS refreshes."""
+
+import asyncio
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from app.dependencies import security
+from app.dependencies.security import TokenValidator
+
+PRIVATE_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def make_token(subject: str, kid: str = "k1", expires_in: float = 3600) -> str:
+    """An RS256 token signed with the test key."""
+    payload = {"sub": subject, "exp": int(time.time() + expires_in)}
+    return jwt.encode(payload, PRIVATE_KEY, algorithm="RS256", headers={"kid": kid})
+
+
+class FakeJwks:
+    """Serves the test key under a set of key IDs, counting fetches."""
+
+    def __init__(self):
+        self.kids = {"k1"}
+        self.fetches = 0
+
+    async def get_public_keys(self):
+        self.fetches += 1
+        return {kid: PRIVATE_KEY.public_key() for kid in self.kids}
+
+
+@pytest.fixture
+def jwks(monkeypatch):
+    jwks = FakeJwks()
+    monkeypatch.setattr(security, "get_public_keys", jwks.get_public_keys)
+    return jwks
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable clock for the validator; signatures use the real time."""
+    now = [time.time()]
+    monkeypatch.setattr(security.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    """The tokens whose signatures were verified."""
+    decoded = []
+    decode = jwt.decode
+
+    def counting_decode(token, **kwargs):
+        decoded.append(token)
+        return decode(token, **kwargs)
+
+    monkeypatch.setattr(security.jwt, "decode", counting_decode)
+    return decoded
+
+
+def validate(validator, *tokens):
+    """Validate tokens in order, returning their payloads or errors."""
+
+    async def run():
+        results = []
+        for token in tokens:
+            try:
+                results.append(await validator.validate_token(token))
+            except jwt.InvalidTokenError as e:
+                results.append(e)
+        return results
+
+    return asyncio.run(run())
+
+
+def test_repeated_tokens_are_verified_once(jwks, decodes):
+    token = make_token("user")
+    payloads = validate(TokenValidator(), token, token, token)
+    assert [payload["sub"] for payload in payloads] == ["user"] * 3
+    assert decodes == [token]
+
+
+def test_least_recently_used_token_is_evicted(jwks, decodes):
+    first, second, third = (make_token(f"user-{i}") for i in range(3))
+    validator = TokenValidator(cache_size=2)
+    validate(validator, first, second, first, third, first, second)
+    # Using first again kept it cached, so third evicted second
+    assert decodes == [first, second, third, second]
+
+
+def test_expired_tokens_leave_the_cache(jwks, decodes, clock):
+    token = make_token("user", expires_in=60)
+    validator = TokenValidator()
+    validate(validator, token)
+    clock[0] += 120
+    validate(validator, token)
+    # The expired entry was dropped, so the token was verified again
+    assert decodes == [token, token]
+    assert len(validator._verified_tokens) == 1
+
+
+def test_tokens_without_expiry_are_not_cached(jwks, decodes):
+    token = jwt.encode(
+        {"sub": "user"}, PRIVATE_KEY, algorithm="RS256", headers={"kid": "k1"}
+    )
+    validate(TokenValidator(), token, token)
+    assert decodes == [token, token]
+
+
+def test_unknown_kid_refreshes_keys_at_most_once_per_interval(jwks, clock):
+    validator = TokenValidator(min_refresh_interval=60)
+    validate(validator, make_token("user"))
+    assert jwks.fetches == 1
+
+    # A forged key ID refetches the keys once, then not again until the
+    # minimum interval has passed
+    results = validate(validator, make_token("user", "forged"))
+    assert isinstance(results[0], jwt.InvalidTokenError)
+    assert jwks.fetches == 2
+    validate(validator, make_token("user", "forged"), make_token("user", "k2"))
+    assert jwks.fetches == 2
+
+    # After the provider rotates its key, tokens signed with it are accepted
+    # once the interval has passed
+    jwks.kids.add("k2")
+    clock[0] += 61
+    assert validate(validator, make_token("user", "k2"))[0]["sub"] == "user"
+    assert jwks.fetches == 3
+
+
+def test_keys_are_refetched_after_max_age(jwks, clock):
+    validator = TokenValidator(max_age=3600, min_refresh_interval=60)
+    validate(validator, make_token("first"))
+    clock[0] += 1800
+    validate(validator, make_token("second"))
+    assert jwks.fetches == 1
+    clock[0] += 1801
+    validate(validator, make_token("third"))
+    assert jwks.fetches == 2
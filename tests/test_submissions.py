@@ -0,0 +1,88 @@
+"""Tests of the streaming submission preprocessing."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from app.preprocessing.submissions import compress_episodes, serialize_rows
+
+START = datetime(2024, 1, 1, 9)
+GAP = timedelta(minutes=30)
+
+
+def row(minutes: float, behaviour="Shouting", **fields):
+    """An OASMNR row recorded `minutes` after START."""
+    return {
+        "time_of_behaviour": START + timedelta(minutes=minutes),
+        "behaviour": behaviour,
+        "antecedent": "Noise",
+        "intervention": ["Redirection"],
+        "contributing_factors": ["Pain"],
+        "recordings": 1,
+        "severity": 2,
+        **fields,
+    }
+
+
+async def rows_of(rows):
+    """Yield rows as an async stream."""
+    for value in rows:
+        yield value
+
+
+def compress(rows):
+    """Run rows through compress_episodes and collect the output."""
+
+    async def collect():
+        return [episode async for episode in compress_episodes(rows_of(rows), GAP)]
+
+    return asyncio.run(collect())
+
+
+def test_merges_run_of_identical_rows():
+    episodes = compress(
+        [row(0), row(10, recordings=3, severity=4), row(35, recordings=None)]
+    )
+    assert episodes == [
+        {
+            "behaviour": "Shouting",
+            "antecedent": "Noise",
+            "intervention": ["Redirection"],
+            "contributing_factors": ["Pain"],
+            "episode_count": 3,
+            "recordings": 4,
+            "first_time_of_behaviour": START,
+            "last_time_of_behaviour": START + timedelta(minutes=35),
+            "max_severity": 4,
+            "max_severity_score": None,
+            "max_intrusiveness": None,
+        }
+    ]
+
+
+def test_single_rows_pass_through_unchanged():
+    rows = [row(0), row(10, behaviour="Hitting"), row(20)]
+    assert compress(rows) == rows
+
+
+def test_gap_splits_episodes():
+    episodes = compress([row(0), row(30), row(61), row(70)])
+    assert [episode["episode_count"] for episode in episodes] == [2, 2]
+    assert episodes[1]["first_time_of_behaviour"] == START + timedelta(minutes=61)
+
+
+def test_rows_without_time_are_not_merged():
+    rows = [row(0), {**row(0), "time_of_behaviour": None}, row(1)]
+    assert compress(rows) == rows
+
+
+def test_recording_totals_are_kept():
+    rows = [row(minute * 20, behaviour=minute % 3) for minute in range(20)]
+    rows += [row(400 + minute, recordings=2) for minute in range(5)]
+    episodes = compress(rows)
+    assert sum(episode["recordings"] for episode in episodes) == 30
+
+
+def test_serialize_rows_matches_str():
+    rows = [row(0), row(10, behaviour='It\'s "quoted"')]
+    assert asyncio.run(serialize_rows(rows_of(rows))) == str(rows)
+    assert asyncio.run(serialize_rows(rows_of([]))) == ""
@@ -0,0 +1,106 @@
+"""
+Test that summaries hold no database connection while the LLM answers.
+
+Set TEST_DATABASE_URL to an async SQLAlchemy URL of a disposable database
+to run it. The summary tables are created in their own schema, which is
+dropped afterwards.
+"""
+
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.data import patient_submissions
+from app.dependencies.database import DatabaseSessionManager
+from app.models.simplified_models import SimplifiedAbs, SimplifiedBase
+from app.preprocessing.submissions import ABS_SCALE_FIELDS
+from app.services import summary
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"
+)
+
+
+class PendingRouter:
+    """An LLM router whose call records the pool while it is pending."""
+
+    def __init__(self, manager: DatabaseSessionManager):
+        self.manager = manager
+        self.pool_during_call = None
+
+    async def chat_completion(self, messages, on_success=None, **kwargs):
+        await asyncio.sleep(0.05)
+        self.pool_during_call = self.manager.pool_status()
+        reply = {
+            section["key"]: "Summary text."
+            for section in summary.load_prompts()["sections"]
+        }
+        return SimpleNamespace(
+            choices=[
+                SimpleNamespace(message=SimpleNamespace(content=json.dumps(reply)))
+            ],
+            usage=None,
+        )
+
+
+def test_no_connection_is_held_during_the_llm_call(monkeypatch):
+    async def main():
+        schema = f"summary_pool_{uuid.uuid4().hex}"
+        admin = create_async_engine(TEST_DATABASE_URL)
+        async with admin.begin() as connection:
+            await connection.execute(text(f"CREATE SCHEMA {schema}"))
+            await connection.execute(
+                text(
+                    f'CREATE TYPE {schema}."ContributingFactors" AS ENUM '
+                    "('StructuredActivity', 'NoisyEnvironment', 'RecentEpilepticFit')"
+                )
+            )
+        manager = DatabaseSessionManager(
+            TEST_DATABASE_URL,
+            {"connect_args": {"server_settings": {"search_path": schema}}},
+            replica_hosts=[],
+        )
+        patient_id = uuid.uuid4()
+        try:
+            async with manager.connect() as connection:
+                await connection.run_sync(SimplifiedBase.metadata.create_all)
+                await connection.execute(
+                    SimplifiedAbs.__table__.insert(),
+                    {
+                        "id": uuid.uuid4(),
+                        "patient_id": patient_id,
+                        **{field: 1 for field in ABS_SCALE_FIELDS},
+                        "observation_start": datetime(2024, 1, 1, 9),
+                        "observation_location": "Ward",
+                        "status": "ACTIVE",
+                        "updated_at": datetime(2024, 1, 1, 9),
+                        "score": 14,
+                        "severity": "MILD",
+                    },
+                )
+
+            router = PendingRouter(manager)
+            monkeypatch.setattr(patient_submissions, "sessionmanager", manager)
+            monkeypatch.setattr(summary, "get_llm_router", lambda: router)
+            result = await summary.get_patient_summary(str(patient_id))
+
+            assert result["ai_tags"] == {"abs_count": 1}
+            assert router.pool_during_call["checked_out"] == 0
+            # The data was read through the pool now idle
+            assert manager._engine.pool.checkedin() > 0
+        finally:
+            await manager.close()
+            async with admin.begin() as connection:
+                await connection.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+            await admin.dispose()
+
+    asyncio.run(main())